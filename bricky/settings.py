@@ -13,6 +13,11 @@ DEBUG = env.bool("DEBUG", True)
 ALLOWED_HOSTS = ["*"]
 
 AUTH_USER_MODEL = "users.CustomUser"
+# The plain ModelBackend only keeps sessions signed in before the cart-aware one valid
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ModelBackendWithCart',
+    'django.contrib.auth.backends.ModelBackend',
+]
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -36,6 +41,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.FileServingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +63,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'orders.context_processors.cart_summary',
             ],
         },
     },
@@ -68,8 +75,20 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Writers queue for the lock at BEGIN instead of failing when a read
+        # transaction tries to upgrade, which atomic cart updates rely on
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # An on-disk test database: the shared-cache in-memory one fails
+        # concurrent writers with "table is locked" instead of queueing them
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -122,7 +141,50 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+# collectstatic writes .gz siblings that core.middleware serves to gzip clients
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.GzipStaticFilesStorage'},
+}
+# Serve STATIC_ROOT and MEDIA_ROOT from Django itself, see core.middleware
+SERVE_FILES = env.bool('SERVE_FILES', True)
+FILE_MAX_AGE = env.int('FILE_MAX_AGE', 3600)
+# Per-page bundles built into STATIC_ROOT by `manage.py build_bundles`; the
+# {% bundle %} tag falls back to the individual files in DEBUG
+STATIC_BUNDLE_DIR = 'bundles'
+STATIC_BUNDLES = {
+    'base.css': ['store/css/lego.css'],
+    'base.js': ['store/js/lego.js', 'store/js/search-modal.js', 'core/js/newsletter.js'],
+    'index.js': ['store/js/cart-actions.js', 'core/js/index.js'],
+    'cart.css': ['store/css/cart.css', 'store/css/cart-utils.css'],
+    'cart.js': ['store/js/cart.js', 'store/js/cart-config.js'],
+    'product.css': ['store/css/product-detail.css', 'store/css/product-detail-utils.css', 'core/css/review_messages.css'],
+    'product.js': ['store/js/product-detail.js', 'store/js/review-system.js'],
+    'order_confirmation.css': ['core/css/order_confirmation.css', 'core/css/order-confirmation-inline.css'],
+    'profile_edit.css': ['users/css/profile.css', 'users/css/edit-profile.css'],
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Picture variants generated on demand under MEDIA_ROOT, see core.thumbnails
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_QUALITY = env.int('THUMBNAIL_QUALITY', 80)
+
+# Uploaded pictures are capped, stripped of EXIF and re-encoded, see core.images
+IMAGE_MAX_DIMENSION = env.int('IMAGE_MAX_DIMENSION', 2048)
+IMAGE_QUALITY = env.int('IMAGE_QUALITY', 85)
+# Apps whose ImageFields are normalized on upload
+IMAGE_NORMALIZATION_APPS = ['users', 'store']
+
+# Derived data refreshed after a request (category stats, popularity,
+# recommendations after checkout) is updated by a thread pool, see core.background
+BACKGROUND_TASKS_ASYNC = env.bool('BACKGROUND_TASKS_ASYNC', True)
+BACKGROUND_WORKERS = env.int('BACKGROUND_WORKERS', 2)
+
+# Seconds a worker reuses the catalog version it last read before checking
+# the database again, see store.catalog
+CATALOG_STATE_MAX_AGE = env.float('CATALOG_STATE_MAX_AGE', 1.0)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
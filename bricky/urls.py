@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from core.files import serve
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),  # Core app handles legal/contact/newsletter
@@ -17,6 +19,6 @@ urlpatterns = [
 if settings.DEBUG:
     urlpatterns += debug_toolbar_urls()
     # Serve media files in development
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve, document_root=settings.MEDIA_ROOT)
     # Serve static files in development
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.STATIC_URL, view=serve, document_root=settings.STATIC_ROOT)
\ No newline at end of file
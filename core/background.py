@@ -0,0 +1,46 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _run(func: Callable, args: tuple) -> None:
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        # Connections are per thread; don't leave this one open in the pool
+        connections.close_all()
+
+
+def run_in_background(func: Callable, *args) -> None:
+    """
+    Run ``func(*args)`` in a small process-wide thread pool, off the request.
+
+    Tasks live in memory and are lost if the process exits, so only hand
+    over derived data that a management command can rebuild. With
+    ``BACKGROUND_TASKS_ASYNC`` off they run inline, failures still logged.
+    """
+    global _executor
+    if not getattr(settings, 'BACKGROUND_TASKS_ASYNC', True):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Background task %s failed', func.__name__)
+        return
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2), thread_name_prefix='background'
+                )
+    _executor.submit(_run, func, args)
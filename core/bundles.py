@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+from core.files import gzip_file
+
+STATIC_BUNDLES: Dict[str, List[str]] = getattr(settings, 'STATIC_BUNDLES', {})
+STATIC_BUNDLE_DIR = getattr(settings, 'STATIC_BUNDLE_DIR', 'bundles')
+MANIFEST_NAME = 'manifest.json'
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+# A slash after one of these (or at the start) begins a regular expression
+_JS_BEFORE_REGEX = frozenset('(,=:[!&|?{};+-*%<>~^') | {''}
+_JS_REGEX_KEYWORDS = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else',
+    'yield', 'await',
+))
+# Line breaks after these can't end a statement early, so they can go
+_JS_JOINS_LINES = frozenset(';{,')
+# Operators that would fuse into another token without the space between them
+_JS_KEEP_SPACE = frozenset(('++', '--', '+-', '-+', '//', '/*', '<!', '->'))
+
+
+class BundleError(Exception):
+    pass
+
+
+def manifest_path() -> str:
+    return os.path.join(settings.STATIC_ROOT, STATIC_BUNDLE_DIR, MANIFEST_NAME)
+
+
+def _rebase_urls(css: str, source: str) -> str:
+    """Make relative url() references absolute, since the bundle lives elsewhere"""
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f'url({quote}{settings.STATIC_URL}{resolved}{quote})'
+    return _CSS_URL.sub(rebase, css)
+
+
+def minify_css(css: str) -> str:
+    css = _CSS_COMMENT.sub('', css)
+    css = _CSS_SPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def _skip_string(js: str, i: int, quote: str) -> int:
+    """Index just past the string literal opening at ``i``"""
+    i += 1
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        i += 1
+        if char == quote or char == '\n':
+            break
+    return i
+
+
+def _skip_template(js: str, i: int) -> Tuple[int, bool]:
+    """
+    Index just past the template literal text starting at ``i`` and whether
+    it stopped at a ``${`` substitution rather than the closing backtick
+    """
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+        elif char == '`':
+            return i + 1, False
+        elif char == '$' and js.startswith('{', i + 1):
+            return i + 2, True
+        else:
+            i += 1
+    return i, False
+
+
+def _skip_regex(js: str, i: int) -> int:
+    """Index just past the body of the regular expression literal opening at ``i``"""
+    i += 1
+    in_class = False
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        i += 1
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif (char == '/' and not in_class) or char == '\n':
+            break
+    return i
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char in '_$'
+
+
+def minify_js(js: str) -> str:
+    """
+    Drop comments and collapse whitespace, copying string, template and
+    regular expression literals untouched.
+
+    This is a tokenizer, not a parser: a slash starts a regular expression
+    after an operator, an opening bracket or a keyword such as ``return``,
+    and is a division otherwise. Line breaks are kept except after ``;``,
+    ``{`` and ``,``, so automatic semicolon insertion behaves the same.
+    """
+    out: List[str] = []
+    substitutions: List[int] = []  # brace depth each open ``${`` closes at
+    depth = 0
+    previous = word = space = ''
+    i, length = 0, len(js)
+    while i < length:
+        char = js[i]
+        if char.isspace():
+            space = '\n' if char == '\n' or space == '\n' else ' '
+            i += 1
+            continue
+        if js.startswith('//', i):
+            end = js.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        if js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            space = '\n' if '\n' in js[i:end] or space == '\n' else ' '
+            i = end
+            continue
+
+        if space and out:
+            if space == '\n' and previous not in _JS_JOINS_LINES:
+                out.append('\n')
+            elif (_is_word(previous) and (_is_word(char) or char == '.')) or previous + char in _JS_KEEP_SPACE:
+                out.append(' ')
+        space = ''
+
+        start = i
+        if char in '\'"':
+            i = _skip_string(js, i, char)
+        elif char == '`' or (char == '}' and substitutions and depth == substitutions[-1]):
+            if char == '}':
+                substitutions.pop()
+            i, opened = _skip_template(js, i + 1)
+            if opened:
+                substitutions.append(depth)
+        elif char == '/' and (previous in _JS_BEFORE_REGEX or (_is_word(previous) and word in _JS_REGEX_KEYWORDS)):
+            i = _skip_regex(js, i)
+        elif _is_word(char):
+            while i < length and _is_word(js[i]):
+                i += 1
+            word = js[start:i]
+        else:
+            depth += char == '{'
+            depth -= char == '}'
+            i += 1
+        out.append(js[start:i])
+        previous = js[i - 1]
+    return ''.join(out)
+
+
+def bundle_contents(name: str, sources: List[str]) -> str:
+    parts = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise BundleError(f'{name}: static file {source} not found')
+        with open(path, encoding='utf-8') as handle:
+            text = handle.read()
+        if name.endswith('.css'):
+            parts.append(minify_css(_rebase_urls(text, source)))
+        else:
+            parts.append(minify_js(text))
+    # A stray missing semicolon at the end of one script must not join it to the next
+    return ('\n' if name.endswith('.css') else ';\n').join(parts) + '\n'
+
+
+def build_bundles(bundles: Optional[Dict[str, List[str]]] = None) -> Dict[str, str]:
+    """
+    Write every bundle under STATIC_ROOT as ``<name>.<hash>.<ext>`` and save
+    the manifest mapping bundle names to those paths
+    """
+    bundles = STATIC_BUNDLES if bundles is None else bundles
+    output_dir = os.path.join(settings.STATIC_ROOT, STATIC_BUNDLE_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {}
+    for name, sources in bundles.items():
+        contents = bundle_contents(name, sources).encode('utf-8')
+        digest = hashlib.sha256(contents).hexdigest()[:12]
+        stem, extension = os.path.splitext(name)
+        filename = f'{stem}.{digest}{extension}'
+        with open(os.path.join(output_dir, filename), 'wb') as handle:
+            handle.write(contents)
+        gzip_file(os.path.join(output_dir, filename))
+        manifest[name] = f'{STATIC_BUNDLE_DIR}/{filename}'
+
+    partial = f'{manifest_path()}.tmp'
+    with open(partial, 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(partial, manifest_path())
+    load_manifest.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=1)
+def load_manifest() -> Dict[str, str]:
+    """Bundle name -> hashed path, or empty if bundles were never built"""
+    try:
+        with open(manifest_path()) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def bundle_paths(name: str) -> List[str]:
+    """
+    Static paths to include for a bundle: the source files in DEBUG or when
+    the bundle hasn't been built, the hashed bundle otherwise
+    """
+    if name not in STATIC_BUNDLES:
+        raise BundleError(f'Unknown bundle {name}')
+    if not settings.DEBUG:
+        built = load_manifest().get(name)
+        if built:
+            return [built]
+    return list(STATIC_BUNDLES[name])
@@ -0,0 +1,228 @@
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+# Text formats worth a precompressed sibling; images and fonts are already compressed
+GZIP_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico')
+GZIP_MIN_SIZE = 256
+FILE_MAX_AGE = getattr(settings, 'FILE_MAX_AGE', 60 * 60)
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+# ============ PRECOMPRESSION ============
+
+def gzip_file(path: str) -> Optional[str]:
+    """
+    Write ``path``.gz next to a compressible file, keeping the source mtime.
+    Returns the new path, or None if the file isn't worth compressing.
+    """
+    if not path.endswith(GZIP_EXTENSIONS) or os.path.getsize(path) < GZIP_MIN_SIZE:
+        return None
+    target = f'{path}.gz'
+    partial = f'{target}.{os.getpid()}.tmp'
+    with open(path, 'rb') as source, open(partial, 'wb') as raw:
+        # mtime=0 keeps the output byte-identical between builds
+        with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed)
+    if os.path.getsize(partial) >= os.path.getsize(path):
+        os.remove(partial)
+        return None
+    stat = os.stat(path)
+    os.utime(partial, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(partial, target)
+    return target
+
+
+# ============ SERVING ============
+
+class _FileRange:
+    """
+    File limited to ``length`` bytes from its current position.
+
+    ``fileno`` is kept so a WSGI file wrapper can still sendfile() the range;
+    the server takes the offset from the descriptor and the length from
+    Content-Length. There is deliberately no ``seek``/``tell``, so
+    FileResponse doesn't recompute Content-Length for the whole file.
+    """
+    def __init__(self, file, length: int):
+        self.file = file
+        self.remaining = length
+        self.name = file.name
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _etag(stat: os.stat_result) -> str:
+    # Strong: a changed file always changes size or mtime
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    ``(start, end)`` inclusive for a single ``bytes=`` range, ``(0, -1)`` if
+    it cannot be satisfied, None if it should be ignored (malformed, multiple
+    or reversed ranges such as ``bytes=5-3``, which are answered with the
+    whole file as RFC 9110 requires)
+    """
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return 0, -1
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return 0, -1
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _accepts_gzip(header: str) -> bool:
+    """
+    Whether an ``Accept-Encoding`` header allows gzip: listed (or covered by
+    ``*``) with a q-value above zero. An explicit ``gzip`` entry wins over ``*``.
+    """
+    wildcard = None
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        coding = coding.lower()
+        if coding in ('gzip', 'x-gzip'):
+            return quality > 0
+        if coding == '*':
+            wildcard = quality > 0
+    return bool(wildcard)
+
+
+def _resolve(document_root: str, path: str) -> Optional[str]:
+    try:
+        full_path = safe_join(document_root, path.lstrip('/'))
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def serve_file(request, path: str, document_root: str, immutable: bool = False):
+    """
+    Serve ``path`` from ``document_root`` like ``django.views.static.serve``,
+    but fit for production:
+
+    - a precompressed ``.gz`` sibling is sent to clients accepting gzip
+    - strong ETags with ``If-None-Match``, falling back to ``If-Modified-Since``
+    - single ``Range`` requests (and ``If-Range``) on the identity encoding
+    - the body is a FileResponse, so WSGI servers with ``wsgi.file_wrapper``
+      send it with zero-copy sendfile()
+
+    Returns None if there is no such file, so callers can fall through.
+    """
+    full_path = _resolve(document_root, path)
+    if full_path is None:
+        return None
+    if request.method not in ('GET', 'HEAD'):
+        response = HttpResponse(status=405)
+        response['Allow'] = 'GET, HEAD'
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    # An archive requested as such (foo.tar.gz) is sent as opaque bytes
+    content_type = (encoding is None and content_type) or 'application/octet-stream'
+    range_header = request.META.get('HTTP_RANGE')
+
+    # Ranges address the identity bytes, so they are never served compressed
+    served_path, content_encoding = full_path, None
+    gzipped = f'{full_path}.gz'
+    accepts_gzip = _accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if not range_header and encoding is None and accepts_gzip and os.path.isfile(gzipped):
+        if os.stat(gzipped).st_mtime_ns >= os.stat(full_path).st_mtime_ns:
+            served_path, content_encoding = gzipped, 'gzip'
+
+    stat = os.stat(served_path)
+    etag = _etag(stat)
+    if content_encoding:
+        etag = f'{etag[:-1]}-gz"'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = (
+            'public, max-age=31536000, immutable' if immutable else f'public, max-age={FILE_MAX_AGE}'
+        )
+        if os.path.isfile(gzipped):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        if etag in parse_etags(if_none_match) or if_none_match.strip() == '*':
+            return finish(HttpResponseNotModified())
+    elif request.META.get('HTTP_IF_MODIFIED_SINCE') == http_date(stat.st_mtime):
+        return finish(HttpResponseNotModified())
+
+    byte_range = None
+    if range_header:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None or if_range.strip() == etag:
+            byte_range = _parse_range(range_header, stat.st_size)
+    if byte_range == (0, -1):
+        response = finish(HttpResponse(status=416))
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(served_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(_FileRange(file, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    return finish(response)
+
+
+def serve(request, path: str, document_root: str, immutable: bool = False):
+    """URLconf view over serve_file, drop-in for ``django.views.static.serve``"""
+    response = serve_file(request, path, document_root, immutable)
+    if response is None:
+        raise Http404(f'{path} not found')
+    return response
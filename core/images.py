@@ -0,0 +1,137 @@
+import logging
+import os
+from io import BytesIO
+from typing import Iterator, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 85)
+IMAGE_NORMALIZATION_APPS = getattr(settings, 'IMAGE_NORMALIZATION_APPS', [])
+
+# Stored originals are re-encoded as WebP, which keeps transparency, unless
+# their own format comes out smaller
+IMAGE_FORMAT = 'WEBP'
+IMAGE_EXTENSION = 'webp'
+IMAGE_EXTENSIONS = {IMAGE_FORMAT: IMAGE_EXTENSION, 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def image_fields() -> Iterator[Tuple[type, models.ImageField]]:
+    """Every ImageField declared by the apps in ``IMAGE_NORMALIZATION_APPS``"""
+    for app_label in IMAGE_NORMALIZATION_APPS:
+        for model in apps.get_app_config(app_label).get_models():
+            for field in model._meta.fields:
+                if isinstance(field, models.ImageField):
+                    yield model, field
+
+
+def _encode(image: Image.Image, image_format: str) -> BytesIO:
+    output = BytesIO()
+    if image_format == 'JPEG':
+        image.save(output, image_format, quality=IMAGE_QUALITY, optimize=True)
+    elif image_format == 'PNG':
+        image.save(output, image_format, optimize=True)
+    else:
+        image.save(output, image_format, quality=IMAGE_QUALITY, method=4)
+    return output
+
+
+def normalize_image(file, name: str) -> Optional[ContentFile]:
+    """
+    Re-encode an uploaded image: apply and drop EXIF orientation, cap the
+    longest side and strip every piece of metadata (GPS position included).
+
+    The result is WebP unless re-encoding in the upload's own JPEG or PNG
+    format comes out smaller. Returns None only when the file isn't a
+    readable image.
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            source_format = image.format
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) > IMAGE_MAX_DIMENSION:
+                image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+            # Some encoders fall back to the decoded metadata; keep only what
+            # describes the pixels themselves
+            image.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+
+            encoded = {IMAGE_FORMAT: _encode(image, IMAGE_FORMAT)}
+            if source_format == 'PNG' or (source_format == 'JPEG' and image.mode == 'RGB'):
+                encoded[source_format] = _encode(image, source_format)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning('Cannot normalize image %s: %s', name, error)
+        return None
+    finally:
+        file.seek(0)
+
+    image_format = min(encoded, key=lambda candidate: encoded[candidate].tell())
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return ContentFile(encoded[image_format].getvalue(), name=f'{stem}.{IMAGE_EXTENSIONS[image_format]}')
+
+
+def needs_normalization(file) -> bool:
+    """
+    Whether a stored picture still carries metadata or exceeds the size cap;
+    normalized pictures kept in their JPEG or PNG format don't
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            return (
+                max(image.size) > IMAGE_MAX_DIMENSION
+                or bool(image.getexif())
+                or any(key in image.info for key in ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment'))
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    finally:
+        file.seek(0)
+
+
+def is_default(field: models.ImageField, name: str) -> bool:
+    return not name or name == field.default
+
+
+def normalize_stored_image(model_label: str, pk, field_name: str, only_if_needed: bool = False) -> bool:
+    """
+    Normalize a picture that is already in storage and point the instance at
+    the new file; the replaced original is deleted. Returns True if changed.
+
+    With ``only_if_needed``, pictures that have already been normalized are
+    left alone rather than re-encoded once more.
+    """
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return False
+    field_file = getattr(instance, field_name)
+    field = field_file.field
+    if is_default(field, field_file.name):
+        return False
+
+    try:
+        field_file.open('rb')
+    except (FileNotFoundError, ValueError):
+        return False
+    with field_file:
+        if only_if_needed and not needs_normalization(field_file):
+            return False
+        normalized = normalize_image(field_file, field_file.name)
+    if normalized is None:
+        return False
+
+    original = field_file.name
+    instance._image_normalized = True
+    field_file.save(normalized.name, normalized, save=False)
+    instance.save(update_fields=[field_name])
+    field.storage.delete(original)
+    return True
@@ -0,0 +1,21 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bundles import STATIC_BUNDLES, BundleError, build_bundles
+
+
+class Command(BaseCommand):
+    help = 'Concatenate and minify the STATIC_BUNDLES into content-hashed files under STATIC_ROOT'
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_bundles()
+        except BundleError as error:
+            raise CommandError(error)
+
+        for name, path in sorted(manifest.items()):
+            size = os.path.getsize(os.path.join(settings.STATIC_ROOT, path))
+            self.stdout.write(f'{name}: {len(STATIC_BUNDLES[name])} files -> {path} ({size / 1024:.1f}KB)')
+        self.stdout.write(self.style.SUCCESS(f'Built {len(manifest)} bundles'))
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.thumbnails import (
+    THUMBNAIL_FORMATS, THUMBNAIL_WIDTHS, ThumbnailError, generate_thumbnail, remove_variant_locks, source_digest,
+    thumbnail_name,
+)
+
+
+def _init_worker():
+    # Workers only touch files; make sure they never share the parent's DB connections
+    django.setup()
+    connections.close_all()
+
+
+def _generate_variants(name: str):
+    """Render every missing variant of one picture; returns (generated, skipped, error)"""
+    digest = source_digest(name)
+    if digest is None:
+        return 0, 0, f'{name}: source file missing'
+    generated = skipped = 0
+    for width in THUMBNAIL_WIDTHS:
+        for extension in THUMBNAIL_FORMATS:
+            existed = os.path.exists(default_storage.path(thumbnail_name(digest, width, extension)))
+            try:
+                # Existing files are only recorded in the picture's manifest entry
+                generate_thumbnail(name, width, extension)
+            except ThumbnailError as error:
+                return generated, skipped, str(error)
+            if existed:
+                skipped += 1
+            else:
+                generated += 1
+    return generated, skipped, None
+
+
+def picture_names():
+    """Distinct picture names across every model with an uploaded picture"""
+    from store.models import Category, Product
+    from users.models import CustomUser
+
+    names = set()
+    for model in (Product, Category, CustomUser):
+        names.update(model.objects.exclude(picture='').values_list('picture', flat=True).distinct())
+    return sorted(names)
+
+
+class Command(BaseCommand):
+    help = 'Pre-generate missing picture thumbnails for products, categories and users in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--progress-every', type=int, default=100, help='Report progress every N pictures')
+
+    def handle(self, *args, **options):
+        removed = remove_variant_locks()
+        if removed:
+            self.stdout.write(f'Removed {removed} per-variant lock files')
+        names = picture_names()
+        total = len(names)
+        self.stdout.write(f'{total} pictures, {options["workers"]} workers')
+
+        generated = skipped = failed = done = 0
+        started = time.perf_counter()
+        # Existing variants are skipped, so an interrupted run simply resumes
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate_variants, name) for name in names]
+            for future in as_completed(futures):
+                made, existing, error = future.result()
+                generated += made
+                skipped += existing
+                done += 1
+                if error:
+                    failed += 1
+                    self.stderr.write(error)
+                if done % options['progress_every'] == 0 or done == total:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{done}/{total} pictures, {generated} variants generated '
+                        f'({generated / elapsed if elapsed else 0:.1f}/s), {skipped} already present'
+                    )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {generated} variants in {elapsed:.1f}s, skipped {skipped}, {failed} pictures failed'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_EXTENSION, image_fields, is_default, normalize_stored_image
+
+
+class Command(BaseCommand):
+    help = 'Normalize pictures uploaded before upload-time normalization was enabled'
+
+    def handle(self, *args, **options):
+        changed = checked = 0
+        for model, field in image_fields():
+            rows = model._default_manager.exclude(**{field.name: ''}).values_list('pk', field.name)
+            for pk, name in rows.iterator():
+                if is_default(field, name) or name.endswith(f'.{IMAGE_EXTENSION}'):
+                    continue
+                checked += 1
+                if normalize_stored_image(model._meta.label, pk, field.name, only_if_needed=True):
+                    changed += 1
+        self.stdout.write(self.style.SUCCESS(f'Normalized {changed} of {checked} pictures'))
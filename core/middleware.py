@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from core.bundles import STATIC_BUNDLE_DIR
+from core.files import serve_file
+from core.thumbnails import THUMBNAIL_DIR
+
+
+class FileServingMiddleware:
+    """
+    Serve STATIC_ROOT and MEDIA_ROOT directly, before sessions and auth run,
+    so a single box can do without a separate web server. Paths with no
+    file behind them fall through to the URLconf.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # (url prefix, document root, immutable subdirectory)
+        self.roots = [
+            (settings.STATIC_URL, settings.STATIC_ROOT, f'{STATIC_BUNDLE_DIR}/'),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT, f'{THUMBNAIL_DIR}/'),
+        ]
+
+    def __call__(self, request):
+        if getattr(settings, 'SERVE_FILES', True):
+            for prefix, document_root, immutable_dir in self.roots:
+                if prefix and document_root and request.path_info.startswith(prefix):
+                    path = request.path_info[len(prefix):]
+                    # Content-addressed names never change, so they can be cached forever
+                    response = serve_file(request, path, document_root, immutable=path.startswith(immutable_dir))
+                    if response is not None:
+                        return response
+        return self.get_response(request)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_review_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PictureVariants',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('digest', models.CharField(max_length=64)),
+                ('variants', models.JSONField(default=list, help_text='Generated "<width>.<extension>" variants')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Picture Variants',
+                'verbose_name_plural': 'Picture Variants',
+            },
+        ),
+    ]
@@ -165,5 +165,27 @@ class Review(models.Model):
             models.Index(fields=['rating']),
             models.Index(fields=['is_approved']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of a product's review feed
+            models.Index(fields=['product', 'created_at', 'id']),
+            models.Index(fields=['product', 'rating', 'id']),
+            models.Index(fields=['product', 'helpful_count', 'id']),
         ]
         unique_together = [['product', 'author']]  # One review per user per product
+
+
+class PictureVariants(models.Model):
+    """
+    Content digest of an uploaded picture and the thumbnail variants
+    generated from it, shared by every worker, see core.thumbnails
+    """
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64)
+    variants = models.JSONField(default=list, help_text='Generated "<width>.<extension>" variants')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+    class Meta:
+        verbose_name = 'Picture Variants'
+        verbose_name_plural = 'Picture Variants'
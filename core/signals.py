@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_save
+
+from core.images import image_fields, is_default, normalize_image, normalize_stored_image
+
+_fields = defaultdict(list)
+
+
+# ============ UPLOADED IMAGES ============
+
+def remember_stored_images(sender, instance, **kwargs):
+    """Note the picture names as loaded, to spot ones replaced before save"""
+    instance._stored_images = {}
+    for field in _fields[sender]:
+        value = instance.__dict__.get(field.attname)
+        instance._stored_images[field.attname] = getattr(value, 'name', value)
+
+
+def normalize_new_uploads(sender, instance, **kwargs):
+    """
+    Re-encode a freshly uploaded picture before it is written, so the
+    original with its EXIF and GPS data never reaches storage; pictures
+    that are already in storage are left for after the commit
+    """
+    instance._pending_images = []
+    if getattr(instance, '_image_normalized', False):
+        return
+    stored = getattr(instance, '_stored_images', {})
+    for field in _fields[sender]:
+        field_file = getattr(instance, field.attname)
+        if is_default(field, field_file.name):
+            continue
+        if not field_file._committed:
+            normalized = normalize_image(field_file, field_file.name)
+            if normalized is not None:
+                setattr(instance, field.attname, normalized)
+        elif field_file.name != stored.get(field.attname):
+            instance._pending_images.append(field.name)
+
+
+def normalize_pending_uploads(sender, instance, **kwargs):
+    label, pk = instance._meta.label, instance.pk
+    for field_name in getattr(instance, '_pending_images', ()):
+        transaction.on_commit(lambda field_name=field_name: normalize_stored_image(label, pk, field_name))
+    instance._pending_images = []
+    remember_stored_images(sender, instance)
+
+
+def connect_image_signals():
+    """Hook every project model that has an ImageField"""
+    for model, field in image_fields():
+        _fields[model].append(field)
+    for model in _fields:
+        uid = model._meta.label
+        post_init.connect(remember_stored_images, sender=model, dispatch_uid=f'remember-images-{uid}')
+        pre_save.connect(normalize_new_uploads, sender=model, dispatch_uid=f'normalize-images-{uid}')
+        post_save.connect(normalize_pending_uploads, sender=model, dispatch_uid=f'pending-images-{uid}')
@@ -0,0 +1,14 @@
+from django.contrib.staticfiles.storage import StaticFilesStorage
+
+from core.files import gzip_file
+
+
+class GzipStaticFilesStorage(StaticFilesStorage):
+    """Writes a precompressed ``.gz`` sibling for each collected text asset"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            compressed = gzip_file(self.path(name))
+            yield name, name, compressed is not None
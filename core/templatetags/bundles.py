@@ -0,0 +1,16 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from core.bundles import bundle_paths
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """Emit the <link> or <script> tags for a static bundle, see core.bundles"""
+    paths = bundle_paths(name)
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((static(path),) for path in paths))
+    return format_html_join('\n', '<script src="{}"></script>', ((static(path),) for path in paths))
@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.thumbnails import THUMBNAIL_WIDTHS, thumbnail_srcset
+
+register = template.Library()
+
+CARD_SIZES = '(max-width: 600px) 50vw, 320px'
+
+
+def _srcset(candidates):
+    return format_html_join(', ', '{} {}w', candidates)
+
+
+@register.simple_tag
+def responsive_image(picture, alt='', sizes=CARD_SIZES, css_class=''):
+    """
+    Render an uploaded picture as a <picture> with WebP and JPEG srcsets.
+
+    Variants that don't exist yet point at the thumbnail view, which renders
+    them on first request.
+    """
+    name = getattr(picture, 'name', '')
+    if not name:
+        return ''
+
+    webp = thumbnail_srcset(name, 'webp')
+    if webp is None:
+        # Source is missing on disk, let the browser try the original URL
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', picture.url, alt, css_class)
+
+    jpeg = thumbnail_srcset(name, 'jpg')
+    fallback = jpeg[min(1, len(THUMBNAIL_WIDTHS) - 1)][0]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(webp), sizes, fallback, _srcset(jpeg), sizes, alt, css_class,
+    )
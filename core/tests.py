@@ -1,3 +1,200 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from core.bundles import build_bundles, bundle_paths, load_manifest, minify_js
+from core.files import gzip_file, serve_file
+from core.images import IMAGE_MAX_DIMENSION, image_fields
+from core.models import PictureVariants
+from core.templatetags.thumbnails import responsive_image
+from core.thumbnails import get_picture, remove_variant_locks, reset_picture_manifest, thumbnail_url
+from store.models import Category
+
+
+class MinifyJsTests(SimpleTestCase):
+    def test_comments_and_whitespace_go(self):
+        source = 'function f(a, b) {\n    // sum\n    return a + b; /* done */\n}\n'
+        self.assertEqual(minify_js(source), 'function f(a,b){return a+b;}')
+
+    def test_template_literals_are_copied_untouched(self):
+        source = 'const html = `\n    <p>// kept</p>\n    ${ items.map(item => `<li>${ item }</li>`).join("") }\n`;\n'
+        minified = minify_js(source)
+        self.assertIn('`\n    <p>// kept</p>\n    ${', minified)
+        self.assertIn('`<li>${item}</li>`', minified)
+
+    def test_strings_and_regular_expressions_keep_slashes(self):
+        source = "const url = 'http://example.com'; const re = /\\/\\/[^/]+/g; x = a / b / c;\n"
+        self.assertEqual(
+            minify_js(source), "const url='http://example.com';const re=/\\/\\/[^/]+/g;x=a/b/c;"
+        )
+
+    def test_line_breaks_that_end_statements_stay(self):
+        self.assertEqual(minify_js('a = b\n(c)\nx + +y'), 'a=b\n(c)\nx+ +y')
+
+
+class BuildBundlesTests(SimpleTestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.addCleanup(load_manifest.cache_clear)
+
+    def test_manifest_points_at_hashed_bundles(self):
+        with override_settings(STATIC_ROOT=self.static_root, DEBUG=False):
+            manifest = build_bundles()
+            self.assertEqual(bundle_paths('base.js'), [manifest['base.js']])
+        self.assertRegex(manifest['base.js'], r'^bundles/base\.[0-9a-f]{12}\.js$')
+        path = os.path.join(self.static_root, manifest['base.js'])
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(f'{path}.gz'))
+
+    def test_debug_uses_the_sources(self):
+        with override_settings(STATIC_ROOT=self.static_root, DEBUG=True):
+            build_bundles()
+            self.assertEqual(bundle_paths('cart.css'), ['store/css/cart.css', 'store/css/cart-utils.css'])
+
+
+class ServeFileTests(SimpleTestCase):
+    body = b'.brick { color: red; }\n' * 40
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.root, 'site.css'), 'wb') as handle:
+            handle.write(self.body)
+        gzip_file(os.path.join(self.root, 'site.css'))
+
+    def _get(self, **headers):
+        response = serve_file(RequestFactory().get('/static/site.css', **headers), 'site.css', self.root)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+
+    def test_gzip_sibling_follows_accept_encoding_q_values(self):
+        for header, encoded in (
+            ('gzip, deflate', True),
+            ('gzip;q=0.5, br', True),
+            ('gzip;q=0', False),
+            ('deflate, *;q=0.1', True),
+            ('*, gzip;q=0', False),
+            ('identity', False),
+        ):
+            with self.subTest(header=header):
+                response, _ = self._get(HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get('Content-Encoding'), 'gzip' if encoded else None)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_etag_revalidation(self):
+        response, _ = self._get()
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=response['ETag'])[0].status_code, 304)
+        gzipped, _ = self._get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(gzipped['ETag'], response['ETag'])
+
+    def test_ranges(self):
+        response, content = self._get(HTTP_RANGE='bytes=2-6', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((response.status_code, content), (206, self.body[2:7]))
+        self.assertEqual(response['Content-Range'], f'bytes 2-6/{len(self.body)}')
+        self.assertEqual(self._get(HTTP_RANGE='bytes=-4')[1], self.body[-4:])
+        self.assertEqual(self._get(HTTP_RANGE=f'bytes={len(self.body)}-')[0].status_code, 416)
+        # Reversed ranges and a stale If-Range get the whole file
+        self.assertEqual(self._get(HTTP_RANGE='bytes=6-2')[0].status_code, 200)
+        self.assertEqual(self._get(HTTP_RANGE='bytes=2-6', HTTP_IF_RANGE='"stale"')[1], self.body)
+
+
+class ImageNormalizationTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _upload(self, size=(64, 48)):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90 degrees
+        exif[0x8825] = {1: 'N', 2: (52.0, 22.0, 0.0)}  # GPS position
+        output = BytesIO()
+        Image.new('RGB', size, 'red').save(output, 'JPEG', exif=exif)
+        return SimpleUploadedFile('holiday.jpg', output.getvalue(), content_type='image/jpeg')
+
+    def _stored_files(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.media_root) for name in names]
+
+    def test_uploads_are_stored_only_once_normalized(self):
+        category = Category.objects.create(title='Space', slug='space', picture=self._upload())
+        stored = self._stored_files()
+        self.assertEqual(stored, [category.picture.path])
+        with Image.open(category.picture.path) as image:
+            self.assertFalse(image.getexif())
+            self.assertNotIn('exif', image.info)
+            # The orientation is applied to the pixels, then dropped
+            self.assertEqual(image.size, (48, 64))
+
+    def test_large_uploads_are_capped(self):
+        category = Category.objects.create(
+            title='Space', slug='space', picture=self._upload((IMAGE_MAX_DIMENSION + 10, 20))
+        )
+        with Image.open(category.picture.path) as image:
+            self.assertEqual(max(image.size), IMAGE_MAX_DIMENSION)
+
+    def test_only_listed_apps_are_hooked(self):
+        labels = {model._meta.label for model, field in image_fields()}
+        self.assertEqual(labels, {'users.CustomUser', 'store.Category', 'store.Product'})
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        reset_picture_manifest()
+        self.addCleanup(reset_picture_manifest)
+        output = BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(output, 'PNG')
+        upload = SimpleUploadedFile('brick.png', output.getvalue(), content_type='image/png')
+        self.category = Category.objects.create(title='Bricks', slug='bricks', picture=upload)
+        self.name = self.category.picture.name
+
+    def test_first_request_renders_then_pages_link_the_file(self):
+        url = thumbnail_url(self.name, 320, 'webp')
+        self.assertTrue(url.startswith('/thumbnail/320/webp/'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        direct = thumbnail_url(self.name, 320, 'webp')
+        self.assertEqual(response['Location'], direct)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, direct[len('/media/'):])))
+        self.assertEqual(PictureVariants.objects.get(name=self.name).variants, ['320.webp'])
+
+    def test_warm_renders_touch_neither_disk_nor_database(self):
+        responsive_image(self.category.picture)
+        with mock.patch('core.thumbnails.os.path.exists', side_effect=AssertionError), \
+                mock.patch('core.thumbnails._hash_source', side_effect=AssertionError), \
+                self.assertNumQueries(0):
+            self.assertIn('<picture>', responsive_image(self.category.picture))
+
+    def test_cold_workers_read_the_stored_digest(self):
+        digest = get_picture(self.name).digest
+        reset_picture_manifest()
+        with mock.patch('core.thumbnails._hash_source', side_effect=AssertionError):
+            self.assertEqual(get_picture(self.name).digest, digest)
+
+    def test_only_model_pictures_are_rendered(self):
+        stray = os.path.join(self.media_root, 'exports', 'report.png')
+        os.makedirs(os.path.dirname(stray))
+        shutil.copy(self.category.picture.path, stray)
+        self.assertEqual(self.client.get('/thumbnail/320/webp/exports/report.png').status_code, 404)
+        self.assertEqual(self.client.get(f'/thumbnail/321/webp/{self.name}').status_code, 404)
+
+    def test_renders_leave_no_lock_files_behind(self):
+        self.client.get(thumbnail_url(self.name, 160, 'jpg'))
+        digest_dir = os.path.join(self.media_root, 'thumbnails', get_picture(self.name).digest[:2])
+        self.assertEqual([name for _, _, names in os.walk(digest_dir) for name in names], ['160.jpg'])
+        open(os.path.join(digest_dir, get_picture(self.name).digest, '160.jpg.lock'), 'w').close()
+        self.assertEqual(remove_variant_locks(), 1)
@@ -0,0 +1,238 @@
+import fcntl
+import glob
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from core.images import image_fields
+from core.models import PictureVariants
+
+THUMBNAIL_DIR = getattr(settings, 'THUMBNAIL_DIR', 'thumbnails')
+THUMBNAIL_WIDTHS: Tuple[int, ...] = tuple(getattr(settings, 'THUMBNAIL_WIDTHS', (160, 320, 640)))
+THUMBNAIL_QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+
+# Output formats: extension -> Pillow format. WebP first, JPEG as the fallback
+THUMBNAIL_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+# Seconds a worker trusts its copy of a picture's entry before re-reading it,
+# while some of its variants are still missing
+THUMBNAIL_MANIFEST_MAX_AGE = getattr(settings, 'THUMBNAIL_MANIFEST_MAX_AGE', 60)
+# Renders serialize on one of this many lock files, picked by digest
+THUMBNAIL_LOCK_STRIPES = 64
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class Picture(NamedTuple):
+    digest: str
+    variants: FrozenSet[str]
+
+    @property
+    def complete(self) -> bool:
+        return len(self.variants) == len(THUMBNAIL_WIDTHS) * len(THUMBNAIL_FORMATS)
+
+
+# Picture name -> (monotonic time read, entry or None for a missing source)
+_pictures: Dict[str, Tuple[float, Optional[Picture]]] = {}
+
+
+def variant_key(width: int, extension: str) -> str:
+    return f'{width}.{extension}'
+
+
+def source_path(name: str) -> str:
+    """Absolute path of an uploaded file; rejects names outside MEDIA_ROOT"""
+    return default_storage.path(name)
+
+
+def _hash_source(name: str) -> Optional[str]:
+    """SHA-256 of a source image's bytes, or None when the file is missing"""
+    sha = hashlib.sha256()
+    try:
+        with open(source_path(name), 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 16), b''):
+                sha.update(chunk)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        return None
+    return sha.hexdigest()
+
+
+def get_picture(name: str) -> Optional[Picture]:
+    """
+    Digest and generated variants of a picture, or None when the source is
+    missing.
+
+    Entries come from a process-wide memo backed by the PictureVariants
+    table, so a warm render touches neither the database nor the disk, and
+    a cold worker reads the digest instead of hashing the file again. Uploads
+    are never overwritten in place (storage picks a fresh name), so a name
+    keeps its digest; the variants of incomplete entries are re-read every
+    ``THUMBNAIL_MANIFEST_MAX_AGE`` seconds to pick up other workers' renders.
+    """
+    now = time.monotonic()
+    memo = _pictures.get(name)
+    if memo is not None:
+        loaded_at, picture = memo
+        if (picture is not None and picture.complete) or now - loaded_at < THUMBNAIL_MANIFEST_MAX_AGE:
+            return picture
+
+    row = PictureVariants.objects.filter(name=name).values_list('digest', 'variants').first()
+    if row is None:
+        digest = _hash_source(name)
+        if digest is None:
+            _pictures[name] = (now, None)
+            return None
+        stored = PictureVariants.objects.get_or_create(name=name, defaults={'digest': digest})[0]
+        row = stored.digest, stored.variants
+    picture = Picture(row[0], frozenset(row[1]))
+    _pictures[name] = (now, picture)
+    return picture
+
+
+def source_digest(name: str) -> Optional[str]:
+    """SHA-256 of a source image's bytes, or None when the file is missing"""
+    picture = get_picture(name)
+    return picture.digest if picture is not None else None
+
+
+def reset_picture_manifest() -> None:
+    """Forget this worker's picture entries so they are read again"""
+    _pictures.clear()
+
+
+def _record_variant(name: str, digest: str, width: int, extension: str) -> None:
+    key = variant_key(width, extension)
+    with transaction.atomic():
+        row = PictureVariants.objects.select_for_update().get_or_create(name=name, defaults={'digest': digest})[0]
+        if key not in row.variants:
+            row.variants = sorted({*row.variants, key})
+            row.save(update_fields=['variants', 'updated_at'])
+    _pictures[name] = (time.monotonic(), Picture(row.digest, frozenset(row.variants)))
+
+
+def is_known_picture(name: str) -> bool:
+    """Whether some model's picture field points at ``name``, its default included"""
+    if PictureVariants.objects.filter(name=name).exists():
+        return True
+    return any(
+        name == field.default or model._default_manager.filter(**{field.name: name}).exists()
+        for model, field in image_fields()
+    )
+
+
+def thumbnail_name(digest: str, width: int, extension: str) -> str:
+    """Deterministic, content-addressed storage name of one variant"""
+    return f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}/{width}.{extension}'
+
+
+@contextmanager
+def _render_lock(digest: str):
+    """
+    Exclusive lock shared by every worker process. Renders are spread over
+    a fixed set of lock files, so none are left behind per variant.
+    """
+    lock_dir = default_storage.path(f'{THUMBNAIL_DIR}/.locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    stripe = int(digest[:8], 16) % THUMBNAIL_LOCK_STRIPES
+    with open(os.path.join(lock_dir, f'{stripe}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def remove_variant_locks() -> int:
+    """Delete the per-variant ``.lock`` files older releases left next to thumbnails"""
+    pattern = os.path.join(default_storage.path(THUMBNAIL_DIR), '*', '*', '*.lock')
+    removed = 0
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+
+def _render(source: str, target: str, width: int, extension: str) -> None:
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+
+        image_format = THUMBNAIL_FORMATS[extension]
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            background = Image.new('RGB', image.size, 'white')
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        # Write aside and rename, so readers never see a partial file
+        partial = f'{target}.{os.getpid()}.tmp'
+        image.save(partial, image_format, quality=THUMBNAIL_QUALITY, optimize=True)
+        os.replace(partial, target)
+
+
+def generate_thumbnail(name: str, width: int, extension: str) -> str:
+    """
+    Return the storage name of a variant, rendering it first if needed, and
+    record it for every worker.
+
+    Concurrent requests for the same variant wait on a file lock and the
+    losers find the finished file instead of rendering it again.
+    """
+    if width not in THUMBNAIL_WIDTHS or extension not in THUMBNAIL_FORMATS:
+        raise ThumbnailError(f'Unsupported thumbnail {width}.{extension}')
+    picture = get_picture(name)
+    if picture is None:
+        raise ThumbnailError(f'Missing source image {name}')
+
+    target_name = thumbnail_name(picture.digest, width, extension)
+    target = default_storage.path(target_name)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with _render_lock(picture.digest):
+            if not os.path.exists(target):
+                try:
+                    _render(source_path(name), target, width, extension)
+                except (OSError, ValueError, Image.DecompressionBombError) as error:
+                    raise ThumbnailError(f'Cannot render {name}: {error}') from error
+    if variant_key(width, extension) not in picture.variants:
+        _record_variant(name, picture.digest, width, extension)
+    return target_name
+
+
+def thumbnail_url(name: str, width: int, extension: str, picture: Optional[Picture] = None) -> str:
+    """
+    URL of a variant: the file itself once generated, otherwise the view that
+    renders it on first request
+    """
+    picture = picture or get_picture(name)
+    if picture is not None and variant_key(width, extension) in picture.variants:
+        return default_storage.url(thumbnail_name(picture.digest, width, extension))
+    return reverse('core:thumbnail', kwargs={'width': width, 'extension': extension, 'name': name})
+
+
+def thumbnail_srcset(name: str, extension: str) -> Optional[List[Tuple[str, int]]]:
+    """``(url, width)`` for every configured width, or None if the source is missing"""
+    picture = get_picture(name)
+    if picture is None:
+        return None
+    return [(thumbnail_url(name, width, extension, picture), width) for width in THUMBNAIL_WIDTHS]
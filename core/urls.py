@@ -13,4 +13,7 @@ urlpatterns = [
     path('contact/', views.ContactView.as_view(), name='contact'),
     path('privacy-policy/', views.PrivacyPolicyView.as_view(), name='privacy_policy'),
     path('terms-of-service/', views.TermsOfServiceView.as_view(), name='terms_of_service'), 
+
+    # Lazily generated picture variants
+    path('thumbnail/<int:width>/<str:extension>/<path:name>', views.ThumbnailView.as_view(), name='thumbnail'),
 ]
\ No newline at end of file
@@ -1,16 +1,22 @@
+from django.http import Http404
 from django.shortcuts import  redirect
-from django.views.generic import ListView, TemplateView
-from django.db.models import Q
+from django.core.files.storage import default_storage
+from django.views.generic import ListView, TemplateView, View
 from django.contrib import messages
 
 from .models import ContactMessage
 from .forms import ContactForm
-from store.models import Product, Category
+from .thumbnails import ThumbnailError, generate_thumbnail, is_known_picture
+from store.models import Product
+from store.catalog import get_catalog_state
+from store.pagination import CachedCountMixin, CursorPaginationMixin
+from store.search import get_search_index
+from store.snapshot import get_catalog_snapshot
 
 
 # ============ HOME PAGE VIEW ============
 
-class IndexView(ListView):
+class IndexView(CachedCountMixin, CursorPaginationMixin, ListView):
     """
     Store main page showing all products with filters and categories
     """
@@ -20,38 +26,34 @@ class IndexView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).select_related('category')
+        # Listings are filtered and sorted from the in-memory catalog snapshot
+        state = get_catalog_state()
+        self.snapshot = get_catalog_snapshot(state)
         
         # Filter by category
+        category_ids = None
         category_slug = self.request.GET.get('category')
         if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+            category_ids = self.snapshot.category_ids_for_slugs([category_slug])
         
         # Search filter
         search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
-        
-        # Price filter
-        min_price = self.request.GET.get('min_price')
-        max_price = self.request.GET.get('max_price')
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+        product_ids = get_search_index(state).search(search) if search else None
         
         # Sorting
         sort = self.request.GET.get('sort', '-created_at')
-        queryset = queryset.order_by(sort)
         
-        return queryset
+        return self.snapshot.filter(
+            Product.sort_field(sort),
+            category_ids=category_ids,
+            min_price=self.request.GET.get('min_price'),
+            max_price=self.request.GET.get('max_price'),
+            ids=product_ids,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = self.snapshot.categories
         context['selected_category'] = self.request.GET.get('category', '')
         context['search_query'] = self.request.GET.get('search', '')
         context['min_price'] = self.request.GET.get('min_price', '')
@@ -59,14 +61,33 @@ class IndexView(ListView):
         context['sort'] = self.request.GET.get('sort', '-created_at')
         
         # Price range for filter
-        products = Product.objects.filter(is_active=True)
-        if products.exists():
-            context['price_max'] = products.order_by('-price').first().price
-            context['price_min'] = products.order_by('price').first().price
+        if self.snapshot.price_max is not None:
+            context['price_max'] = self.snapshot.price_max
+            context['price_min'] = self.snapshot.price_min
         
         return context
 
 
+# ============ THUMBNAILS ============
+
+class ThumbnailView(View):
+    """
+    Render a picture variant on first request, then send the browser to the
+    generated file; later pages link to the file directly
+    """
+    http_method_names = ['get']
+
+    def get(self, request, width, extension, name):
+        # Only pictures the models point at, not any file under MEDIA_ROOT
+        if not is_known_picture(name):
+            raise Http404('Thumbnail not available')
+        try:
+            target = generate_thumbnail(name, width, extension)
+        except ThumbnailError:
+            raise Http404('Thumbnail not available')
+        return redirect(default_storage.url(target))
+
+
 # ============ LEGAL & INFO PAGES ============
 class PrivacyPolicyView(TemplateView):
     """
@@ -0,0 +1,138 @@
+import logging
+from decimal import Decimal
+from typing import List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from core.background import run_in_background
+from orders.models import Customer, Order, OrderElement
+from store.catalog import next_catalog_revision
+from store.models import Cart, CartItem, Product
+from store.popularity import record_sales
+from store.recommendations import record_order
+from store.stats import refresh_category_stats
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    def __init__(self):
+        super().__init__('Your cart is empty')
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, products: List[str]):
+        super().__init__(f'Not enough stock for: {", ".join(products)}')
+        self.products = products
+
+
+def _decrement_stock(quantities) -> bool:
+    """
+    Take ``{product_id: quantity}`` out of stock in a single UPDATE that only
+    matches when every product still has enough; False means nothing changed.
+    The UPDATE also stamps a new revision, so every worker patches just these
+    products into its catalog caches.
+    """
+    needed = Case(
+        *[When(pk=product_id, then=quantity) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    updated = Product.objects.filter(enough, is_active=True).update(
+        stock=F('stock') - needed, revision=next_catalog_revision()
+    )
+    return updated == len(quantities)
+
+
+def _clear_cart(cart: Cart) -> None:
+    """
+    Empty a cart with one DELETE and one UPDATE whatever its size. The rows
+    are removed without the per-item delete receivers, which would adjust
+    the counters line by line, so the counters are zeroed here instead.
+    Nothing references cart items, so there is no cascade to skip.
+    """
+    items = CartItem.objects.filter(cart=cart)
+    items._raw_delete(items.db)
+    Cart.objects.filter(pk=cart.pk).update(item_count=0, subtotal=Decimal('0.00'), updated_at=timezone.now())
+
+
+def place_order(user, address: str, phone: Optional[str] = None, shipping_cost: Decimal = Decimal('0.00'),
+                order_note: str = '') -> Order:
+    """
+    Turn the user's cart into an order in one transaction.
+
+    Lines are read with their products in one query and written with one
+    bulk insert; stock is decremented by one guarded UPDATE that rolls
+    everything back on oversell. Raises EmptyCart or InsufficientStock.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        items = list(CartItem.objects.filter(cart=cart).select_related('product')) if cart else []
+        if not items:
+            raise EmptyCart
+
+        unavailable = [item.product.name for item in items if not item.product.is_active]
+        if unavailable:
+            raise InsufficientStock(unavailable)
+
+        customer, created = Customer.objects.get_or_create(user=user)
+        customer.phone = phone or customer.phone
+        customer.address = address or customer.address
+        customer.save()
+
+        subtotal = sum((item.get_total_price() for item in items), Decimal('0.00'))
+        order = Order.objects.create(
+            customer=customer,
+            total_price=subtotal + shipping_cost,
+            status=Order.StatusChoice.NEW,
+            address=address or customer.address or 'Not provided',
+            order_note=order_note,
+        )
+        OrderElement.objects.bulk_create([
+            OrderElement(order=order, product=item.product, quantity=item.quantity, price=item.price)
+            for item in items
+        ])
+
+        quantities = {item.product_id: item.quantity for item in items}
+        if not _decrement_stock(quantities):
+            stock = dict(Product.objects.filter(pk__in=quantities).values_list('pk', 'stock'))
+            raise InsufficientStock([
+                item.product.name for item in items if stock.get(item.product_id, 0) < item.quantity
+            ])
+        _clear_cart(cart)
+
+        # Bulk writes send no signals: do what the OrderElement receivers
+        # would have done, once committed and outside the request
+        category_ids = {item.product.category_id for item in items}
+        sales = [(item.product_id, item.quantity) for item in items]
+        transaction.on_commit(
+            lambda: run_in_background(_after_checkout, order.pk, order.registered_at, category_ids, sales)
+        )
+    return order
+
+
+def _after_checkout(order_id, registered_at, category_ids: Set, sales: List[Tuple]) -> None:
+    """
+    Refresh data derived from a committed order. The order stands whatever
+    happens here, so failures are logged rather than raised; the popularity
+    and recommendation rebuild commands repair anything missed, and category
+    stats are recomputed in full on the category's next change.
+    """
+    steps = (
+        (refresh_category_stats, category_ids),
+        (record_sales, sales, registered_at),
+        (record_order, order_id),
+    )
+    for step, *args in steps:
+        try:
+            step(*args)
+        except Exception:
+            logger.exception('%s failed after order %s', step.__name__, order_id)
@@ -0,0 +1,28 @@
+from django.utils.functional import SimpleLazyObject
+
+from store.carts import (
+    EMPTY_CART_SUMMARY, CartSummary, cart_summary as summarize, guest_cart_summary, guest_item_count,
+)
+from store.models import Cart
+
+
+def _request_cart_summary(request):
+    user = getattr(request, 'user', None)
+    if user is None:
+        return EMPTY_CART_SUMMARY
+    if not user.is_authenticated:
+        # The badge only needs the count, kept in the session; prices cost a query
+        return CartSummary(
+            guest_item_count(request.session),
+            SimpleLazyObject(lambda: guest_cart_summary(request.session).subtotal),
+        )
+    try:
+        # Already joined by users.backends.ModelBackendWithCart
+        return summarize(user.cart)
+    except Cart.DoesNotExist:
+        return EMPTY_CART_SUMMARY
+
+
+def cart_summary(request):
+    """``cart_summary.item_count`` and ``cart_summary.subtotal`` for templates"""
+    return {'cart_summary': SimpleLazyObject(lambda: _request_cart_summary(request))}
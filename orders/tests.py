@@ -1,3 +1,197 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orders.checkout import place_order
+from store.carts import OutOfStock, add_to_cart
+from store.models import Cart, CartItem, Category, Product
+
+
+class ConcurrentAddToCartTests(TransactionTestCase):
+    """
+    Add the same product to one cart from many threads at once. Every thread
+    has its own connection, so the rows must be committed, hence a
+    TransactionTestCase.
+    """
+    threads = 8
+    adds = 25
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='stress', email='stress@example.com')
+        category = Category.objects.create(title='Stress', slug='stress')
+        self.cart = Cart.objects.create(user=user)
+        self.category = category
+
+    def _product(self, stock: int) -> Product:
+        return Product.objects.create(
+            name='Stress', slug='stress', price=Decimal('1.25'), stock=stock, category=self.category,
+        )
+
+    def _run(self, product_id):
+        counts = {'added': 0, 'rejected': 0}
+        failures = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def worker():
+            start.wait()
+            try:
+                for _ in range(self.adds):
+                    try:
+                        add_to_cart(self.cart, product_id, 1)
+                        outcome = 'added'
+                    except OutOfStock:
+                        outcome = 'rejected'
+                    with lock:
+                        counts[outcome] += 1
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(failures, [])
+        return counts['added'], counts['rejected']
+
+    def _assert_cart_matches(self, product, added):
+        quantity = CartItem.objects.filter(cart=self.cart, product=product).values_list('quantity', flat=True).first()
+        self.cart.refresh_from_db()
+        self.assertEqual(quantity, added)
+        self.assertEqual(self.cart.item_count, added)
+        self.assertEqual(self.cart.subtotal, added * product.price)
+
+    def test_no_increment_is_lost(self):
+        product = self._product(stock=self.threads * self.adds)
+        added, rejected = self._run(product.pk)
+        self.assertEqual((added, rejected), (self.threads * self.adds, 0))
+        self._assert_cart_matches(product, added)
+
+    def test_stock_is_never_oversold(self):
+        stock = self.threads * self.adds // 2
+        product = self._product(stock=stock)
+        added, rejected = self._run(product.pk)
+        self.assertEqual((added, rejected), (stock, self.threads * self.adds - stock))
+        self._assert_cart_matches(product, added)
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(title='Checkout', slug='checkout')
+
+    def _cart(self, lines):
+        user = get_user_model().objects.create_user(username=f'buyer{lines}', email=f'buyer{lines}@example.com')
+        cart = Cart.objects.create(user=user)
+        for number in range(lines):
+            product = Product.objects.create(
+                name=f'Set {lines}.{number}', slug=f'set-{lines}-{number}', price=Decimal('2.50'), stock=5,
+                category=self.category,
+            )
+            add_to_cart(cart, product.pk, 2)
+        return user, cart
+
+    def _checkout_queries(self, lines):
+        user, cart = self._cart(lines)
+        with CaptureQueriesContext(connection) as queries:
+            place_order(user, 'Brick Lane 1')
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (0, Decimal('0.00')))
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        queries = self._checkout_queries(3)
+        self.assertEqual(self._checkout_queries(40), queries)
+        self.assertLessEqual(queries, 16)
+
+    def test_derived_data_is_refreshed_after_commit(self):
+        user, cart = self._cart(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, 'Brick Lane 1')
+        self.category.stats.refresh_from_db()
+        self.assertEqual(self.category.stats.product_count, 2)
+        self.assertTrue(all(
+            score > 0 for score in Product.objects.values_list('popularity_score', flat=True)
+        ))
+
+
+class BatchCartTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('batcher', 'batcher@example.com', 'secret-pass-1')
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        category = Category.objects.create(title='Batch', slug='batch')
+        self.products = [
+            Product.objects.create(
+                name=f'Set {number}', slug=f'batch-set-{number}', price=Decimal('4.00'), stock=5, category=category,
+            )
+            for number in range(3)
+        ]
+        add_to_cart(self.cart, self.products[0].pk, 1)
+        add_to_cart(self.cart, self.products[1].pk, 2)
+
+    def _post(self, operations):
+        return self.client.post(
+            '/orders/cart/batch/', json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def _quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product__slug', 'quantity'))
+
+    def test_operations_apply_in_order(self):
+        first, second, third = (str(product.pk) for product in self.products)
+        response = self._post([
+            {'op': 'add', 'product_id': first, 'quantity': 2},
+            {'op': 'remove', 'product_id': second},
+            {'op': 'add', 'product_id': third},
+            {'op': 'update', 'product_id': third, 'quantity': 4},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._quantities(), {'batch-set-0': 3, 'batch-set-2': 4})
+        data = response.json()
+        self.assertEqual((data['cart_count'], data['cart_total']), (7, '28.00'))
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (7, Decimal('28.00')))
+
+    def test_a_failing_operation_rejects_the_whole_batch(self):
+        response = self._post([
+            {'op': 'add', 'product_id': str(self.products[2].pk), 'quantity': 1},
+            {'op': 'add', 'product_id': str(self.products[0].pk), 'quantity': 5},
+            {'op': 'update', 'product_id': str(self.products[1].pk), 'quantity': -1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['2'])
+
+        response = self._post([
+            {'op': 'add', 'product_id': str(self.products[2].pk), 'quantity': 1},
+            {'op': 'add', 'product_id': str(self.products[0].pk), 'quantity': 5},
+        ])
+        self.assertEqual(response.json()['errors'], {'1': 'Only 5 items available in stock'})
+        self.assertEqual(self._quantities(), {'batch-set-0': 1, 'batch-set-1': 2})
+
+    def test_malformed_bodies_are_rejected(self):
+        response = self.client.post('/orders/cart/batch/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post([{'op': 'explode', 'product_id': 1}]).status_code, 400)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(operations):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self._post(operations).status_code, 200)
+            return len(captured.captured_queries)
+
+        one = queries([{'op': 'update', 'product_id': str(self.products[0].pk), 'quantity': 2}])
+        three = queries([
+            {'op': 'update', 'product_id': str(product.pk), 'quantity': 3} for product in self.products
+        ])
+        self.assertLessEqual(three, one + 1)
@@ -11,6 +11,7 @@ urlpatterns = [
     path('cart/remove/', views.RemoveFromCartView.as_view(), name='remove_from_cart'),
     path('cart/update/', views.UpdateCartItemView.as_view(), name='update_cart'),
     path('cart/clear/', views.ClearCartView.as_view(), name='clear_cart'),
+    path('cart/batch/', views.BatchCartView.as_view(), name='batch_cart'),
     
     # Checkout URLs
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
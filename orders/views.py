@@ -3,10 +3,19 @@ from django.views.generic import TemplateView, View, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from decimal import Decimal
+import json
 
+from store.carts import (
+    CartError, CartOperationError, add_to_cart, add_to_guest_cart, apply_cart_operations, cart_state,
+    get_user_cart, parse_cart_operations,
+)
 from store.models import Cart, CartItem, Product
-from orders.models import Order, Customer, OrderElement
+from store.recommendations import frequently_bought_with
+from orders.checkout import EmptyCart, InsufficientStock, place_order
+from orders.models import Order, Customer
 
 
 # ============ CART VIEWS ============
@@ -24,6 +33,9 @@ class CartView(LoginRequiredMixin, TemplateView):
         
         context['cart'] = cart
         context['cart_items'] = cart.items.all().select_related('product')
+        context['recommended_products'] = frequently_bought_with(
+            cart.items.values_list('product_id', flat=True)
+        )
         context['total_price'] = cart.get_total_price()
         context['total_items'] = cart.get_total_items()
         
@@ -41,20 +53,11 @@ class CartView(LoginRequiredMixin, TemplateView):
 
 class AddToCartView(View):
     """
-    Add a product to the user's cart (AJAX endpoint)
-    Requires authentication
+    Add a product to the user's cart, or a guest's session cart (AJAX endpoint)
     """
 
     def post(self, request, *args, **kwargs):
         try:
-            # Check if user is authenticated
-            if not request.user.is_authenticated:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'Please log in to add items to cart',
-                    'requires_login': True
-                }, status=401)
-            
             product_id = request.POST.get('product_id')
             
             # Validate product_id
@@ -81,46 +84,29 @@ class AddToCartView(View):
                 }, status=400)
             
             try:
-                product = Product.objects.get(id=product_id, is_active=True)
-            except Product.DoesNotExist:
+                if request.user.is_authenticated:
+                    line = add_to_cart(get_user_cart(request.user), product_id, quantity)
+                else:
+                    # Guests keep their cart in the session until they sign in
+                    line = add_to_guest_cart(request.session, product_id, quantity)
+            except (Product.DoesNotExist, ValueError, ValidationError):
                 return JsonResponse({
                     'success': False,
                     'message': 'Product not found'
                 }, status=404)
-            
-            # Validate stock
-            if product.stock < quantity:
+            except CartError as e:
                 return JsonResponse({
                     'success': False,
-                    'message': f'Only {product.stock} items available in stock'
+                    'message': str(e)
                 }, status=400)
             
-            if request.user.is_authenticated:
-                # For authenticated users, use database cart
-                cart, created = Cart.objects.get_or_create(user=request.user)
-                
-                # Add or update cart item
-                try:
-                    cart_item = CartItem.objects.get(cart=cart, product=product)
-                    # Item already in cart, update quantity
-                    cart_item.quantity += quantity
-                    cart_item.save()
-                except CartItem.DoesNotExist:
-                    # Create new cart item
-                    CartItem.objects.create(
-                        cart=cart,
-                        product=product,
-                        price=product.price,
-                        quantity=quantity
-                    )
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': f'{product.name} added to cart',
-                    'cart_count': cart.get_total_items(),
-                    'cart_total': str(cart.get_total_price()),
-                    'requires_login': False
-                })
+            return JsonResponse({
+                'success': True,
+                'message': f'{line.product_name} added to cart',
+                'cart_count': line.summary.item_count,
+                'cart_total': str(line.summary.subtotal),
+                'requires_login': False
+            })
         
         except Exception as e:
             import logging
@@ -153,6 +139,7 @@ class RemoveFromCartView(LoginRequiredMixin, View):
             cart = cart_item.cart
             product_name = cart_item.product.name
             cart_item.delete()
+            cart.refresh_from_db(fields=['item_count', 'subtotal'])
             
             return JsonResponse({
                 'success': True,
@@ -220,6 +207,49 @@ class UpdateCartItemView(LoginRequiredMixin, View):
             }, status=404)
 
 
+class BatchCartView(LoginRequiredMixin, View):
+    """
+    Apply a list of add/update/remove operations to the cart in one request
+    (JSON endpoint). The batch is all or nothing.
+
+    Body: {"operations": [{"op": "add", "product_id": 1, "quantity": 2},
+                          {"op": "update", "product_id": 2, "quantity": 5},
+                          {"op": "remove", "product_id": 3}]}
+    """
+    login_url = 'users:login'
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid JSON'
+            }, status=400)
+        
+        try:
+            operations = parse_cart_operations(payload.get('operations') if isinstance(payload, dict) else None)
+            cart = get_user_cart(request.user)
+            apply_cart_operations(cart, operations)
+        except CartOperationError as e:
+            return JsonResponse({
+                'success': False,
+                'message': 'Cart was not changed',
+                'errors': {str(index): message for index, message in e.errors.items()}
+            }, status=400)
+        except IntegrityError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Cart changed while updating, please try again'
+            }, status=409)
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Cart updated',
+            **cart_state(cart)
+        })
+
+
 class ClearCartView(LoginRequiredMixin, View):
     """
     Clear all items from the cart
@@ -297,59 +327,32 @@ class PlaceOrderView(LoginRequiredMixin, View):
     login_url = 'users:login'
 
     def post(self, request, *args, **kwargs):
+        # Create order with shipping cost from session
+        shipping_cost_str = request.session.get('shipping_cost', '10.00')
         try:
-            cart = Cart.objects.get(user=request.user)
-            
-            if not cart.items.exists():
-                messages.error(request, 'Your cart is empty')
-                return redirect('orders:cart')
-            
-            # Get or create customer
-            customer, created = Customer.objects.get_or_create(user=request.user)
-            
-            # Update customer info from form
-            customer.phone = request.POST.get('phone', customer.phone)
-            customer.address = request.POST.get('address', customer.address)
-            customer.save()
-            
-            # Create order with shipping cost from session
-            shipping_cost_str = request.session.get('shipping_cost', '10.00')
-            try:
-                shipping_cost = Decimal(shipping_cost_str)
-            except:
-                shipping_cost = Decimal('10.00')
-            
-            subtotal = cart.get_total_price()
-            total = subtotal + shipping_cost
-            
-            order = Order.objects.create(
-                customer=customer,
-                total_price=total,
-                status='N',
-                address=request.POST.get('address', customer.address) or 'Not provided'
-            )
-            
-            # Add items to order
-            for cart_item in cart.items.all():
-                OrderElement.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.price
-                )
-            
-            # Clear cart
-            cart.items.all().delete()
-            
-            messages.success(request, 'Order placed successfully!')
-            return redirect('orders:order_confirmation', order_uuid=order.uuid)
+            shipping_cost = Decimal(shipping_cost_str)
+        except:
+            shipping_cost = Decimal('10.00')
         
-        except Cart.DoesNotExist:
-            messages.error(request, 'Cart not found')
+        try:
+            order = place_order(
+                request.user,
+                address=request.POST.get('address', ''),
+                phone=request.POST.get('phone'),
+                shipping_cost=shipping_cost,
+            )
+        except EmptyCart as e:
+            messages.error(request, str(e))
+            return redirect('orders:cart')
+        except InsufficientStock as e:
+            messages.error(request, str(e))
             return redirect('orders:cart')
         except Exception as e:
             messages.error(request, f'Error placing order: {str(e)}')
             return redirect('orders:checkout')
+        
+        messages.success(request, 'Order placed successfully!')
+        return redirect('orders:order_confirmation', order_uuid=order.uuid)
 
 
 class OrderConfirmationView(LoginRequiredMixin, DetailView):
@@ -121,8 +121,8 @@ function showMessage(element, message, type) {
 }
 
 // Add fade-in animation
-const style = document.createElement('style');
-style.textContent = `
+const newsletterStyle = document.createElement('style');
+newsletterStyle.textContent = `
     @keyframes fadeIn {
         from {
             opacity: 0;
@@ -134,4 +134,4 @@ style.textContent = `
         }
     }
 `;
-document.head.appendChild(style);
+document.head.appendChild(newsletterStyle);
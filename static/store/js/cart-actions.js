@@ -49,3 +49,23 @@ function handleNewsletter(e) {
     e.preventDefault();
     alert('Thank you for subscribing!');
 }
+
+/* Apply several cart changes in one request, e.g.
+   applyCartOperations([{op: 'add', product_id: 1, quantity: 2}, {op: 'remove', product_id: 3}]) */
+function applyCartOperations(operations, url = '/orders/cart/batch/') {
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify({operations: operations})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.cart_count !== undefined) {
+            updateCartCount(data.cart_count);
+        }
+        return data;
+    });
+}
@@ -25,12 +25,53 @@ class ReviewSystem {
             reviewForm.addEventListener('submit', (e) => this.submitReview(e));
         }
 
-        // Helpful/Unhelpful buttons
-        const helpfulButtons = document.querySelectorAll('.helpful-btn');
-        const unhelpfulButtons = document.querySelectorAll('.unhelpful-btn');
-        
-        helpfulButtons.forEach(btn => btn.addEventListener('click', (e) => this.markHelpful(e)));
-        unhelpfulButtons.forEach(btn => btn.addEventListener('click', (e) => this.markUnhelpful(e)));
+        // Helpful/Unhelpful and "load more" buttons (delegated, reviews are loaded in pages)
+        document.addEventListener('click', (e) => {
+            if (e.target.closest('.helpful-btn')) {
+                this.markHelpful(e);
+            } else if (e.target.closest('.unhelpful-btn')) {
+                this.markUnhelpful(e);
+            } else if (e.target.closest('.load-more-reviews')) {
+                this.loadMoreReviews(e);
+            }
+        });
+
+        // Review sorting
+        const reviewSort = document.getElementById('review-sort');
+        if (reviewSort) {
+            reviewSort.addEventListener('change', () => this.sortReviews(reviewSort));
+        }
+    }
+
+    loadMoreReviews(e) {
+        e.preventDefault();
+        const button = e.target.closest('.load-more-reviews');
+        button.disabled = true;
+
+        fetch(button.dataset.url)
+        .then(response => response.text())
+        .then(html => {
+            button.insertAdjacentHTML('afterend', html);
+            button.remove();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.disabled = false;
+            showErrorMessage('Failed to load more reviews');
+        });
+    }
+
+    sortReviews(select) {
+        const reviewsList = document.getElementById('reviews-list');
+        fetch(`${select.dataset.url}?sort=${encodeURIComponent(select.value)}`)
+        .then(response => response.text())
+        .then(html => {
+            reviewsList.innerHTML = html;
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showErrorMessage('Failed to sort reviews');
+        });
     }
 
     updateRatingDisplay(rating, container) {
@@ -121,7 +162,7 @@ class ReviewSystem {
         const formData = new FormData();
         formData.append('action', action);
 
-        fetch(`/core/review/${reviewId}/helpful/`, {
+        fetch(`/review/${reviewId}/helpful/`, {
             method: 'POST',
             body: formData,
             headers: {
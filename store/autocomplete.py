@@ -0,0 +1,289 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from store.catalog import CatalogState, changed_products, get_catalog_state
+from store.search import tokenize
+
+# Number of completions cached on every trie node
+TOP_K = 10
+
+# Characters of a key the trie branches on; see AutocompleteTrie
+MAX_DEPTH = 8
+
+
+def normalize(text: Optional[str]) -> str:
+    """Normalize a name into the form stored in the trie"""
+    return ' '.join(tokenize(text))
+
+
+def suffix_keys(display: str) -> List[str]:
+    """Every word suffix of a normalized name ("millennium falcon", "falcon")"""
+    words = normalize(display).split()
+    return [' '.join(words[position:]) for position in range(len(words))]
+
+
+class _Node:
+    __slots__ = ('children', 'keys', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        # Full key -> {entry_id: weight} for keys ending at this node, or
+        # passing through it on a node at MAX_DEPTH
+        self.keys: Dict[str, Dict[object, float]] = {}
+        self.top: List[Tuple[float, str, object]] = []
+
+
+class AutocompleteTrie:
+    """
+    Prefix trie of normalized names with weights.
+
+    Each name is inserted under every word suffix ("millennium falcon" is also
+    reachable from "falcon"), and every node caches its best ``TOP_K`` entries,
+    so a lookup is a walk down the prefix followed by a list slice.
+
+    The trie stops at ``MAX_DEPTH`` characters: longer keys are kept on their
+    node at that depth, and longer prefixes are matched against that node's
+    few keys. Without the cap most nodes would sit on single-child chains
+    spelling out the unique tail of one name.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._entries: Dict[object, Tuple[str, float, List[str]]] = {}
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[object, str, float]]) -> 'AutocompleteTrie':
+        """
+        Build a trie from ``(entry_id, display, weight)`` in one pass: every
+        entry is placed first, then each node's top entries are computed
+        once, children before parents. Adding entries one by one instead
+        re-ranks the whole path to the root for every key.
+        """
+        trie = cls()
+        for entry_id, display, weight in entries:
+            keys = suffix_keys(display)
+            if not keys:
+                continue
+            trie._entries[entry_id] = (display, weight, keys)
+            for key in keys:
+                node = trie._root
+                for char in key[:MAX_DEPTH]:
+                    child = node.children.get(char)
+                    if child is None:
+                        child = node.children[char] = _Node()
+                    node = child
+                node.keys.setdefault(key, {})[entry_id] = weight
+
+        stack = [(trie._root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done or not node.children:
+                node.top = trie._rank(node)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+        return trie
+
+    def add(self, entry_id, display: str, weight: float = 0.0) -> None:
+        """Insert or replace an entry"""
+        keys = suffix_keys(display)
+        with self._lock:
+            self._remove(entry_id)
+            if not keys:
+                return
+            self._entries[entry_id] = (display, weight, keys)
+            for key in keys:
+                path = self._walk(key[:MAX_DEPTH], create=True)
+                path[-1].keys.setdefault(key, {})[entry_id] = weight
+                self._refresh(path)
+
+    def remove(self, entry_id) -> None:
+        """Drop an entry"""
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id) -> None:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return
+        # Unlink every key before re-ranking: keys cut to MAX_DEPTH can share
+        # a node, which must not rank the entry being removed
+        paths = []
+        for key in entry[2]:
+            path = self._walk(key[:MAX_DEPTH])
+            if path is None:
+                continue
+            node = path[-1]
+            entries = node.keys.get(key)
+            if entries is not None:
+                entries.pop(entry_id, None)
+                if not entries:
+                    del node.keys[key]
+            paths.append((key[:MAX_DEPTH], path))
+        del self._entries[entry_id]
+        for key, path in paths:
+            self._refresh(path)
+            self._prune(key, path)
+
+    def _walk(self, key: str, create: bool = False) -> Optional[List[_Node]]:
+        node = self._root
+        path = [node]
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _refresh(self, path: List[_Node]) -> None:
+        """Recompute cached top entries from the deepest node up to the root"""
+        for node in reversed(path):
+            node.top = self._rank(node)
+
+    def _rank(self, node: _Node, prefix: Optional[str] = None) -> List[Tuple[float, str, object]]:
+        """
+        A node's best entries, deduplicated: its own and its children's, or
+        with a ``prefix`` only those of its keys starting with it
+        """
+        if prefix is None and not node.keys and len(node.children) == 1:
+            # A node with a single child ranks exactly like it; the lists are
+            # never mutated, only replaced, so they can be shared
+            return next(iter(node.children.values())).top
+        candidates = [
+            (-weight, self._entries[entry_id][0], entry_id)
+            for key, entries in node.keys.items() if prefix is None or key.startswith(prefix)
+            for entry_id, weight in entries.items()
+        ]
+        if prefix is None:
+            for child in node.children.values():
+                candidates.extend(child.top)
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+        top, seen = [], set()
+        for candidate in candidates:
+            if candidate[2] in seen:
+                continue
+            seen.add(candidate[2])
+            top.append(candidate)
+            if len(top) == TOP_K:
+                break
+        return top
+
+    @staticmethod
+    def _prune(key: str, path: List[_Node]) -> None:
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.children or node.keys:
+                break
+            # Already unlinked when another key of the entry shared the path
+            if path[depth - 1].children.get(key[depth - 1]) is node:
+                del path[depth - 1].children[key[depth - 1]]
+
+    def complete(self, prefix: str, limit: int = TOP_K) -> List[str]:
+        """Return up to ``limit`` distinct names starting with the prefix, most popular first"""
+        key = normalize(prefix)
+        if not key:
+            return []
+        with self._lock:
+            path = self._walk(key[:MAX_DEPTH])
+            if path is None:
+                return []
+            top = path[-1].top if len(key) <= MAX_DEPTH else self._rank(path[-1], key)
+        return list(dict.fromkeys(display for _, display, _ in top))[:limit]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AutocompleteService:
+    """
+    Product and category name completions kept entirely in memory
+    """
+
+    def __init__(self, products: Optional[AutocompleteTrie] = None,
+                 categories: Optional[AutocompleteTrie] = None, version: int = 0, revision: int = 0):
+        self.products = products or AutocompleteTrie()
+        self.categories = categories or AutocompleteTrie()
+        self.version = version
+        self.revision = revision
+
+    def suggest(self, prefix: str, product_limit: int = 10, category_limit: int = 5) -> Dict[str, List[str]]:
+        return {
+            'products': self.products.complete(prefix, product_limit),
+            'categories': self.categories.complete(prefix, category_limit),
+        }
+
+
+# ============ PROCESS-WIDE SERVICE ============
+
+_service: Optional[AutocompleteService] = None
+_service_lock = threading.Lock()
+
+
+def build_autocomplete(state: Optional[CatalogState] = None) -> AutocompleteService:
+    """
+    Build the tries from the database, stamped with the catalog version and
+    revision read before the rows.
+
+    Products are weighted by their time-decayed popularity score, kept
+    current by patching, and categories by active product count as of the
+    build.
+    """
+    from django.db.models import Count, Q
+
+    from store.models import Category, Product
+
+    if state is None:
+        state = get_catalog_state()
+    products = Product.objects.filter(is_active=True).values_list('id', 'name', 'popularity_score')
+    categories = Category.objects.annotate(
+        active_products=Count('products', filter=Q(products__is_active=True))
+    ).values_list('id', 'title', 'active_products')
+    return AutocompleteService(
+        AutocompleteTrie.from_entries(products.iterator()),
+        AutocompleteTrie.from_entries(
+            (category_id, title, float(active_products)) for category_id, title, active_products in categories
+        ),
+        *state,
+    )
+
+
+def patch_autocomplete(service: AutocompleteService, revision: int) -> None:
+    """Re-insert only the products stamped since the service's revision"""
+    for product_id, is_active, name, popularity_score in changed_products(
+            service.revision, 'name', 'popularity_score'):
+        if is_active:
+            service.products.add(product_id, name, popularity_score)
+        else:
+            service.products.remove(product_id)
+    service.revision = revision
+
+
+def get_autocomplete(state: Optional[CatalogState] = None) -> AutocompleteService:
+    """
+    Return the process-wide autocomplete service, rebuilding it when the
+    catalog version in the database has moved on and re-inserting the
+    products changed since when only the revision has
+    """
+    global _service
+    if state is None:
+        state = get_catalog_state()
+    service = _service
+    if service is None or service.version != state.version or service.revision < state.revision:
+        with _service_lock:
+            service = _service
+            if service is None or service.version != state.version:
+                service = _service = build_autocomplete(state)
+            elif service.revision < state.revision:
+                patch_autocomplete(service, state.revision)
+    return service
+
+
+def reset_autocomplete() -> None:
+    """Discard the tries so they are rebuilt on next use"""
+    global _service
+    with _service_lock:
+        _service = None
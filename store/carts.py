@@ -0,0 +1,387 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from store.models import Cart, CartItem, Product
+
+
+class CartSummary(NamedTuple):
+    item_count: int
+    subtotal: Decimal
+
+
+EMPTY_CART_SUMMARY = CartSummary(0, Decimal('0.00'))
+
+
+class CartError(Exception):
+    pass
+
+
+class OutOfStock(CartError):
+    def __init__(self, available: int):
+        super().__init__(f'Only {available} items available in stock')
+        self.available = available
+
+
+class CartLine(NamedTuple):
+    """State of one cart line after a change, with the cart's new totals"""
+    product_name: str
+    quantity: int
+    summary: CartSummary
+
+
+def cart_summary(cart: Optional[Cart]) -> CartSummary:
+    if cart is None:
+        return EMPTY_CART_SUMMARY
+    return CartSummary(cart.item_count, cart.subtotal)
+
+
+def apply_cart_delta(cart_id, item_count: int, subtotal: Decimal) -> None:
+    """Shift a cart's counters in one UPDATE, safe against concurrent writers"""
+    if cart_id is None or (not item_count and not subtotal):
+        return
+    Cart.objects.filter(pk=cart_id).update(
+        item_count=F('item_count') + item_count,
+        subtotal=F('subtotal') + subtotal,
+    )
+
+
+def recalculate_cart_totals(cart_ids: Optional[Iterable] = None) -> int:
+    """
+    Recompute counters from the items with one grouped aggregate (all carts
+    when None); used by migrations and when an item's old state is unknown.
+    Returns the number of carts written.
+    """
+    carts = Cart.objects.all()
+    items = CartItem.objects.all()
+    if cart_ids is not None:
+        cart_ids = {cart_id for cart_id in cart_ids if cart_id is not None}
+        if not cart_ids:
+            return 0
+        carts = carts.filter(pk__in=cart_ids)
+        items = items.filter(cart_id__in=cart_ids)
+
+    totals = {
+        row['cart_id']: (row['item_count'], row['subtotal'])
+        for row in items.values('cart_id').annotate(
+            item_count=Sum('quantity'),
+            subtotal=Sum(ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField())),
+        ).order_by()
+    }
+    written = 0
+    for cart_id in carts.values_list('pk', flat=True):
+        item_count, subtotal = totals.get(cart_id, EMPTY_CART_SUMMARY)
+        written += Cart.objects.filter(pk=cart_id).update(item_count=item_count, subtotal=subtotal)
+    return written
+
+
+# ============ MUTATIONS ============
+
+def get_user_cart(user) -> Cart:
+    """The user's cart, from the relation joined at login when available"""
+    try:
+        return user.cart
+    except Cart.DoesNotExist:
+        cart, created = Cart.objects.get_or_create(user=user)
+        return cart
+
+
+def _increment_line(cart_id, product_id, quantity: int) -> bool:
+    """
+    Add to an existing line in one UPDATE guarded by the product's stock, so
+    concurrent adds can neither lose an increment nor oversell
+    """
+    stock = Product.objects.filter(pk=OuterRef('product_id'), is_active=True).values('stock')[:1]
+    incremented = CartItem.objects.filter(
+        cart_id=cart_id, product_id=product_id, quantity__lte=Subquery(stock) - quantity,
+    ).update(quantity=F('quantity') + quantity)
+    if incremented:
+        # Queryset updates send no signals; charge the line's own price
+        price = CartItem.objects.filter(cart_id=cart_id, product_id=product_id).values('price')[:1]
+        Cart.objects.filter(pk=cart_id).update(
+            item_count=F('item_count') + quantity,
+            subtotal=F('subtotal') + Subquery(price) * quantity,
+        )
+    return bool(incremented)
+
+
+def _read_line(cart_id, product_id) -> CartLine:
+    product_name, line_quantity, item_count, subtotal = CartItem.objects.filter(
+        cart_id=cart_id, product_id=product_id,
+    ).values_list('product__name', 'quantity', 'cart__item_count', 'cart__subtotal').get()
+    return CartLine(product_name, line_quantity, CartSummary(item_count, subtotal))
+
+
+def add_to_cart(cart: Cart, product_id, quantity: int) -> CartLine:
+    """
+    Insert a line or increment the existing one, atomically.
+
+    The common case (the product is already in the cart) is a guarded UPDATE
+    plus the counter UPDATE; only a first add reads the product. A concurrent
+    first add of the same product loses the unique constraint race and falls
+    back to incrementing. Raises Product.DoesNotExist or OutOfStock.
+    """
+    if quantity < 1:
+        raise CartError('Quantity must be at least 1')
+    with transaction.atomic():
+        if not _increment_line(cart.pk, product_id, quantity):
+            product = Product.objects.filter(is_active=True).only('name', 'price', 'stock').get(pk=product_id)
+            in_cart = CartItem.objects.filter(cart_id=cart.pk, product_id=product_id).values_list(
+                'quantity', flat=True
+            ).first()
+            if in_cart is not None or product.stock < quantity:
+                raise OutOfStock(max(product.stock - (in_cart or 0), 0))
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=cart, product=product, price=product.price, quantity=quantity)
+            except IntegrityError:
+                if not _increment_line(cart.pk, product_id, quantity):
+                    raise OutOfStock(max(product.stock - quantity, 0))
+        return _read_line(cart.pk, product_id)
+
+
+# ============ BATCHES ============
+
+CART_OPERATIONS = ('add', 'update', 'remove')
+MAX_CART_OPERATIONS = 100
+
+
+class CartOperationError(CartError):
+    """A batch was rejected; ``errors`` maps operation index to message"""
+    def __init__(self, errors: Dict[int, str]):
+        super().__init__('; '.join(f'operation {index}: {message}' for index, message in errors.items()))
+        self.errors = errors
+
+
+def parse_cart_operations(payload) -> List[Tuple[str, object, int]]:
+    """
+    Validate ``[{"op": ..., "product_id": ..., "quantity": ...}, ...]`` into
+    ``(op, product_id, quantity)`` tuples; raises CartOperationError
+    """
+    if not isinstance(payload, list) or not payload:
+        raise CartOperationError({0: 'Expected a non-empty list of operations'})
+    if len(payload) > MAX_CART_OPERATIONS:
+        raise CartOperationError({MAX_CART_OPERATIONS: f'At most {MAX_CART_OPERATIONS} operations per batch'})
+
+    operations, errors = [], {}
+    for index, operation in enumerate(payload):
+        if not isinstance(operation, dict):
+            errors[index] = 'Expected an object'
+            continue
+        op, product_id = operation.get('op'), operation.get('product_id')
+        quantity = operation.get('quantity', 1 if op == 'add' else 0)
+        if op not in CART_OPERATIONS:
+            errors[index] = f'Unknown operation {op!r}'
+        elif product_id in (None, ''):
+            errors[index] = 'Product ID is required'
+        elif not isinstance(quantity, int) or isinstance(quantity, bool):
+            errors[index] = 'Invalid quantity value'
+        elif quantity < (1 if op == 'add' else 0):
+            errors[index] = 'Quantity must be at least 1' if op == 'add' else 'Quantity cannot be negative'
+        else:
+            try:
+                operations.append((op, Product._meta.pk.to_python(product_id), quantity))
+            except ValidationError:
+                errors[index] = 'Invalid product ID'
+    if errors:
+        raise CartOperationError(errors)
+    return operations
+
+
+def apply_cart_operations(cart: Cart, operations: List[Tuple[str, object, int]]) -> None:
+    """
+    Apply parsed operations in order, all or nothing.
+
+    The final quantity of every touched product is worked out in memory from
+    one read of the products and one of the cart's lines, checked against
+    stock, then written with one bulk insert, one bulk update and one delete.
+    Raises CartOperationError without writing anything.
+    """
+    with transaction.atomic():
+        # Serialize batches on the same cart; SQLite already holds the write lock
+        list(Cart.objects.select_for_update().filter(pk=cart.pk).values_list('pk', flat=True))
+
+        product_ids = {product_id for op, product_id, quantity in operations}
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=product_ids, is_active=True).only('name', 'price', 'stock')
+        }
+        lines = {
+            item.product_id: item
+            for item in CartItem.objects.filter(cart=cart, product_id__in=product_ids)
+        }
+
+        quantities = {product_id: item.quantity for product_id, item in lines.items()}
+        errors, last_index = {}, {}
+        for index, (op, product_id, quantity) in enumerate(operations):
+            last_index[product_id] = index
+            if op == 'remove':
+                quantities[product_id] = 0
+            elif product_id not in products:
+                errors[index] = 'Product not found'
+            elif op == 'add':
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            else:
+                quantities[product_id] = quantity
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is not None and quantity > product.stock:
+                errors.setdefault(last_index[product_id], f'Only {product.stock} items available in stock')
+        if errors:
+            raise CartOperationError(errors)
+
+        created, changed, removed = [], [], []
+        count_delta, subtotal_delta = 0, Decimal('0.00')
+        now = timezone.now()
+        for product_id, quantity in quantities.items():
+            item = lines.get(product_id)
+            if item is None:
+                if quantity:
+                    product = products[product_id]
+                    created.append(CartItem(cart=cart, product=product, price=product.price, quantity=quantity))
+                    count_delta += quantity
+                    subtotal_delta += quantity * product.price
+            elif not quantity:
+                removed.append(item.pk)
+            elif quantity != item.quantity:
+                count_delta += quantity - item.quantity
+                subtotal_delta += (quantity - item.quantity) * item.price
+                item.quantity, item.updated_at = quantity, now
+                changed.append(item)
+
+        if created:
+            CartItem.objects.bulk_create(created)
+        if changed:
+            CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        # Bulk writes send no signals; removals go through delete() and its signals
+        apply_cart_delta(cart.pk, count_delta, subtotal_delta)
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+
+
+def cart_state(cart: Cart) -> Dict:
+    """JSON-ready lines and totals of a cart, read in two queries"""
+    items = CartItem.objects.filter(cart=cart).select_related('product').order_by('added_at')
+    item_count, subtotal = Cart.objects.filter(pk=cart.pk).values_list('item_count', 'subtotal').get()
+    return {
+        'items': [
+            {
+                'cart_item_id': str(item.pk),
+                'product_id': item.product_id,
+                'name': item.product.name,
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'item_total': str(item.get_total_price()),
+            }
+            for item in items
+        ],
+        'cart_count': item_count,
+        'cart_total': str(subtotal),
+    }
+
+
+# ============ GUEST CARTS ============
+
+# Anonymous carts live in the session as {product pk hex: quantity}; nothing
+# touches the cart tables until the guest signs in
+GUEST_CART_SESSION_KEY = 'guest_cart'
+
+# Distinct products a guest cart holds, bounding the session row and the
+# merge on sign-in
+MAX_GUEST_CART_LINES = 50
+
+
+def get_guest_cart(session) -> Dict[str, int]:
+    return dict(session.get(GUEST_CART_SESSION_KEY) or {})
+
+
+def guest_item_count(session) -> int:
+    return sum(get_guest_cart(session).values())
+
+
+def _guest_products(guest_cart: Dict[str, int], extra=None) -> Dict[str, Product]:
+    keys = set(guest_cart) | ({extra} if extra else set())
+    return {
+        product.pk.hex: product
+        for product in Product.objects.filter(pk__in=keys, is_active=True).only('name', 'price', 'stock')
+    }
+
+
+def _guest_subtotal(guest_cart: Dict[str, int], products: Dict[str, Product]) -> Decimal:
+    return sum(
+        (products[key].price * quantity for key, quantity in guest_cart.items() if key in products),
+        Decimal('0.00'),
+    )
+
+
+def guest_cart_summary(session) -> CartSummary:
+    guest_cart = get_guest_cart(session)
+    if not guest_cart:
+        return EMPTY_CART_SUMMARY
+    return CartSummary(sum(guest_cart.values()), _guest_subtotal(guest_cart, _guest_products(guest_cart)))
+
+
+def add_to_guest_cart(session, product_id, quantity: int) -> CartLine:
+    """
+    Add to the session cart, checking stock against one read of the guest's
+    products. Raises Product.DoesNotExist, ValidationError, OutOfStock or
+    CartError when the cart already holds ``MAX_GUEST_CART_LINES`` products.
+    """
+    if quantity < 1:
+        raise CartError('Quantity must be at least 1')
+    key = Product._meta.pk.to_python(product_id).hex
+    guest_cart = get_guest_cart(session)
+    products = _guest_products(guest_cart, key)
+    product = products.get(key)
+    if product is None:
+        raise Product.DoesNotExist
+    in_cart = guest_cart.get(key, 0)
+    if not in_cart and len(guest_cart) >= MAX_GUEST_CART_LINES:
+        raise CartError(f'Sign in to add more than {MAX_GUEST_CART_LINES} different products')
+    if in_cart + quantity > product.stock:
+        raise OutOfStock(max(product.stock - in_cart, 0))
+
+    guest_cart[key] = in_cart + quantity
+    session[GUEST_CART_SESSION_KEY] = guest_cart
+    return CartLine(
+        product.name, guest_cart[key],
+        CartSummary(sum(guest_cart.values()), _guest_subtotal(guest_cart, products)),
+    )
+
+
+def merge_guest_cart(session, user) -> int:
+    """
+    Move the session cart into the user's cart with one bulk upsert; lines
+    already in the cart are added to, capped at stock. Returns lines merged.
+    """
+    guest_cart = get_guest_cart(session)
+    if not guest_cart:
+        return 0
+    with transaction.atomic():
+        cart = get_user_cart(user)
+        products = _guest_products(guest_cart)
+        existing = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=[product.pk for product in products.values()])
+            .values_list('product_id', 'quantity')
+        )
+        lines = []
+        for key, quantity in guest_cart.items():
+            product = products.get(key)
+            if product is None:
+                continue
+            in_cart = existing.get(product.pk, 0)
+            merged = max(min(in_cart + quantity, product.stock), in_cart)
+            if merged > 0:
+                lines.append(CartItem(cart=cart, product=product, price=product.price, quantity=merged))
+        if lines:
+            CartItem.objects.bulk_create(
+                lines, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+            )
+            # Bulk writes send no signals
+            recalculate_cart_totals([cart.pk])
+    del session[GUEST_CART_SESSION_KEY]
+    return len(lines)
@@ -0,0 +1,103 @@
+import time
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from store.models import CatalogVersion, Product
+
+CATALOG_VERSION_ID = 1
+
+
+class CatalogState(NamedTuple):
+    version: int
+    revision: int
+
+
+# (monotonic time read, state) of the last database read in this process
+_state_memo: Optional[Tuple[float, CatalogState]] = None
+
+
+def get_catalog_state() -> CatalogState:
+    """
+    Return the current catalog version and revision.
+
+    The primary-key read is reused for ``CATALOG_STATE_MAX_AGE`` seconds, so
+    a burst of requests (autocomplete keystrokes) costs one query rather than
+    one per request and per cache consulted. Changes made by this process
+    are seen at once; other workers' changes within that delay.
+    """
+    global _state_memo
+    memo = _state_memo
+    now = time.monotonic()
+    if memo is not None and now - memo[0] < settings.CATALOG_STATE_MAX_AGE:
+        return memo[1]
+    row = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', 'revision').first()
+    state = CatalogState(*row) if row else CatalogState(0, 0)
+    _state_memo = (now, state)
+    return state
+
+
+def forget_catalog_state() -> None:
+    """Make the next get_catalog_state() read the database"""
+    global _state_memo
+    _state_memo = None
+
+
+def _catalog_changed() -> None:
+    # Forget now for reads later in this transaction, and again on commit
+    # in case another request re-read the old state in between
+    forget_catalog_state()
+    transaction.on_commit(forget_catalog_state)
+
+
+def get_catalog_version() -> int:
+    """Return the current catalog version"""
+    return get_catalog_state().version
+
+
+def bump_catalog_version() -> None:
+    """Invalidate everything derived from the catalog"""
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID, defaults={'version': 1})
+    _catalog_changed()
+
+
+def next_catalog_revision() -> int:
+    """
+    Allocate a catalog revision for products changed in the current
+    transaction.
+
+    The counter row stays locked until the transaction ends, so revisions
+    become visible in the order they were handed out and a reader that has
+    seen revision N never misses a product stamped at or below it.
+    """
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        revision=F('revision') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID, defaults={'revision': 1})
+    _catalog_changed()
+    return CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('revision', flat=True).get()
+
+
+def touch_products(product_ids: Iterable) -> None:
+    """
+    Stamp products with a new revision so every worker re-reads just those
+    products instead of rebuilding its catalog caches. Writers already
+    running an UPDATE can set ``revision=next_catalog_revision()`` in it.
+    """
+    product_ids = list(product_ids)
+    if product_ids:
+        with transaction.atomic():
+            Product.objects.filter(pk__in=product_ids).update(revision=next_catalog_revision())
+
+
+def changed_products(revision: int, *fields: str):
+    """``(id, is_active, *fields)`` rows of the products stamped after ``revision``"""
+    return Product.objects.filter(revision__gt=revision).values_list('id', 'is_active', *fields)
@@ -0,0 +1,222 @@
+import threading
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from store.catalog import CatalogState, changed_products, get_catalog_state
+
+# Price buckets shown as facets: (label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS: Tuple[Tuple[str, Decimal, Optional[Decimal]], ...] = (
+    ('Under $25', Decimal('0'), Decimal('25')),
+    ('$25 - $50', Decimal('25'), Decimal('50')),
+    ('$50 - $100', Decimal('50'), Decimal('100')),
+    ('$100 - $200', Decimal('100'), Decimal('200')),
+    ('$200 & above', Decimal('200'), None),
+)
+
+
+def parse_price(value) -> Optional[Decimal]:
+    """Parse a price filter value, ignoring anything that isn't a number"""
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def bucket_for(price: Decimal) -> int:
+    for position, (_, lower, upper) in enumerate(PRICE_BUCKETS):
+        if price >= lower and (upper is None or price < upper):
+            return position
+    return 0
+
+
+class FacetIndex:
+    """
+    Facet membership of active products kept as bitsets over product ordinals.
+
+    Every product gets a small integer ordinal; each category, price bucket and
+    the in-stock flag own a Python ``int`` whose set bits are the member
+    ordinals. Counts for any filter combination are bitwise ANDs followed by
+    ``int.bit_count()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = 0
+        self.revision = 0
+        self._ordinals: Dict[object, int] = {}
+        self._free: List[int] = []
+        self._next_ordinal = 0
+        self._members: Dict[int, Tuple[object, Decimal, bool]] = {}
+        self._all = 0
+        self._in_stock = 0
+        self._categories: Dict[object, int] = {}
+        self._buckets: List[int] = [0] * len(PRICE_BUCKETS)
+        self._bucket_prices: List[Dict[int, Decimal]] = [{} for _ in PRICE_BUCKETS]
+
+    def add(self, product_id, category_id, price: Decimal, in_stock: bool) -> None:
+        """Index (or re-index) a product's facet membership"""
+        with self._lock:
+            self._remove(product_id)
+            ordinal = self._free.pop() if self._free else self._next_ordinal
+            if ordinal == self._next_ordinal:
+                self._next_ordinal += 1
+            bit = 1 << ordinal
+            bucket = bucket_for(price)
+
+            self._ordinals[product_id] = ordinal
+            self._members[ordinal] = (category_id, price, in_stock)
+            self._all |= bit
+            self._categories[category_id] = self._categories.get(category_id, 0) | bit
+            self._buckets[bucket] |= bit
+            self._bucket_prices[bucket][ordinal] = price
+            if in_stock:
+                self._in_stock |= bit
+
+    def remove(self, product_id) -> None:
+        """Drop a product from every facet"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id) -> None:
+        ordinal = self._ordinals.pop(product_id, None)
+        if ordinal is None:
+            return
+        category_id, price, _ = self._members.pop(ordinal)
+        mask = ~(1 << ordinal)
+        bucket = bucket_for(price)
+
+        self._all &= mask
+        self._in_stock &= mask
+        self._buckets[bucket] &= mask
+        del self._bucket_prices[bucket][ordinal]
+        remaining = self._categories[category_id] & mask
+        if remaining:
+            self._categories[category_id] = remaining
+        else:
+            del self._categories[category_id]
+        self._free.append(ordinal)
+
+    def _price_mask(self, min_price: Optional[Decimal], max_price: Optional[Decimal]) -> int:
+        """Bitset of products priced within [min_price, max_price]"""
+        if min_price is None and max_price is None:
+            return self._all
+        mask = 0
+        for position, (_, lower, upper) in enumerate(PRICE_BUCKETS):
+            if (max_price is not None and lower > max_price) or \
+                    (min_price is not None and upper is not None and upper <= min_price):
+                continue
+            fully_inside = (min_price is None or lower >= min_price) and \
+                (max_price is None or (upper is not None and upper <= max_price))
+            if fully_inside:
+                mask |= self._buckets[position]
+                continue
+            # Edge bucket: only the products inside it need checking
+            for ordinal, price in self._bucket_prices[position].items():
+                if (min_price is None or price >= min_price) and (max_price is None or price <= max_price):
+                    mask |= 1 << ordinal
+        return mask
+
+    def counts(self, category_ids: Optional[Iterable] = None, min_price=None, max_price=None,
+               in_stock: bool = False) -> Dict[str, object]:
+        """
+        Return facet counts for a filter combination.
+
+        Each facet is counted with every other active filter applied but not its
+        own, so selecting a category still shows how many products the other
+        categories would add.
+        """
+        min_price, max_price = parse_price(min_price), parse_price(max_price)
+        with self._lock:
+            if category_ids:
+                category_mask = 0
+                for category_id in category_ids:
+                    category_mask |= self._categories.get(category_id, 0)
+            else:
+                category_mask = self._all
+            price_mask = self._price_mask(min_price, max_price)
+            stock_mask = self._in_stock if in_stock else self._all
+
+            outside_category = price_mask & stock_mask
+            outside_price = category_mask & stock_mask
+            return {
+                'total': (category_mask & outside_category).bit_count(),
+                'categories': {
+                    category_id: (bits & outside_category).bit_count()
+                    for category_id, bits in self._categories.items()
+                },
+                'price_buckets': [
+                    {
+                        'label': label,
+                        'min_price': lower,
+                        'max_price': upper,
+                        'count': (bits & outside_price).bit_count(),
+                    }
+                    for (label, lower, upper), bits in zip(PRICE_BUCKETS, self._buckets)
+                ],
+                'in_stock': (category_mask & price_mask & self._in_stock).bit_count(),
+            }
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+
+# ============ PROCESS-WIDE INDEX ============
+
+_index: Optional[FacetIndex] = None
+_index_lock = threading.Lock()
+
+
+def build_facet_index(state: Optional[CatalogState] = None) -> FacetIndex:
+    """
+    Build the facet bitsets from the database, stamped with the catalog
+    version and revision read before the rows
+    """
+    from store.models import Product
+
+    index = FacetIndex()
+    index.version, index.revision = state or get_catalog_state()
+    products = Product.objects.filter(is_active=True).values_list('id', 'category_id', 'price', 'stock')
+    for product_id, category_id, price, stock in products.iterator():
+        index.add(product_id, category_id, price, stock > 0)
+    return index
+
+
+def patch_facet_index(index: FacetIndex, revision: int) -> None:
+    """Re-read only the products stamped since the index's revision"""
+    for product_id, is_active, category_id, price, stock in changed_products(
+            index.revision, 'category_id', 'price', 'stock'):
+        if is_active:
+            index.add(product_id, category_id, price, stock > 0)
+        else:
+            index.remove(product_id)
+    index.revision = revision
+
+
+def get_facet_index(state: Optional[CatalogState] = None) -> FacetIndex:
+    """
+    Return the process-wide facet index, rebuilding it when the catalog
+    version in the database has moved on and patching in the products
+    changed since when only the revision has, so stock and price changes
+    made by other workers are counted
+    """
+    global _index
+    if state is None:
+        state = get_catalog_state()
+    index = _index
+    if index is None or index.version != state.version or index.revision < state.revision:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != state.version:
+                index = _index = build_facet_index(state)
+            elif index.revision < state.revision:
+                patch_facet_index(index, state.revision)
+    return index
+
+
+def reset_facet_index() -> None:
+    """Discard the bitsets so they are rebuilt on next use"""
+    global _index
+    with _index_lock:
+        _index = None
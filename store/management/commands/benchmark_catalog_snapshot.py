@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import Category, Product
+from store.normalization import normalize_text
+from store.snapshot import build_catalog_snapshot
+
+THEMES = [
+    'Technic', 'Star Wars', 'City', 'Creator', 'Ninjago', 'Friends', 'Architecture',
+    'Ideas', 'Harry Potter', 'Marvel', 'Speed Champions', 'Icons', 'Duplo', 'Minecraft',
+]
+PAGE_SIZE = 20
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare listing queries served by the ORM against the in-memory catalog snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5_000, help='Synthetic products to add')
+        parser.add_argument('--repeat', type=int, default=200, help='Listings rendered per path')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        # Synthetic rows live in a transaction that is always rolled back
+        try:
+            with transaction.atomic():
+                self._populate(options['products'], random.Random(options['seed']))
+                self._compare(options['repeat'], random.Random(options['seed']))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _populate(self, count: int, rng: random.Random) -> None:
+        categories = Category.objects.bulk_create([
+            Category(title=f'Benchmark {theme}', slug=f'benchmark-{number}')
+            for number, theme in enumerate(THEMES)
+        ])
+        names = [f'{rng.choice(THEMES)} set {number}' for number in range(count)]
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=name,
+                    name_normalized=normalize_text(name),
+                    slug=f'benchmark-set-{number}',
+                    description='Synthetic benchmark product',
+                    price=Decimal(rng.randint(500, 50_000)) / 100,
+                    stock=rng.randint(0, 50),
+                    category=rng.choice(categories),
+                )
+                for number, name in enumerate(names)
+            ],
+            batch_size=1000,
+        )
+        self.categories = categories
+
+    def _listings(self, repeat: int, rng: random.Random):
+        orderings = ['-created_at', 'price', '-price', 'name_normalized']
+        for _ in range(repeat):
+            yield (
+                rng.choice(orderings),
+                rng.choice([None, rng.choice(self.categories).id]),
+                rng.choice([None, Decimal(rng.randint(10, 200))]),
+            )
+
+    def _compare(self, repeat: int, rng: random.Random) -> None:
+        listings = list(self._listings(repeat, rng))
+
+        def orm(ordering, category_id, min_price):
+            queryset = Product.objects.filter(is_active=True).select_related('category')
+            if category_id:
+                queryset = queryset.filter(category_id=category_id)
+            if min_price:
+                queryset = queryset.filter(price__gte=min_price)
+            queryset = queryset.order_by(ordering)
+            return queryset.count(), list(queryset[:PAGE_SIZE])
+
+        started = time.perf_counter()
+        snapshot = build_catalog_snapshot()
+        self.stdout.write(f'Loaded snapshot of {len(snapshot)} products in {time.perf_counter() - started:.2f}s')
+
+        def memory(ordering, category_id, min_price):
+            products = snapshot.filter(
+                ordering,
+                category_ids=[category_id] if category_id else None,
+                min_price=min_price,
+            )
+            return len(products), products[:PAGE_SIZE]
+
+        results = {}
+        for label, listing in (('ORM', orm), ('Snapshot', memory)):
+            timings = []
+            for arguments in listings:
+                started = time.perf_counter()
+                listing(*arguments)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[label] = statistics.median(timings)
+            self.stdout.write(
+                f'{label}: median {results[label]:.2f}ms, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f}ms, max {timings[-1]:.2f}ms'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot listings are {results["ORM"] / results["Snapshot"]:.1f}x faster (median)'
+        ))
@@ -0,0 +1,111 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.trigram import TrigramIndex
+
+THEMES = [
+    'Technic', 'Star Wars', 'City', 'Creator', 'Ninjago', 'Friends', 'Architecture',
+    'Ideas', 'Harry Potter', 'Marvel', 'Speed Champions', 'Icons', 'Duplo', 'Minecraft',
+]
+WORDS = [
+    'millennium', 'falcon', 'bugatti', 'chiron', 'castle', 'station', 'police', 'fire',
+    'truck', 'excavator', 'tower', 'bridge', 'dragon', 'temple', 'pirate', 'ship',
+    'hogwarts', 'express', 'spaceship', 'rocket', 'shuttle', 'harbour', 'airport',
+    'garage', 'lighthouse', 'treehouse', 'motorcycle', 'helicopter', 'submarine',
+    'robot', 'mech', 'fortress', 'village', 'market', 'bakery', 'cinema', 'stadium',
+]
+SYLLABLES = [
+    'ka', 'lo', 'mi', 'ter', 'bri', 'ck', 'on', 'ar', 'zu', 'pe', 'sta', 'rin', 'vo', 'gel',
+    'mar', 'tin', 'qu', 'ex', 'do', 'ra', 'sho', 'fen', 'bel', 'cor', 'an', 'ti', 'ly', 'gra',
+]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    """
+    The set-name words plus pseudo-words up to ``size`` distinct words, so
+    trigram postings are as crowded as in a real catalog's vocabulary
+    """
+    vocabulary = dict.fromkeys(WORDS)
+    while len(vocabulary) < size:
+        vocabulary[''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))] = None
+    return list(vocabulary)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """One random deletion, insertion, substitution or transposition"""
+    if len(word) < 4:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(('delete', 'insert', 'substitute', 'transpose'))
+    if edit == 'delete':
+        return word[:position] + word[position + 1:]
+    if edit == 'insert':
+        return word[:position] + rng.choice(string.ascii_lowercase) + word[position:]
+    if edit == 'substitute':
+        return word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+    return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark typo-tolerant trigram search against a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000, help='Synthetic catalog size')
+        parser.add_argument('--vocabulary', type=int, default=20_000, help='Distinct words across product names')
+        parser.add_argument('--queries', type=int, default=200, help='Misspelled queries to run')
+        parser.add_argument('--budget-ms', type=float, default=50.0, help='p95 latency budget per query')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = make_vocabulary(options['vocabulary'], rng)
+        index = TrigramIndex()
+
+        # Word usage is skewed like real names: a few words are everywhere, most are rare
+        def word():
+            return vocabulary[min(int(rng.paretovariate(1.0)) - 1, len(vocabulary) - 1)] \
+                if rng.random() < 0.5 else rng.choice(vocabulary)
+
+        names = []
+        started = time.perf_counter()
+        for number in range(options['products']):
+            name = f"{rng.choice(THEMES)} {' '.join(word() for _ in range(rng.randint(2, 4)))}"
+            names.append(name)
+            index.add(number, name)
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Indexed {len(index)} products over {index.vocabulary_size} distinct words in {build_seconds:.2f}s'
+        )
+
+        # Queries are one to three words of a real name, at least one of them misspelled
+        queries = []
+        for _ in range(options['queries']):
+            words = rng.choice(names).lower().split()
+            picked = rng.sample(words, min(len(words), rng.randint(1, 3)))
+            typo = rng.randrange(len(picked))
+            queries.append(' '.join(
+                misspell(word, rng) if position == typo or rng.random() < 0.3 else word
+                for position, word in enumerate(picked)
+            ))
+
+        timings, misses = [], 0
+        for query in queries:
+            started = time.perf_counter()
+            results = index.search(query, limit=100)
+            timings.append((time.perf_counter() - started) * 1000)
+            misses += not results
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{len(timings)} queries ({misses} without results): median {statistics.median(timings):.2f}ms, '
+            f'p95 {p95:.2f}ms, max {timings[-1]:.2f}ms'
+        )
+
+        if p95 > options['budget_ms']:
+            raise CommandError(f'p95 latency {p95:.2f}ms exceeds budget of {options["budget_ms"]:.2f}ms')
+        self.stdout.write(self.style.SUCCESS(f'Within the {options["budget_ms"]:.2f}ms budget'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.popularity import rebuild_popularity_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed popularity score of every product from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = rebuild_popularity_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed popularity scores for {updated} products'))
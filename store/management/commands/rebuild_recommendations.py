@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.recommendations import AFFINITY_TOP_K, rebuild_affinities
+
+
+class Command(BaseCommand):
+    help = 'Recompute "frequently bought together" neighbours for every product from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=AFFINITY_TOP_K, help='Neighbours kept per product')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_affinities(top_k=options['top_k'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} product affinities'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import recompute_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute review count, rating average and star histogram for every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = recompute_rating_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed rating aggregates, {updated} products were out of date'))
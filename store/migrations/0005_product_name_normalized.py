@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+from store.normalization import normalize_text
+
+
+def populate_name_normalized(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.only('id', 'name'))
+    for product in products:
+        product.name_normalized = normalize_text(product.name)
+    Product.objects.bulk_update(products, ['name_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_name_normalized, migrations.RunPython.noop),
+    ]
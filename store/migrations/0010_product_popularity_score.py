@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:45
+
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+
+# Frozen copy of store.popularity as of this migration, so later changes to
+# the app code can't change what it computes
+POPULARITY_HALF_LIFE = timedelta(days=14)
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def popularity_weight(sold_at):
+    return math.pow(2, (sold_at - POPULARITY_EPOCH) / POPULARITY_HALF_LIFE)
+
+
+def backfill_popularity_scores(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    OrderElement = apps.get_model('orders', 'OrderElement')
+    scores = defaultdict(float)
+    elements = OrderElement.objects.filter(product__isnull=False).values_list(
+        'product_id', 'quantity', 'order__registered_at'
+    )
+    for product_id, quantity, registered_at in elements.iterator():
+        scores[product_id] += quantity * popularity_weight(registered_at)
+    for product_id, score in scores.items():
+        Product.objects.filter(pk=product_id).update(popularity_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_alter_order_status'),
+        ('store', '0009_category_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['popularity_score', 'id'], name='store_produ_popular_974789_idx'),
+        ),
+        migrations.RunPython(backfill_popularity_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:55
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def populate_cart_counters(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    totals = CartItem.objects.values('cart_id').annotate(
+        item_count=Sum('quantity'),
+        subtotal=Sum(ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField())),
+    ).order_by()
+    for row in totals:
+        Cart.objects.filter(pk=row['cart_id']).update(item_count=row['item_count'], subtotal=row['subtotal'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_affinity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(populate_cart_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:42
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def seed_epoch(apps, schema_editor):
+    # Scores stored so far are relative to the original fixed epoch
+    PopularityEpoch = apps.get_model('store', 'PopularityEpoch')
+    PopularityEpoch.objects.get_or_create(pk=1, defaults={'epoch': datetime(2025, 1, 1, tzinfo=timezone.utc)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_product_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Popularity Epoch',
+                'verbose_name_plural': 'Popularity Epoch',
+            },
+        ),
+        migrations.RunPython(seed_epoch, migrations.RunPython.noop),
+    ]
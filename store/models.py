@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 from decimal import Decimal
 from users.models import CustomUser
+from store.normalization import normalize_text
 
 class Category(models.Model):
     """
@@ -16,6 +17,28 @@ class Category(models.Model):
     def __str__(self) -> str:
         return self.title
 
+    def _stat(self, name: str, default=None):
+        try:
+            return getattr(self.stats, name)
+        except CategoryStats.DoesNotExist:
+            return default
+
+    @property
+    def product_count(self) -> int:
+        return self._stat('product_count', 0)
+
+    @property
+    def in_stock_count(self) -> int:
+        return self._stat('in_stock_count', 0)
+
+    @property
+    def min_price(self):
+        return self._stat('min_price')
+
+    @property
+    def max_price(self):
+        return self._stat('max_price')
+
     class Meta:
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
@@ -33,6 +56,7 @@ class Product(models.Model):
                               default=StatusChoice.NEW)
     id: uuid.UUID = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name: str = models.CharField(max_length=255, db_index=True)
+    name_normalized: str = models.CharField(max_length=255, db_index=True, editable=False, default='')
     slug: str = models.SlugField(unique=True, db_index=True)
     description: str = models.TextField(blank=True)
     picture = models.ImageField(blank=True, upload_to="products", default="products/default.png")
@@ -47,9 +71,50 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Approved review aggregates, maintained by store.ratings
+    review_count: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_average: float = models.FloatField(default=0, db_index=True, editable=False)
+    rating_1_count: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count: int = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count: int = models.PositiveIntegerField(default=0, editable=False)
+
+    # Time-decayed units sold, maintained by store.popularity
+    popularity_score: float = models.FloatField(default=0, editable=False)
+
+    # Catalog revision of the last change, see store.catalog.touch_products
+    revision: int = models.PositiveBigIntegerField(default=0, db_index=True, editable=False)
+
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def rating_histogram(self) -> list:
+        """Star breakdown from 5 down to 1 with counts and percentages"""
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_{stars}_count')
+            percent = round(count * 100 / self.review_count) if self.review_count else 0
+            histogram.append({'stars': stars, 'count': count, 'percent': percent})
+        return histogram
+
+    def save(self, *args, **kwargs):
+        # Keep the folded name used for locale-independent sorting in sync
+        self.name_normalized = normalize_text(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def sort_field(sort: str) -> str:
+        """Map a sort parameter to the column backing it (names sort by their folded form)"""
+        if sort.lstrip('-') == 'name':
+            return sort.replace('name', 'name_normalized')
+        return sort
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('store:product_detail', kwargs={'slug': self.slug})
@@ -62,10 +127,104 @@ class Product(models.Model):
             models.Index(fields=["name"]),
             models.Index(fields=["category"]),
             models.Index(fields=["is_active"]),
+            # Keyset pagination: sort column plus the id tiebreaker
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["price", "id"]),
+            models.Index(fields=["name_normalized", "id"]),
+            models.Index(fields=["popularity_score", "id"]),
         ]
         ordering = ['-created_at']
 
 
+class ProductAffinity(models.Model):
+    """
+    How often ``related`` was bought in the same order as ``product``.
+    Only each product's strongest neighbours are kept, see store.recommendations
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="affinities"
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    score: int = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.product} + {self.related} ({self.score})"
+
+    class Meta:
+        verbose_name = 'Product Affinity'
+        verbose_name_plural = 'Product Affinities'
+        unique_together = ('product', 'related')
+        indexes = [
+            models.Index(fields=["product", "-score"]),
+        ]
+
+
+class CategoryStats(models.Model):
+    """
+    Aggregates over a category's active products, maintained by store.stats
+    so listing pages never run COUNT/MIN/MAX queries
+    """
+    category = models.OneToOneField(
+        Category,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+    product_count: int = models.PositiveIntegerField(default=0)
+    in_stock_count: int = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Stats for {self.category}"
+
+    class Meta:
+        verbose_name = 'Category Stats'
+        verbose_name_plural = 'Category Stats'
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counters shared by every worker process: ``version`` is bumped
+    by changes that invalidate everything derived from the catalog, and
+    ``revision`` is handed out to products as they change, so caches can
+    patch just those products in place
+    """
+    version: int = models.PositiveBigIntegerField(default=0)
+    revision: int = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Catalog v{self.version}"
+
+    class Meta:
+        verbose_name = 'Catalog Version'
+        verbose_name_plural = 'Catalog Version'
+
+
+class PopularityEpoch(models.Model):
+    """
+    Single-row reference time of the forward-decay popularity scores, moved
+    forward (rebasing every score) before the weights can overflow a float
+    """
+    epoch = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Popularity epoch {self.epoch:%Y-%m-%d}"
+
+    class Meta:
+        verbose_name = 'Popularity Epoch'
+        verbose_name_plural = 'Popularity Epoch'
+
+
 class Cart(models.Model):
     """
     Model representing a shopping cart for a user
@@ -76,6 +235,9 @@ class Cart(models.Model):
         on_delete=models.CASCADE,
         related_name="cart"
     )
+    # Maintained from CartItem signals, see store.carts
+    item_count: int = models.PositiveIntegerField(default=0)
+    subtotal: Decimal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -84,11 +246,11 @@ class Cart(models.Model):
 
     def get_total_price(self) -> Decimal:
         """Calculate total cart value"""
-        return sum(item.get_total_price() for item in self.items.all())
+        return self.subtotal
 
     def get_total_items(self) -> int:
         """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        return self.item_count
 
     class Meta:
         verbose_name = 'Cart'
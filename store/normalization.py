@@ -0,0 +1,20 @@
+import unicodedata
+from typing import Optional
+
+# Turkish dotted/dotless i fold to a plain "i" regardless of the active locale,
+# so "İstanbul", "ISTANBUL" and "ıstanbul" all normalize to "istanbul"
+_TURKISH_I = str.maketrans({'İ': 'i', 'I': 'i', 'ı': 'i'})
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Fold text for locale-independent matching and sorting.
+
+    Applies Turkish-aware case folding and strips diacritics
+    (ş -> s, ğ -> g, ç -> c, ö -> o, ü -> u).
+    """
+    if not text:
+        return ''
+    folded = text.translate(_TURKISH_I).casefold()
+    decomposed = unicodedata.normalize('NFKD', folded)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
@@ -0,0 +1,331 @@
+import hashlib
+import uuid
+from decimal import Decimal
+from itertools import islice
+from typing import List, Optional
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from store.catalog import get_catalog_state
+from store.snapshot import SnapshotResults
+
+CURSOR_SALT = 'store.pagination.cursor'
+
+# Orderings that can be paged by keyset in the database; each is backed by a
+# (field, id) index. Snapshot results are paged by keyset in any of their orderings.
+CURSOR_ORDERINGS = (
+    '-created_at', 'created_at', 'price', '-price', 'name_normalized', '-name_normalized',
+    '-popularity_score', 'popularity_score',
+)
+DEFAULT_CURSOR_ORDERING = '-created_at'
+
+# Query parameters that change which page is shown but not how many results there are
+NON_FILTER_PARAMS = ('page', 'cursor', 'pagination', 'format', 'sort')
+COUNT_CACHE_TIMEOUT = 60 * 60
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(payload: dict) -> str:
+    """Sign a cursor payload into an opaque, URL-safe token"""
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token: str) -> dict:
+    try:
+        return signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor(token)
+
+
+def _load_key(field: str, payload: dict) -> tuple:
+    """The ``(value, id)`` sort key of a cursor, typed like the snapshot cards'"""
+    value = payload['v']
+    if field.endswith('_at'):
+        value = parse_datetime(value)
+    elif field == 'price':
+        value = Decimal(value)
+    return value, uuid.UUID(payload['id'])
+
+
+def _dump_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CursorPage:
+    """
+    A single page of keyset-paginated results
+    """
+
+    def __init__(self, object_list: List, next_cursor: Optional[str] = None,
+                 previous_cursor: Optional[str] = None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_url = None
+        self.previous_url = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: every page is a ``WHERE (field, id) > (value, id) LIMIT n``
+    query, so page N costs the same as page 1 and no ``COUNT(*)`` is needed.
+
+    Querysets are ordered by one of ``orderings`` (``CURSOR_ORDERINGS`` for
+    products) plus the UUID primary key as tiebreaker. Snapshot results are
+    already sorted that way and seek the same ``(value, id)`` key in memory.
+    Plain sequences (e.g. ranked search results held in memory) are paged by
+    position instead.
+    """
+
+    def __init__(self, object_list, per_page: int, ordering: Optional[str] = None,
+                 orderings=CURSOR_ORDERINGS, default_ordering: str = DEFAULT_CURSOR_ORDERING):
+        self.object_list = object_list
+        self.per_page = per_page
+        if isinstance(object_list, SnapshotResults):
+            ordering = object_list.ordering
+        elif isinstance(object_list, QuerySet):
+            if ordering is None:
+                current = object_list.query.order_by
+                ordering = current[0] if current else default_ordering
+            if ordering not in orderings:
+                ordering = default_ordering
+        self.ordering = ordering
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        try:
+            payload = decode_cursor(cursor) if cursor else None
+        except InvalidCursor:
+            payload = None
+        if payload is not None and payload.get('o') != self.ordering:
+            # The sort changed since the cursor was issued, start over
+            payload = None
+
+        if self.ordering is None:
+            return self._position_page(payload)
+        return self._keyset_page(payload)
+
+    # ---------- keyset paging ----------
+
+    def _keyset_page(self, payload: Optional[dict]) -> CursorPage:
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        backward = bool(payload and payload.get('b'))
+
+        if isinstance(self.object_list, SnapshotResults):
+            key = _load_key(field, payload) if payload is not None else None
+            rows = list(islice(self.object_list.seek(key, backward), self.per_page + 1))
+        else:
+            queryset = self.object_list
+            if payload is not None:
+                value = payload['v']
+                if field.endswith('_at'):
+                    value = parse_datetime(value)
+                # Moving forward on a descending sort means smaller keys, and vice versa
+                lookup = 'lt' if descending != backward else 'gt'
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': payload['id']})
+                )
+
+            reverse = descending != backward
+            prefix = '-' if reverse else ''
+            rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:self.per_page + 1])
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage([])
+
+        has_next = has_more if not backward else True
+        has_previous = has_more if backward else payload is not None
+        return CursorPage(
+            rows,
+            next_cursor=self._cursor(rows[-1], field) if has_next else None,
+            previous_cursor=self._cursor(rows[0], field, backward=True) if has_previous else None,
+        )
+
+    def _cursor(self, obj, field: str, backward: bool = False) -> str:
+        payload = {'o': self.ordering, 'v': _dump_value(getattr(obj, field)), 'id': str(obj.pk)}
+        if backward:
+            payload['b'] = 1
+        return encode_cursor(payload)
+
+    # ---------- positional paging ----------
+
+    def _position_page(self, payload: Optional[dict]) -> CursorPage:
+        position = max(int(payload.get('p', 0)), 0) if payload else 0
+        end = position + self.per_page
+        rows = list(self.object_list[position:end])
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor({'o': None, 'p': end}) if end < len(self.object_list) else None,
+            previous_cursor=encode_cursor({'o': None, 'p': max(position - self.per_page, 0)}) if position else None,
+        )
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in cursor pagination for product ListViews.
+
+    Activated by ``?cursor=<token>``, ``?pagination=cursor`` or ``?format=json``;
+    otherwise the view keeps Django's numbered ``Paginator``. The JSON variant
+    returns the page as product cards together with the next/previous cursors.
+    """
+    cursor_param = 'cursor'
+    cursor_page = None
+
+    def use_cursor_pagination(self) -> bool:
+        params = self.request.GET
+        return self.cursor_param in params or params.get('pagination') == 'cursor' or params.get('format') == 'json'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        page = CursorPaginator(queryset, page_size).page(self.request.GET.get(self.cursor_param))
+        page.next_url = self._cursor_url(page.next_cursor)
+        page.previous_url = self._cursor_url(page.previous_cursor)
+        self.cursor_page = page
+        return None, page, page.object_list, False
+
+    def _cursor_url(self, cursor: Optional[str]) -> Optional[str]:
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params[self.cursor_param] = cursor
+        params.pop('page', None)
+        return f'?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_page'] = self.cursor_page
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') != 'json':
+            return super().render_to_response(context, **response_kwargs)
+        page = self.cursor_page
+        return JsonResponse({
+            'results': [self.serialize_product(product) for product in page],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+        })
+
+    @staticmethod
+    def serialize_product(product) -> dict:
+        return {
+            'id': str(product.id),
+            'name': product.name,
+            'slug': product.slug,
+            'url': product.get_absolute_url(),
+            'price': str(product.price),
+            'stock': product.stock,
+            'category': product.category.title,
+            'picture': product.picture.url if product.picture else None,
+        }
+
+
+# ============ CACHED COUNTS ============
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose ``count`` is cached per filter signature and catalog
+    version and revision. Querysets and lazily filtered snapshot results are
+    counted this way; plain sequences just use ``len()``.
+
+    With ``estimate_threshold`` set, counting stops at the threshold
+    (``COUNT(*)`` over a ``LIMIT``ed subquery, or a scan that stops early)
+    and ``count_is_estimated`` is set, so very large result sets never pay
+    for an exact count.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 signature: Optional[str] = None, estimate_threshold: Optional[int] = None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.signature = signature
+        self.estimate_threshold = estimate_threshold
+        self.count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, (QuerySet, SnapshotResults)):
+            # Plain sequences know their length already
+            return len(self.object_list)
+
+        key = None
+        if self.signature is not None:
+            digest = hashlib.md5(self.signature.encode()).hexdigest()
+            key = 'listing-count:{}.{}:{}'.format(*get_catalog_state(), digest)
+            cached = cache.get(key)
+            if cached is not None:
+                count, self.count_is_estimated = cached
+                return count
+
+        if self.estimate_threshold is not None:
+            capped = self.object_list[:self.estimate_threshold + 1]
+            count = capped.count() if isinstance(capped, QuerySet) else len(capped)
+            if count > self.estimate_threshold:
+                count, self.count_is_estimated = self.estimate_threshold, True
+        else:
+            count = super().count
+
+        if key is not None:
+            cache.set(key, (count, self.count_is_estimated), COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CachedCountMixin:
+    """
+    Use ``CachedCountPaginator`` for a ListView, keyed on the request path and
+    its normalized filter parameters
+    """
+    paginator_class = CachedCountPaginator
+    count_estimate_threshold = 10_000
+
+    def get_count_signature(self) -> str:
+        params = sorted(
+            (key, sorted(values))
+            for key, values in self.request.GET.lists()
+            if key not in NON_FILTER_PARAMS
+        )
+        return f'{self.request.path}?{params!r}'
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset,
+            per_page,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            signature=self.get_count_signature(),
+            estimate_threshold=self.count_estimate_threshold,
+            **kwargs,
+        )
@@ -0,0 +1,119 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from store.catalog import bump_catalog_version, next_catalog_revision
+from store.models import PopularityEpoch, Product
+
+# A sale counts half as much after this long
+POPULARITY_HALF_LIFE = timedelta(days=14)
+
+# Scores use forward decay: a sale at time t adds quantity * 2^((t - epoch) / half-life).
+# Every score shares the same decay factor at any moment, so the stored value
+# orders products exactly like the decayed one without ever being rewritten.
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Weights would overflow a float after 1024 half-lives (about 39 years); once
+# a sale is this many half-lives past the epoch, every score is rebased onto
+# the sale's time instead
+POPULARITY_REBASE_EXPONENT = 64
+
+POPULARITY_EPOCH_ID = 1
+
+
+def popularity_weight(sold_at: datetime, epoch: Optional[datetime] = None) -> float:
+    """Forward-decay weight of one unit sold at ``sold_at``"""
+    return math.pow(2, (sold_at - (epoch or get_popularity_epoch())) / POPULARITY_HALF_LIFE)
+
+
+def get_popularity_epoch(lock: bool = False) -> datetime:
+    """The epoch stored scores are relative to; ``lock`` holds it for a write"""
+    epochs = PopularityEpoch.objects.select_for_update() if lock else PopularityEpoch.objects
+    epoch, _ = epochs.get_or_create(pk=POPULARITY_EPOCH_ID, defaults={'epoch': POPULARITY_EPOCH})
+    return epoch.epoch
+
+
+def decayed_popularity(score: float, at: Optional[datetime] = None) -> float:
+    """Turn a stored score into units sold, decayed to ``at`` (default now)"""
+    return score / popularity_weight(at or timezone.now())
+
+
+def rebase_popularity_scores(epoch: datetime) -> None:
+    """
+    Move the epoch to ``epoch``, scaling every stored score by the same
+    factor, so their order and decayed values stay exactly as they were
+    """
+    with transaction.atomic():
+        factor = 1 / popularity_weight(epoch, get_popularity_epoch(lock=True))
+        Product.objects.exclude(popularity_score=0).update(popularity_score=F('popularity_score') * factor)
+        PopularityEpoch.objects.filter(pk=POPULARITY_EPOCH_ID).update(epoch=epoch, updated_at=timezone.now())
+        bump_catalog_version()
+
+
+def record_sales(sales: Iterable[Tuple[object, int]], sold_at: Optional[datetime] = None) -> None:
+    """
+    Add ``(product_id, quantity)`` sales to the stored scores in one F()
+    UPDATE; negative quantities take a sale back
+    """
+    sold_at = sold_at or timezone.now()
+    quantities = defaultdict(int)
+    for product_id, quantity in sales:
+        if product_id is not None and quantity:
+            quantities[product_id] += quantity
+    if not quantities:
+        return
+    with transaction.atomic():
+        epoch = get_popularity_epoch(lock=True)
+        if (sold_at - epoch) / POPULARITY_HALF_LIFE > POPULARITY_REBASE_EXPONENT:
+            rebase_popularity_scores(sold_at)
+            epoch = sold_at
+        weight = popularity_weight(sold_at, epoch)
+        increments = {product_id: quantity * weight for product_id, quantity in quantities.items()}
+        # Queryset updates send no signals; the revision lets every worker
+        # re-sort just these products instead of rebuilding its caches
+        Product.objects.filter(pk__in=increments).update(
+            popularity_score=F('popularity_score') + Case(
+                *[When(pk=product_id, then=Value(increment)) for product_id, increment in increments.items()],
+                output_field=FloatField(),
+            ),
+            revision=next_catalog_revision(),
+        )
+
+
+def rebuild_popularity_scores(batch_size: int = 500) -> int:
+    """
+    Recompute every product's score from order history, rebased onto the
+    current time; returns products updated
+    """
+    from orders.models import OrderElement
+
+    epoch = timezone.now()
+    scores = defaultdict(float)
+    elements = OrderElement.objects.filter(product__isnull=False).values_list(
+        'product_id', 'quantity', 'order__registered_at'
+    )
+    for product_id, quantity, registered_at in elements.iterator():
+        scores[product_id] += quantity * popularity_weight(registered_at, epoch)
+
+    updated = 0
+    with transaction.atomic():
+        get_popularity_epoch(lock=True)
+        PopularityEpoch.objects.filter(pk=POPULARITY_EPOCH_ID).update(epoch=epoch, updated_at=epoch)
+        batch = []
+        for product in Product.objects.only('id', 'popularity_score').iterator():
+            product.popularity_score = scores.get(product.pk, 0.0)
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, ['popularity_score'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, ['popularity_score'])
+            updated += len(batch)
+        bump_catalog_version()
+    return updated
@@ -0,0 +1,113 @@
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from store.catalog import next_catalog_revision
+from store.models import Product
+
+RATING_FIELDS = ('review_count', 'rating_sum', 'rating_average') + tuple(
+    f'rating_{stars}_count' for stars in range(1, 6)
+)
+
+
+def apply_rating_change(product_id, deltas: Dict[int, int]) -> None:
+    """
+    Add or remove approved reviews' ratings (``{stars: +1/-1}``) from a
+    product's aggregates in a single UPDATE, so concurrent reviews never
+    lose increments. The new revision lets every worker re-read just this
+    product, as queryset updates send no signals.
+    """
+    count_delta = sum(deltas.values())
+    new_count = F('review_count') + count_delta
+    new_sum = F('rating_sum') + sum(stars * delta for stars, delta in deltas.items())
+    with transaction.atomic():
+        Product.objects.filter(pk=product_id).update(
+            review_count=new_count,
+            rating_sum=new_sum,
+            rating_average=Case(
+                When(review_count=-count_delta, then=Value(0.0)),
+                default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+                output_field=FloatField(),
+            ),
+            revision=next_catalog_revision(),
+            **{
+                f'rating_{stars}_count': F(f'rating_{stars}_count') + delta
+                for stars, delta in deltas.items() if delta
+            },
+        )
+
+
+def apply_review_transition(before: Optional[tuple], after: Optional[tuple]) -> None:
+    """
+    Move a review's contribution between states, one UPDATE per product
+    affected and none when the visible contribution is unchanged.
+
+    ``before`` and ``after`` are ``(product_id, rating, is_approved)`` or None
+    for a review that doesn't exist (yet or anymore).
+    """
+    before = before if before and before[2] else None
+    after = after if after and after[2] else None
+    if before == after:
+        return
+    changes: Dict[object, Dict[int, int]] = {}
+    if before:
+        changes.setdefault(before[0], {})[before[1]] = -1
+    if after:
+        stars = changes.setdefault(after[0], {})
+        stars[after[1]] = stars.get(after[1], 0) + 1
+    with transaction.atomic():
+        for product_id, deltas in changes.items():
+            apply_rating_change(product_id, deltas)
+
+
+def recompute_rating_aggregates(product_ids: Optional[Iterable] = None, batch_size: int = 500) -> int:
+    """
+    Recompute aggregates from approved reviews in bulk, writing only the
+    products whose stored aggregates were wrong; returns how many were fixed
+    """
+    from core.models import Review
+
+    approved = Review.objects.filter(is_approved=True)
+    products = Product.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        approved = approved.filter(product_id__in=product_ids)
+        products = products.filter(pk__in=product_ids)
+
+    totals = {
+        row['product_id']: row
+        for row in approved.values('product_id').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{stars}_count': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+        )
+    }
+
+    updated = 0
+    with transaction.atomic():
+        revision = None
+        batch = []
+        for product in products.only('id', *RATING_FIELDS).iterator():
+            row = totals.get(product.pk, {})
+            stored = [getattr(product, field) for field in RATING_FIELDS]
+            product.review_count = row.get('review_count', 0)
+            product.rating_sum = row.get('rating_sum') or 0
+            product.rating_average = product.rating_sum / product.review_count if product.review_count else 0
+            for stars in range(1, 6):
+                setattr(product, f'rating_{stars}_count', row.get(f'rating_{stars}_count', 0))
+            if [getattr(product, field) for field in RATING_FIELDS] == stored:
+                continue
+            if revision is None:
+                revision = next_catalog_revision()
+            product.revision = revision
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, (*RATING_FIELDS, 'revision'))
+                updated += len(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, (*RATING_FIELDS, 'revision'))
+            updated += len(batch)
+    return updated
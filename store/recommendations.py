@@ -0,0 +1,195 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+from itertools import combinations, groupby, permutations
+from operator import itemgetter
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import F
+
+from store.models import Product, ProductAffinity
+
+# Neighbours kept per product; lookups show fewer
+AFFINITY_TOP_K = 20
+RECOMMENDATION_LIMIT = 4
+
+# Orders this large are bulk purchases, not signals of what goes together
+MAX_ORDER_PRODUCTS = 50
+
+
+def build_cooccurrence(top_k: int = AFFINITY_TOP_K) -> Dict[object, List[tuple]]:
+    """
+    Stream order lines grouped by order and count how often each pair of
+    products was bought together. Returns each product's ``top_k``
+    neighbours as ``(score, related_id)``, strongest first.
+    """
+    from orders.models import OrderElement
+
+    matrix: Dict[object, Counter] = defaultdict(Counter)
+    rows = OrderElement.objects.filter(product__isnull=False).order_by('order_id').values_list(
+        'order_id', 'product_id'
+    )
+    for _, lines in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+        product_ids = {product_id for _, product_id in lines}
+        if len(product_ids) > MAX_ORDER_PRODUCTS:
+            continue
+        for first, second in combinations(product_ids, 2):
+            matrix[first][second] += 1
+            matrix[second][first] += 1
+
+    return {
+        product_id: [(score, related_id) for related_id, score in neighbours.most_common(top_k)]
+        for product_id, neighbours in matrix.items()
+    }
+
+
+def rebuild_affinities(top_k: int = AFFINITY_TOP_K, batch_size: int = 1000) -> int:
+    """Replace every stored affinity with a fresh batch computation; returns rows written"""
+    neighbours = build_cooccurrence(top_k)
+    existing = set(Product.objects.values_list('id', flat=True))
+    rows = [
+        ProductAffinity(product_id=product_id, related_id=related_id, score=score)
+        for product_id, pairs in neighbours.items() if product_id in existing
+        for score, related_id in pairs if related_id in existing
+    ]
+    with transaction.atomic():
+        ProductAffinity.objects.all().delete()
+        ProductAffinity.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def record_order_lines(order_id, line_ids: Iterable, top_k: int = AFFINITY_TOP_K) -> None:
+    """
+    Pair the products of newly created order lines with each other and with
+    the products already in the order, counting each pair once however many
+    lines arrived together. Line ids that no longer exist (a rolled-back
+    savepoint) are ignored.
+
+    Between rebuilds this is approximate: a pair pruned from a product's top
+    ``top_k`` starts counting again from one.
+    """
+    from orders.models import OrderElement
+
+    line_ids = set(line_ids)
+    added, existing = set(), set()
+    for line_id, product_id in OrderElement.objects.filter(
+            order_id=order_id, product__isnull=False).values_list('pk', 'product_id'):
+        (added if line_id in line_ids else existing).add(product_id)
+    added -= existing
+    product_ids = added | existing
+    if not added or len(product_ids) < 2 or len(product_ids) >= MAX_ORDER_PRODUCTS:
+        return
+    pairs = [*permutations(added, 2), *((new, old) for new in added for old in existing),
+             *((old, new) for new in added for old in existing)]
+    _count_pairs(pairs, product_ids, top_k)
+
+
+class PendingOrderLines:
+    """
+    Order lines created in the current transaction, grouped by order and
+    recorded once on commit, so an order saved line by line is paired from
+    its full set of new lines instead of once per line.
+
+    Lines wait in a per-thread registry, as connections are per thread.
+    Every queued line registers a flush; the first one to run after commit
+    records them all and the rest find nothing left. Lines queued in a
+    rolled-back transaction or savepoint stay until the next flush, which
+    skips them because they no longer exist.
+    """
+    _local = threading.local()
+
+    @classmethod
+    def _lines(cls) -> Dict[object, set]:
+        lines = getattr(cls._local, 'lines', None)
+        if lines is None:
+            lines = cls._local.lines = defaultdict(set)
+        return lines
+
+    @classmethod
+    def flush(cls) -> None:
+        lines, cls._local.lines = cls._lines(), None
+        for order_id, line_ids in lines.items():
+            record_order_lines(order_id, line_ids)
+
+    @classmethod
+    def queue(cls, order_id, line_id) -> None:
+        if not transaction.get_connection().in_atomic_block:
+            # Autocommit: the line is already committed on its own
+            record_order_lines(order_id, [line_id])
+            return
+        cls._lines()[order_id].add(line_id)
+        transaction.on_commit(cls.flush)
+
+
+def record_order(order_id, top_k: int = AFFINITY_TOP_K) -> None:
+    """
+    Pair every product of a complete order with every other, once; for
+    orders whose lines were bulk-created without signals
+    """
+    from orders.models import OrderElement
+
+    product_ids = set(
+        OrderElement.objects.filter(order_id=order_id, product__isnull=False).values_list('product_id', flat=True)
+    )
+    if len(product_ids) < 2 or len(product_ids) >= MAX_ORDER_PRODUCTS:
+        return
+    _count_pairs(permutations(product_ids, 2), product_ids, top_k)
+
+
+def _count_pairs(pairs: Iterable[tuple], product_ids: set, top_k: int) -> None:
+    """Add one to each ``(product_id, related_id)`` pair, creating missing ones, then prune"""
+    pairs = set(pairs)
+    with transaction.atomic():
+        stored = {
+            (product_id, related_id): pk
+            for product_id, related_id, pk in ProductAffinity.objects.filter(
+                product_id__in=product_ids, related_id__in=product_ids
+            ).values_list('product_id', 'related_id', 'pk')
+        }
+        # Every existing pair gains one in a single UPDATE
+        ProductAffinity.objects.filter(pk__in=[stored[pair] for pair in pairs if pair in stored]).update(
+            score=F('score') + 1
+        )
+        ProductAffinity.objects.bulk_create(
+            [
+                ProductAffinity(product_id=product_id, related_id=related_id, score=1)
+                for product_id, related_id in pairs if (product_id, related_id) not in stored
+            ],
+            ignore_conflicts=True,
+        )
+        _prune(product_ids, top_k)
+
+
+def _prune(product_ids: Iterable, top_k: int) -> None:
+    """Drop neighbours beyond each product's ``top_k`` strongest, in one read and one delete"""
+    ranked = (
+        ProductAffinity.objects.filter(product_id__in=set(product_ids))
+        .order_by('product_id', '-score', 'pk')
+        .values_list('product_id', 'pk')
+    )
+    weakest = [
+        pk
+        for product_id, rows in groupby(ranked.iterator(), key=itemgetter(0))
+        for product_id, pk in list(rows)[top_k:]
+    ]
+    if weakest:
+        ProductAffinity.objects.filter(pk__in=weakest).delete()
+
+
+def frequently_bought_with(product_ids: Iterable, limit: int = RECOMMENDATION_LIMIT) -> List[Product]:
+    """
+    Products most often bought together with any of ``product_ids``,
+    excluding those products themselves; one indexed read
+    """
+    product_ids = list(product_ids)
+    affinities = ProductAffinity.objects.filter(
+        product_id__in=product_ids, related__is_active=True
+    ).exclude(related_id__in=product_ids).select_related('related__category').order_by('-score')
+
+    scores: Dict[object, int] = defaultdict(int)
+    related: Dict[object, Product] = {}
+    for affinity in affinities[:AFFINITY_TOP_K * max(len(product_ids), 1)]:
+        scores[affinity.related_id] += affinity.score
+        related[affinity.related_id] = affinity.related
+    return [related[related_id] for related_id in heapq.nlargest(limit, scores, key=scores.get)]
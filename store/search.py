@@ -0,0 +1,340 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from store.catalog import CatalogState, changed_products, get_catalog_state
+from store.normalization import normalize_text
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Relative weight of each indexed field (BM25F-style term frequency boost)
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+# Maximum number of vocabulary terms a single query token may expand to
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into normalized word tokens"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(normalize_text(text))
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over active products with BM25 ranking.
+
+    Every query token is matched as a prefix of indexed words, so partial
+    words ("tech" -> "technic") match, and a product must match all query
+    tokens to be returned. Unlike the ``icontains`` lookups this replaced,
+    fragments from the middle of a word ("chnic") don't match; SearchView's
+    trigram fallback (store.trigram) still finds most of those.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.version = 0
+        self.revision = 0
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[object, float]] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._max_frequency: Dict[str, float] = {}
+        self._docs: Dict[object, Tuple[Dict[str, float], float, float]] = {}
+        self._lengths: Dict[object, float] = {}
+        self._total_length = 0.0
+        self._categories: Dict[object, Tuple[str, str]] = {}
+        self._category_terms: Dict[object, List[str]] = {}
+
+    # ---------- building ----------
+
+    def add_product(self, product_id, name: str, description: str, category_title: str,
+                    created_at: float = 0.0) -> None:
+        """Index (or re-index) a single product"""
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, text in (('name', name), ('category', category_title), ('description', description)):
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                frequencies[token] += weight
+        length = sum(frequencies.values())
+
+        with self._lock:
+            self._remove_product(product_id)
+            for term, frequency in frequencies.items():
+                postings = self._postings[term]
+                if not postings:
+                    insort(self._terms, term)
+                postings[product_id] = frequency
+                # Never lowered on removal: it only has to stay an upper bound
+                self._max_frequency[term] = max(self._max_frequency.get(term, 0.0), frequency)
+            self._docs[product_id] = (dict(frequencies), length, created_at)
+            self._lengths[product_id] = length
+            self._total_length += length
+
+    def remove_product(self, product_id) -> None:
+        """Drop a product from the index"""
+        with self._lock:
+            self._remove_product(product_id)
+
+    def _remove_product(self, product_id) -> None:
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        frequencies, length, _ = doc
+        del self._lengths[product_id]
+        self._total_length -= length
+        for term in frequencies:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._max_frequency[term]
+                index = bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+
+    def add_category(self, category_id, title: str, slug: str) -> None:
+        """Index (or re-index) a category title"""
+        with self._lock:
+            self._categories[category_id] = (title, slug)
+            self._category_terms[category_id] = tokenize(title)
+
+    def remove_category(self, category_id) -> None:
+        """Drop a category from the index"""
+        with self._lock:
+            self._categories.pop(category_id, None)
+            self._category_terms.pop(category_id, None)
+
+    # ---------- querying ----------
+
+    def _expand(self, token: str) -> List[str]:
+        """Return vocabulary terms starting with the token"""
+        start = bisect_left(self._terms, token)
+        expanded = []
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def _idf(self, term: str, total_docs: int) -> float:
+        document_frequency = len(self._postings[term])
+        return math.log(1 + (total_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _upper_bound(self, terms: List[Tuple[str, float]]) -> float:
+        """Highest score a token's terms can add to any product (the shortest possible document)"""
+        k1, norm = self.k1, self.k1 * (1 - self.b)
+        return sum(
+            idf * self._max_frequency[term] * (k1 + 1) / (self._max_frequency[term] + norm)
+            for term, idf in terms
+        )
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[object]:
+        """
+        Return ids of products matching every query token, best match first.
+
+        Tokens are scored rarest first, and later tokens only look at
+        products that matched every earlier one. With a ``limit``, the
+        candidates left after the rarest token are visited best partial score
+        first into a top-``limit`` heap, and the scan stops as soon as even
+        the highest score the remaining tokens could add cannot make the heap.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            total_docs = len(self._docs)
+            if not total_docs:
+                return []
+            docs = self._docs
+            k1 = self.k1
+            # BM25 length normalization is base + scale * document length
+            base = k1 * (1 - self.b)
+            scale = k1 * self.b * total_docs / self._total_length if self._total_length else 0.0
+
+            expansions = []
+            for token in tokens:
+                terms = [(term, self._idf(term, total_docs)) for term in self._expand(token)]
+                if not terms:
+                    return []
+                expansions.append(terms)
+            expansions.sort(key=lambda terms: sum(len(self._postings[term]) for term, _ in terms))
+
+            lengths = self._lengths
+            scores: Dict[object, float] = {}
+            for term, idf in expansions[0]:
+                weight = idf * (k1 + 1)
+                term_scores = {
+                    product_id: weight * frequency / (frequency + base + scale * lengths[product_id])
+                    for product_id, frequency in self._postings[term].items()
+                }
+                if scores:
+                    for product_id, score in term_scores.items():
+                        scores[product_id] = scores.get(product_id, 0.0) + score
+                else:
+                    scores = term_scores
+
+            if limit is not None:
+                ranked = self._top(scores, expansions[1:], limit, base, scale)
+            else:
+                for terms in expansions[1:]:
+                    token_scores: Dict[object, float] = defaultdict(float)
+                    for term, idf in terms:
+                        postings = self._postings[term]
+                        # Walk whichever side is shorter
+                        if len(postings) <= len(scores):
+                            matched = ((pid, f) for pid, f in postings.items() if pid in scores)
+                        else:
+                            matched = ((pid, postings[pid]) for pid in scores if pid in postings)
+                        for product_id, frequency in matched:
+                            token_scores[product_id] += (
+                                idf * frequency * (k1 + 1) / (frequency + base + scale * lengths[product_id])
+                            )
+                    scores = {product_id: scores[product_id] + score for product_id, score in token_scores.items()}
+                    if not scores:
+                        return []
+                ranked = sorted(scores, key=lambda pid: (scores[pid], docs[pid][2]), reverse=True)
+        return ranked
+
+    def _top(self, partial: Dict[object, float], rest: List[List[Tuple[str, float]]], limit: int,
+             base: float, scale: float) -> List[object]:
+        """Best ``limit`` products among ``partial`` that also match every token of ``rest``"""
+        docs, k1 = self._docs, self.k1
+        if not rest:
+            # The limit-th best score, then only ties at it need the recency tiebreak
+            best = heapq.nlargest(limit, partial.values())
+            if not best:
+                return []
+            ranked = [product_id for product_id, score in partial.items() if score >= best[-1]]
+            ranked.sort(key=lambda pid: (partial[pid], docs[pid][2]), reverse=True)
+            return ranked[:limit]
+
+        # remaining[i]: the most that rest[i:] can still add to a score
+        remaining = [0.0] * (len(rest) + 1)
+        for position in range(len(rest) - 1, -1, -1):
+            remaining[position] = remaining[position + 1] + self._upper_bound(rest[position])
+        postings = [[(self._postings[term], idf) for term, idf in terms] for terms in rest]
+
+        top: List[Tuple[float, float, object]] = []
+        for product_id in sorted(partial, key=partial.get, reverse=True):
+            score = partial[product_id]
+            full = len(top) >= limit
+            if full and score + remaining[0] < top[0][0]:
+                # Candidates come best partial score first, so none of the rest can make it
+                break
+            norm = base + scale * self._lengths[product_id]
+            for position, terms in enumerate(postings):
+                found = False
+                for term_postings, idf in terms:
+                    frequency = term_postings.get(product_id)
+                    if frequency is not None:
+                        found = True
+                        score += idf * frequency * (k1 + 1) / (frequency + norm)
+                if not found or (full and score + remaining[position + 1] < top[0][0]):
+                    break
+            else:
+                entry = (score, docs[product_id][2], product_id)
+                if not full:
+                    heapq.heappush(top, entry)
+                elif entry[:2] > top[0][:2]:
+                    heapq.heapreplace(top, entry)
+        top.sort(key=lambda entry: entry[:2], reverse=True)
+        return [product_id for _, _, product_id in top]
+
+    def search_categories(self, query: str, limit: Optional[int] = None) -> List[Tuple[object, str, str]]:
+        """Return (id, title, slug) of categories whose title matches every query token"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            matches = [
+                (category_id, *self._categories[category_id])
+                for category_id, terms in self._category_terms.items()
+                if all(any(term.startswith(token) for term in terms) for token in tokens)
+            ]
+        matches.sort(key=lambda match: match[1])
+        return matches[:limit] if limit is not None else matches
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+# ============ PROCESS-WIDE INDEX ============
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def build_search_index(state: Optional[CatalogState] = None) -> SearchIndex:
+    """
+    Build a fresh index from the database, stamped with the catalog version
+    and revision read before the rows
+    """
+    from store.models import Category, Product
+
+    index = SearchIndex()
+    index.version, index.revision = state or get_catalog_state()
+    products = Product.objects.filter(is_active=True).values_list(
+        'id', 'name', 'description', 'category__title', 'created_at'
+    )
+    for product_id, name, description, category_title, created_at in products.iterator():
+        index.add_product(product_id, name, description, category_title, _timestamp(created_at))
+    for category_id, title, slug in Category.objects.values_list('id', 'title', 'slug'):
+        index.add_category(category_id, title, slug)
+    return index
+
+
+def patch_search_index(index: SearchIndex, revision: int) -> None:
+    """Re-index only the products stamped since the index's revision"""
+    for product_id, is_active, name, description, category_title, created_at in changed_products(
+            index.revision, 'name', 'description', 'category__title', 'created_at'):
+        if is_active:
+            index.add_product(product_id, name, description, category_title, _timestamp(created_at))
+        else:
+            index.remove_product(product_id)
+    index.revision = revision
+
+
+def get_search_index(state: Optional[CatalogState] = None) -> SearchIndex:
+    """
+    Return the process-wide search index, rebuilding it when the catalog
+    version in the database has moved on and re-indexing the products
+    changed since when only the revision has, so changes made by other
+    workers are picked up
+    """
+    global _index
+    if state is None:
+        state = get_catalog_state()
+    index = _index
+    if index is None or index.version != state.version or index.revision < state.revision:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != state.version:
+                index = _index = build_search_index(state)
+            elif index.revision < state.revision:
+                patch_search_index(index, state.revision)
+    return index
+
+
+def reset_search_index() -> None:
+    """Discard the index so it is rebuilt on next use"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if value else 0.0
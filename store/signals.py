@@ -0,0 +1,189 @@
+from decimal import Decimal
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from store.catalog import bump_catalog_version, touch_products
+from store.ratings import apply_review_transition
+from store.stats import refresh_category_stats
+from store.popularity import record_sales
+from store.recommendations import PendingOrderLines
+from store.carts import apply_cart_delta, merge_guest_cart, recalculate_cart_totals
+from core.models import Review
+from orders.models import OrderElement
+from store.models import CartItem, Category, Product
+
+
+# ============ CATALOG VERSION ============
+
+@receiver(post_save, sender=Product)
+def touch_saved_product(sender, instance, **kwargs):
+    """Let every worker patch just this product into its catalog caches"""
+    touch_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_version_on_catalog_change(sender, **kwargs):
+    """Invalidate catalog-derived caches in every worker"""
+    bump_catalog_version()
+
+
+# ============ RATING AGGREGATES ============
+
+# Rating aggregates and the product page fragments both follow from these;
+# votes and text edits leave the product alone
+REVIEW_STATE_FIELDS = ('product_id', 'rating', 'is_approved')
+
+
+def _review_state(review):
+    """(product_id, rating, is_approved) from loaded values only, None if any is deferred"""
+    values = vars(review)
+    if any(name not in values for name in REVIEW_STATE_FIELDS):
+        return None
+    return tuple(values[name] for name in REVIEW_STATE_FIELDS)
+
+
+def _stored_review_state(review):
+    return Review.objects.filter(pk=review.pk).values_list(*REVIEW_STATE_FIELDS).first()
+
+
+@receiver(post_init, sender=Review)
+def remember_review_state(sender, instance, **kwargs):
+    """Keep the loaded state so saves apply the difference without a query"""
+    instance._rating_state = _review_state(instance)
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_delete, sender=Review)
+def read_deferred_review_state(sender, instance, **kwargs):
+    """Reviews loaded with deferred fields read their state while the row is unchanged"""
+    if instance._rating_state is None and not instance._state.adding:
+        instance._rating_state = _stored_review_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_review_save(sender, instance, created, **kwargs):
+    """
+    Handle creation, approval, unapproval and rating edits. The rating
+    UPDATE also stamps the product's revision, which keys its page fragments.
+    """
+    old = None if created else instance._rating_state
+    new = _review_state(instance) or _stored_review_state(instance)
+    if old != new:
+        apply_review_transition(old, new)
+    instance._rating_state = new
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_review_delete(sender, instance, **kwargs):
+    apply_review_transition(instance._rating_state, None)
+
+
+# ============ CATEGORY STATS ============
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    """Capture the stored category so a moved product refreshes both sides"""
+    instance._stats_category_id = None
+    if not instance._state.adding:
+        instance._stats_category_id = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_stats_on_product_change(sender, instance, **kwargs):
+    category_ids = {instance.category_id, getattr(instance, '_stats_category_id', None)}
+    transaction.on_commit(lambda: refresh_category_stats(category_ids))
+
+
+@receiver(post_save, sender=Category)
+def create_category_stats(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: refresh_category_stats([instance.pk]))
+
+
+# ============ POPULARITY ============
+
+@receiver(post_save, sender=OrderElement)
+def record_sale_on_order(sender, instance, created, **kwargs):
+    """Count a newly ordered line towards its product's popularity"""
+    if created and instance.product_id:
+        sale = [(instance.product_id, instance.quantity)]
+        sold_at = instance.order.registered_at
+        transaction.on_commit(lambda: record_sales(sale, sold_at))
+
+
+@receiver(post_delete, sender=OrderElement)
+def revoke_sale_on_delete(sender, instance, **kwargs):
+    if instance.product_id:
+        sale = [(instance.product_id, -instance.quantity)]
+        sold_at = instance.order.registered_at
+        transaction.on_commit(lambda: record_sales(sale, sold_at))
+
+
+# ============ RECOMMENDATIONS ============
+
+@receiver(post_save, sender=OrderElement)
+def pair_ordered_product(sender, instance, created, **kwargs):
+    """Count the new line as bought together with the rest of its order, once per transaction"""
+    if created and instance.product_id:
+        PendingOrderLines.queue(instance.order_id, instance.pk)
+
+
+# ============ CART COUNTERS ============
+
+def _cart_line(item):
+    """(cart_id, quantity, price) from loaded values only, None if any is deferred"""
+    values = vars(item)
+    if any(values.get(name) is None for name in ('cart_id', 'quantity', 'price')):
+        return None
+    return values['cart_id'], values['quantity'], Decimal(str(values['price']))
+
+
+@receiver(post_init, sender=CartItem)
+def remember_cart_line(sender, instance, **kwargs):
+    """Keep the loaded state so saves apply a delta without a query"""
+    instance._cart_line = _cart_line(instance)
+
+
+@receiver(post_save, sender=CartItem)
+def update_cart_counters_on_save(sender, instance, created, **kwargs):
+    old, new = (None if created else instance._cart_line), _cart_line(instance)
+    if new is None or (old is None and not created):
+        recalculate_cart_totals([instance.cart_id, old and old[0]])
+    else:
+        if old is not None:
+            apply_cart_delta(old[0], -old[1], -old[1] * old[2])
+        apply_cart_delta(new[0], new[1], new[1] * new[2])
+    instance._cart_line = _cart_line(instance)
+
+
+@receiver(pre_delete, sender=CartItem)
+def remember_deleted_cart_line(sender, instance, **kwargs):
+    """Items loaded with deferred fields read their state while the row exists"""
+    if instance._cart_line is None:
+        instance._cart_line = CartItem.objects.filter(pk=instance.pk).values_list(
+            'cart_id', 'quantity', 'price'
+        ).first()
+
+
+@receiver(post_delete, sender=CartItem)
+def update_cart_counters_on_delete(sender, instance, **kwargs):
+    line = instance._cart_line
+    if line is not None:
+        apply_cart_delta(line[0], -line[1], -line[1] * line[2])
+
+
+# ============ GUEST CARTS ============
+
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
+    """Carry a guest's session cart over on login and registration"""
+    if request is not None and hasattr(request, 'session'):
+        merge_guest_cart(request.session, user)
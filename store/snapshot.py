@@ -0,0 +1,373 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.urls import reverse
+
+from store.catalog import CatalogState, changed_products, get_catalog_state
+from store.facets import parse_price
+
+# Orderings served from memory; each is precomputed when the snapshot loads
+SNAPSHOT_ORDERINGS = (
+    '-created_at', 'created_at', 'price', '-price', 'name_normalized', '-name_normalized',
+    'stock', '-stock', 'rating_average', '-rating_average', 'popularity_score', '-popularity_score',
+)
+DEFAULT_SNAPSHOT_ORDERING = '-created_at'
+
+
+class PictureCard(NamedTuple):
+    name: str
+    url: str
+
+    def __bool__(self) -> bool:
+        return bool(self.name)
+
+
+class CategoryCard(NamedTuple):
+    id: object
+    title: str
+    slug: str
+    picture: PictureCard
+
+    def __str__(self) -> str:
+        return self.title
+
+    def get_absolute_url(self) -> str:
+        return reverse('store:category', kwargs={'slug': self.slug})
+
+
+class ProductCard(NamedTuple):
+    """
+    Read-only view of a product with everything a listing card renders.
+
+    Tuples carry no per-instance ``__dict__``, so a snapshot of the whole
+    catalog stays small and can be shared between threads without copying.
+    """
+    id: object
+    name: str
+    name_normalized: str
+    slug: str
+    url: str
+    description: str
+    picture: PictureCard
+    price: Decimal
+    stock: int
+    status: str
+    category: CategoryCard
+    rating_average: float
+    review_count: int
+    popularity_score: float
+    created_at: datetime
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def category_id(self):
+        return self.category.id
+
+    @property
+    def rating_stars(self) -> int:
+        """Average rating rounded half up to whole stars"""
+        return int(self.rating_average + 0.5)
+
+    def get_absolute_url(self) -> str:
+        return self.url
+
+
+class SnapshotResults:
+    """
+    Products of one snapshot ordering that pass a filter, evaluated lazily.
+
+    Slicing scans only as far as the slice reaches, so the first page of a
+    listing stops after a page worth of matches; ``len()`` needs a full scan,
+    which is what CachedCountPaginator caches or caps.
+    """
+
+    def __init__(self, products: Tuple[ProductCard, ...], ordering: str,
+                 predicate: Optional[Callable[[ProductCard], bool]] = None,
+                 ascending: Optional[Tuple[ProductCard, ...]] = None):
+        self.products = products
+        self.ordering = ordering
+        self.predicate = predicate
+        # The same cards sorted by (field, id) ascending, for seeking
+        self.ascending = products if ascending is None else ascending
+        self._length: Optional[int] = None
+
+    def __iter__(self) -> Iterator[ProductCard]:
+        if self.predicate is None:
+            return iter(self.products)
+        return filter(self.predicate, self.products)
+
+    def seek(self, key: Optional[tuple] = None, backward: bool = False) -> Iterator[ProductCard]:
+        """
+        Matching products strictly after the ``(value, id)`` sort key in this
+        ordering, or strictly before it walking back with ``backward``.
+
+        The key is located by binary search, so the walk starts in the same
+        place whatever was added or removed before it since the key was taken.
+        """
+        if key is None:
+            return iter(()) if backward else iter(self)
+        ascending = self.ascending
+        sort_key = attrgetter(self.ordering.lstrip('-'), 'id')
+        if self.ordering.startswith('-') == backward:
+            start = bisect_right(ascending, key, key=sort_key)
+            products = (ascending[position] for position in range(start, len(ascending)))
+        else:
+            end = bisect_left(ascending, key, key=sort_key)
+            products = (ascending[position] for position in range(end - 1, -1, -1))
+        return products if self.predicate is None else filter(self.predicate, products)
+
+    def __getitem__(self, index):
+        if self.predicate is None:
+            return list(self.products[index]) if isinstance(index, slice) else self.products[index]
+        if isinstance(index, slice):
+            if (index.start or 0) < 0 or (index.stop or 0) < 0:
+                return list(self)[index]
+            return list(islice(self, index.start, index.stop, index.step))
+        if index < 0:
+            return list(self)[index]
+        for product in islice(self, index, None):
+            return product
+        raise IndexError(index)
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = len(self.products) if self.predicate is None else sum(1 for _ in self)
+        return self._length
+
+    def __bool__(self) -> bool:
+        return next(iter(self), None) is not None
+
+
+class CatalogSnapshot:
+    """
+    Immutable in-memory copy of the active catalog at one catalog version and
+    revision.
+
+    Products are held once per supported ordering, so a listing is a single
+    filtered scan in already-sorted order and never touches the database.
+    """
+    __slots__ = ('version', 'revision', 'products', 'by_id', 'categories', 'categories_by_id',
+                 'categories_by_slug', 'price_min', 'price_max', 'status_counts', '_orderings')
+
+    def __init__(self, version: int, products: Iterable[ProductCard], categories: Iterable[CategoryCard],
+                 revision: int = 0):
+        self.version = version
+        self.revision = revision
+        self.categories: Tuple[CategoryCard, ...] = tuple(sorted(categories, key=lambda category: category.title))
+        self.categories_by_id: Dict[object, CategoryCard] = {category.id: category for category in self.categories}
+        self.categories_by_slug: Dict[str, CategoryCard] = {category.slug: category for category in self.categories}
+
+        products = tuple(products)
+        self._load({product.id: product for product in products}, {
+            ordering: sorted(products, key=attrgetter(ordering, 'id'))
+            for ordering in SNAPSHOT_ORDERINGS if not ordering.startswith('-')
+        })
+
+    def _load(self, by_id: Dict[object, ProductCard], ascending: Dict[str, List[ProductCard]]) -> None:
+        self.by_id = by_id
+        self._orderings: Dict[str, Tuple[ProductCard, ...]] = {}
+        for ordering, products in ascending.items():
+            products = tuple(products)
+            self._orderings[ordering] = products
+            self._orderings[f'-{ordering}'] = products[::-1]
+        self.products = self._orderings[DEFAULT_SNAPSHOT_ORDERING]
+
+        prices = [product.price for product in by_id.values()]
+        self.price_min: Optional[Decimal] = min(prices) if prices else None
+        self.price_max: Optional[Decimal] = max(prices) if prices else None
+        self.status_counts: Dict[str, int] = dict(Counter(product.status for product in by_id.values()))
+
+    def patched(self, revision: int, changed: Iterable[ProductCard], removed: Iterable = ()) -> 'CatalogSnapshot':
+        """
+        A copy at ``revision`` with the ``changed`` cards replacing or joining
+        the existing ones and the ``removed`` ids dropped.
+
+        Nothing is re-sorted: outgoing cards are found and new ones placed by
+        binary search, so the cost is a copy of each ordering plus a few
+        comparisons per changed product.
+        """
+        changed = list(changed)
+        outgoing = [self.by_id[product_id] for product_id in {*removed, *(product.id for product in changed)}
+                    if product_id in self.by_id]
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.version = self.version
+        snapshot.revision = revision
+        snapshot.categories = self.categories
+        snapshot.categories_by_id = self.categories_by_id
+        snapshot.categories_by_slug = self.categories_by_slug
+
+        by_id = dict(self.by_id)
+        for product in outgoing:
+            del by_id[product.id]
+        by_id.update((product.id, product) for product in changed)
+        ascending = {}
+        for ordering in SNAPSHOT_ORDERINGS:
+            if ordering.startswith('-'):
+                continue
+            key = attrgetter(ordering, 'id')
+            products = list(self._orderings[ordering])
+            for product in outgoing:
+                del products[bisect_left(products, key(product), key=key)]
+            for product in changed:
+                insort(products, product, key=key)
+            ascending[ordering] = products
+        snapshot._load(by_id, ascending)
+        return snapshot
+
+    def ordered(self, ordering: Optional[str] = None) -> Tuple[ProductCard, ...]:
+        """Every product in ``ordering``, falling back to newest first"""
+        return self._orderings.get(ordering) or self.products
+
+    def filter(self, ordering: Optional[str] = None, category_ids: Optional[Iterable] = None,
+               min_price=None, max_price=None, in_stock: bool = False,
+               statuses: Optional[Iterable[str]] = None, ids: Optional[Iterable] = None) -> SnapshotResults:
+        """Products matching every given filter, in ``ordering``, evaluated as they are read"""
+        category_ids = set(category_ids) if category_ids is not None else None
+        statuses = set(statuses) if statuses is not None else None
+        ids = set(ids) if ids is not None else None
+        min_price, max_price = parse_price(min_price), parse_price(max_price)
+        if ordering not in self._orderings:
+            ordering = DEFAULT_SNAPSHOT_ORDERING
+
+        predicate = None
+        if any(value is not None for value in (category_ids, min_price, max_price, statuses, ids)) or in_stock:
+            def predicate(product: ProductCard) -> bool:
+                return (
+                    (category_ids is None or product.category.id in category_ids)
+                    and (min_price is None or product.price >= min_price)
+                    and (max_price is None or product.price <= max_price)
+                    and (not in_stock or product.stock > 0)
+                    and (statuses is None or product.status in statuses)
+                    and (ids is None or product.id in ids)
+                )
+        return SnapshotResults(self._orderings[ordering], ordering, predicate, self._orderings[ordering.lstrip('-')])
+
+    def select(self, product_ids: Iterable) -> List[ProductCard]:
+        """Products for ``product_ids`` in the given order, skipping unknown ids"""
+        return [self.by_id[product_id] for product_id in product_ids if product_id in self.by_id]
+
+    def category_ids_for_slugs(self, slugs: Iterable[str]) -> List[object]:
+        return [self.categories_by_slug[slug].id for slug in slugs if slug in self.categories_by_slug]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+
+# ============ PROCESS-WIDE SNAPSHOT ============
+
+_snapshot: Optional[CatalogSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def _picture(field, name: str) -> PictureCard:
+    return PictureCard(name or '', field.storage.url(name) if name else '')
+
+
+CARD_FIELDS = (
+    'id', 'name', 'name_normalized', 'slug', 'description', 'picture', 'price', 'stock',
+    'status', 'category_id', 'rating_average', 'review_count', 'popularity_score', 'created_at',
+)
+
+
+def _product_cards(rows, categories: Dict[object, CategoryCard]) -> List[ProductCard]:
+    """Cards for ``values_list(*CARD_FIELDS)`` rows, skipping unknown categories"""
+    from store.models import Product
+
+    product_picture = Product._meta.get_field('picture')
+    return [
+        ProductCard(
+            id=product_id,
+            name=name,
+            name_normalized=name_normalized,
+            slug=slug,
+            url=reverse('store:product_detail', kwargs={'slug': slug}),
+            description=description,
+            picture=_picture(product_picture, picture),
+            price=price,
+            stock=stock,
+            status=status,
+            category=categories[category_id],
+            rating_average=rating_average,
+            review_count=review_count,
+            popularity_score=popularity_score,
+            created_at=created_at,
+        )
+        for (product_id, name, name_normalized, slug, description, picture, price, stock,
+             status, category_id, rating_average, review_count, popularity_score, created_at) in rows
+        if category_id in categories
+    ]
+
+
+def build_catalog_snapshot(state: Optional[CatalogState] = None) -> CatalogSnapshot:
+    """
+    Load the active catalog into a new snapshot.
+
+    The version and revision are read before the rows, so a change committed
+    mid-load leaves the snapshot marked stale rather than silently current.
+    """
+    from store.models import Category, Product
+
+    if state is None:
+        state = get_catalog_state()
+
+    category_picture = Category._meta.get_field('picture')
+    categories = {
+        category_id: CategoryCard(category_id, title, slug, _picture(category_picture, picture))
+        for category_id, title, slug, picture in Category.objects.values_list('id', 'title', 'slug', 'picture')
+    }
+    rows = Product.objects.filter(is_active=True).values_list(*CARD_FIELDS)
+    products = _product_cards(rows.iterator(), categories)
+    return CatalogSnapshot(state.version, products, categories.values(), state.revision)
+
+
+def patch_catalog_snapshot(snapshot: CatalogSnapshot, revision: int) -> CatalogSnapshot:
+    """Re-read only the products stamped since the snapshot's revision"""
+    rows = list(changed_products(snapshot.revision, *CARD_FIELDS[1:]))
+    changed = _product_cards(
+        (row[:1] + row[2:] for row in rows if row[1]), snapshot.categories_by_id
+    )
+    changed_ids = {product.id for product in changed}
+    removed = [row[0] for row in rows if row[0] not in changed_ids]
+    return snapshot.patched(revision, changed, removed)
+
+
+def get_catalog_snapshot(state: Optional[CatalogState] = None) -> CatalogSnapshot:
+    """
+    Return the worker's catalog snapshot, reloading it when the catalog
+    version in the database has moved on and patching in the products
+    changed since when only the revision has.
+
+    The replacement is built aside and swapped in with a single assignment,
+    so concurrent readers see either the old or the new snapshot, never a mix.
+    """
+    global _snapshot
+    if state is None:
+        state = get_catalog_state()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != state.version or snapshot.revision < state.revision:
+        with _snapshot_lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != state.version:
+                snapshot = _snapshot = build_catalog_snapshot(state)
+            elif snapshot.revision < state.revision:
+                snapshot = _snapshot = patch_catalog_snapshot(snapshot, state.revision)
+    return snapshot
+
+
+def reset_catalog_snapshot() -> None:
+    """Discard the snapshot so it is reloaded on next use"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,43 @@
+from typing import Iterable, Optional
+
+from django.db.models import Count, Max, Min, Q
+
+from store.models import Category, CategoryStats, Product
+
+
+def refresh_category_stats(category_ids: Optional[Iterable] = None) -> int:
+    """
+    Recompute the stats rows of the given categories (all when None) with one
+    grouped aggregate query; returns the number of rows written.
+
+    Categories that no longer exist are skipped, so this is safe to run after a
+    cascading delete.
+    """
+    categories = Category.objects.all()
+    products = Product.objects.filter(is_active=True)
+    if category_ids is not None:
+        category_ids = {category_id for category_id in category_ids if category_id is not None}
+        if not category_ids:
+            return 0
+        categories = categories.filter(id__in=category_ids)
+        products = products.filter(category_id__in=category_ids)
+
+    aggregates = {
+        row.pop('category_id'): row
+        for row in products.values('category_id').annotate(
+            product_count=Count('id'),
+            in_stock_count=Count('id', filter=Q(stock__gt=0)),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        ).order_by()
+    }
+    empty = {'product_count': 0, 'in_stock_count': 0, 'min_price': None, 'max_price': None}
+
+    written = 0
+    for category_id in categories.values_list('id', flat=True):
+        CategoryStats.objects.update_or_create(
+            category_id=category_id,
+            defaults=aggregates.get(category_id, empty),
+        )
+        written += 1
+    return written
@@ -1,3 +1,777 @@
-from django.test import TestCase
+import random
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Review
+from store.autocomplete import MAX_DEPTH, AutocompleteTrie, reset_autocomplete
+from store.catalog import bump_catalog_version, forget_catalog_state, get_catalog_state
+from orders.models import Customer, Order, OrderElement
+from store.facets import FacetIndex, get_facet_index, reset_facet_index
+from store.models import Category, CategoryStats, Product, ProductAffinity
+from store.normalization import normalize_text
+from store.popularity import (
+    POPULARITY_HALF_LIFE, POPULARITY_REBASE_EXPONENT, decayed_popularity, get_popularity_epoch, record_sales,
+    rebase_popularity_scores,
+)
+from store.pagination import CachedCountPaginator, CursorPaginator
+from store.search import SearchIndex, reset_search_index
+from store.trigram import TrigramIndex, reset_fuzzy_matcher, trigrams
+from store.stats import refresh_category_stats
+from store.snapshot import get_catalog_snapshot, reset_catalog_snapshot
+
+
+def make_products(category, count, **fields):
+    return [
+        Product.objects.create(
+            name=f'{category.title} {number}', slug=f'{category.slug}-{number}', price=Decimal('10.00'),
+            stock=1, category=category, **fields,
+        )
+        for number in range(count)
+    ]
+
+
+class CachedCountPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_catalog_snapshot()
+        self.category = Category.objects.create(title='Technic', slug='technic')
+        make_products(self.category, 5)
+
+    def _count(self, object_list, **kwargs):
+        paginator = CachedCountPaginator(object_list, 2, signature='/shop/?[]', **kwargs)
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        counted = any('COUNT' in query['sql'] for query in queries.captured_queries)
+        return count, paginator.count_is_estimated, counted
+
+    def test_count_is_cached_per_signature(self):
+        self.assertEqual(self._count(Product.objects.all()), (5, False, True))
+        self.assertEqual(self._count(Product.objects.all()), (5, False, False))
+
+    def test_catalog_version_bump_misses_the_cache(self):
+        self._count(Product.objects.all())
+        bump_catalog_version()
+        self.assertEqual(self._count(Product.objects.all()), (5, False, True))
+
+    def test_estimated_count_stops_at_the_threshold(self):
+        self.assertEqual(self._count(Product.objects.all(), estimate_threshold=3), (3, True, True))
+        # The estimate is cached along with its flag
+        self.assertEqual(self._count(Product.objects.all(), estimate_threshold=3), (3, True, False))
+
+    def test_snapshot_results_are_counted_and_estimated(self):
+        results = get_catalog_snapshot().filter(category_ids=[self.category.id])
+        paginator = CachedCountPaginator(results, 2, signature='/category/technic/?[]', estimate_threshold=3)
+        self.assertEqual((paginator.count, paginator.count_is_estimated), (3, True))
+        self.assertEqual(len(paginator.page(2).object_list), 1)
+
+    def test_listing_shows_estimated_counts_with_a_plus(self):
+        from store.views import ShopView
+
+        ShopView.count_estimate_threshold = 3
+        try:
+            response = self.client.get('/shop/')
+        finally:
+            ShopView.count_estimate_threshold = 10_000
+        self.assertContains(response, '<strong>3+</strong>', html=False)
+
+
+class SnapshotKeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        self.category = Category.objects.create(title='City', slug='city')
+        self.products = make_products(self.category, 6)
+        for number, product in enumerate(self.products):
+            Product.objects.filter(pk=product.pk).update(price=Decimal(10 + number))
+        bump_catalog_version()
+
+    def _page(self, ordering, cursor=None):
+        return CursorPaginator(get_catalog_snapshot().filter(ordering), 2).page(cursor)
+
+    def test_insert_between_pages_neither_skips_nor_repeats(self):
+        first = self._page('price')
+        self.assertEqual([product.price for product in first], [Decimal(10), Decimal(11)])
+        # A product sorting before the cursor would shift a positional page by one
+        Product.objects.create(name='Cheap', slug='cheap', price=Decimal('1.00'), stock=1, category=self.category)
+        second = self._page('price', first.next_cursor)
+        self.assertEqual([product.price for product in second], [Decimal(12), Decimal(13)])
+
+        seen, page = [], first
+        while page.has_next:
+            page = self._page('price', page.next_cursor)
+            seen.extend(product.price for product in page)
+        self.assertEqual(seen, [Decimal(price) for price in range(12, 16)])
+
+    def test_descending_pages_and_previous_cursor(self):
+        first = self._page('-price')
+        second = self._page('-price', first.next_cursor)
+        self.assertEqual([product.price for product in second], [Decimal(13), Decimal(12)])
+        back = self._page('-price', second.previous_cursor)
+        self.assertEqual([product.id for product in back], [product.id for product in first])
+        self.assertFalse(back.has_previous)
+
+    def test_filters_apply_while_seeking(self):
+        Product.objects.filter(pk__in=[product.pk for product in self.products[:3]]).update(stock=0)
+        bump_catalog_version()
+        results = get_catalog_snapshot().filter('price', in_stock=True)
+        first = CursorPaginator(results, 2).page()
+        second = CursorPaginator(results, 2).page(first.next_cursor)
+        self.assertEqual([product.price for product in [*first, *second]], [Decimal(13), Decimal(14), Decimal(15)])
+        self.assertFalse(second.has_next)
+
+    def test_cursor_json_listing(self):
+        response = self.client.get('/shop/', {'format': 'json', 'sort': 'price-low'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 6)
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(title='Ideas', slug='ideas')
+        self.first, self.second = make_products(category, 2)
+
+    def _scores(self):
+        return dict(Product.objects.values_list('pk', 'popularity_score'))
+
+    def test_recent_sales_outweigh_older_ones(self):
+        now = timezone.now()
+        record_sales([(self.first.pk, 3)], now - POPULARITY_HALF_LIFE * 2)
+        record_sales([(self.second.pk, 1)], now)
+        scores = self._scores()
+        self.assertGreater(scores[self.second.pk], scores[self.first.pk])
+        self.assertAlmostEqual(decayed_popularity(scores[self.first.pk], now), 0.75)
+
+    def test_negative_quantities_take_a_sale_back(self):
+        now = timezone.now()
+        record_sales([(self.first.pk, 2)], now)
+        record_sales([(self.first.pk, -2)], now)
+        self.assertAlmostEqual(self._scores()[self.first.pk], 0.0)
+
+    def test_rebase_keeps_order_and_decayed_values(self):
+        now = timezone.now()
+        record_sales([(self.first.pk, 2), (self.second.pk, 1)], now)
+        before = {pk: decayed_popularity(score, now) for pk, score in self._scores().items()}
+        rebase_popularity_scores(now)
+        self.assertEqual(get_popularity_epoch(), now)
+        after = {pk: decayed_popularity(score, now) for pk, score in self._scores().items()}
+        for pk in before:
+            self.assertAlmostEqual(before[pk], after[pk])
+
+    def test_sales_far_past_the_epoch_rebase_first(self):
+        now = timezone.now()
+        record_sales([(self.first.pk, 1)], now)
+        far = get_popularity_epoch() + POPULARITY_HALF_LIFE * (POPULARITY_REBASE_EXPONENT + 1)
+        record_sales([(self.second.pk, 1)], far)
+        self.assertEqual(get_popularity_epoch(), far)
+        scores = self._scores()
+        self.assertEqual(scores[self.second.pk], 1.0)
+        # The earlier sale keeps its weight relative to the new one
+        self.assertAlmostEqual(scores[self.first.pk] / 2 ** ((now - far) / POPULARITY_HALF_LIFE), 1.0)
+
+
+class CatalogStateTests(TestCase):
+    def setUp(self):
+        forget_catalog_state()
+        reset_catalog_snapshot()
+        reset_autocomplete()
+        make_products(Category.objects.create(title='Star Wars', slug='star-wars'), 3)
+
+    def _state_reads(self, path, data):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(path, data).status_code, 200)
+        return sum('store_catalogversion' in query['sql'] for query in queries.captured_queries)
+
+    def test_autocomplete_keystrokes_reuse_the_state(self):
+        self._state_reads('/api/autocomplete/', {'q': 'st'})
+        with self.assertNumQueries(0):
+            self.client.get('/api/autocomplete/', {'q': 'sta'})
+
+    def test_local_changes_are_seen_at_once(self):
+        state = get_catalog_state()
+        bump_catalog_version()
+        self.assertEqual(get_catalog_state().version, state.version + 1)
+
+    @override_settings(CATALOG_STATE_MAX_AGE=0)
+    def test_search_reads_the_state_once_per_request(self):
+        self.assertEqual(self._state_reads('/search/', {'q': 'star'}), 1)
+        self.assertEqual(self._state_reads('/api/search/', {'q': 'star'}), 1)
+
+
+class ReviewRevisionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('reviewer', 'reviewer@example.com', 'secret-pass-1')
+        self.product, = make_products(Category.objects.create(title='Creator', slug='creator'), 1)
+        self.review = Review.objects.create(
+            product=self.product, author=self.user, title='Great', content='Great set', rating=4
+        )
+
+    def _revision(self):
+        return Product.objects.values_list('revision', flat=True).get(pk=self.product.pk)
+
+    def test_helpful_votes_leave_the_product_alone(self):
+        self.client.force_login(self.user)
+        revision = self._revision()
+        url = f'/review/{self.review.pk}/helpful/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'action': 'helpful'})
+        self.assertEqual(response.json()['helpful_count'], 1)
+        review_queries = [query['sql'] for query in queries.captured_queries if 'core_review' in query['sql']]
+        self.assertEqual(len(review_queries), 2)
+        self.assertFalse(any('store_product' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(self.client.post(url, {'action': 'unhelpful'}).json()['unhelpful_count'], 1)
+        self.assertEqual(self._revision(), revision)
+        self.assertEqual(self.client.post(url, {'action': 'other'}).status_code, 400)
+
+    def test_approval_changes_stamp_the_product(self):
+        revision = self._revision()
+        self.review.is_approved = False
+        self.review.save()
+        self.assertGreater(self._revision(), revision)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+
+    def _product_updates(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            action()
+        sql = [query['sql'] for query in queries.captured_queries]
+        return sum(query.startswith('UPDATE "store_product"') for query in sql), sql
+
+    def test_saves_without_rating_changes_skip_the_aggregates(self):
+        review = Review.objects.get(pk=self.review.pk)
+        review.title = 'Still great'
+        updates, sql = self._product_updates(review.save)
+        self.assertEqual(updates, 0)
+        # The stored state was captured on load, not re-read
+        self.assertFalse(any(query.startswith('SELECT') for query in sql))
+
+    def test_rating_edit_is_one_product_update(self):
+        self.review.rating = 2
+        updates, _ = self._product_updates(self.review.save)
+        self.assertEqual(updates, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(
+            (self.product.review_count, self.product.rating_sum, self.product.rating_2_count,
+             self.product.rating_4_count),
+            (1, 2, 1, 0),
+        )
+
+    def test_deferred_reviews_read_their_stored_state(self):
+        review = Review.objects.only('pk', 'title').get(pk=self.review.pk)
+        review.rating = 5
+        review.save(update_fields=['rating'])
+        review = Review.objects.defer('is_approved').get(pk=self.review.pk)
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (0, 0))
+
+
+class PendingOrderLinesTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret-pass-1')
+        self.products = make_products(Category.objects.create(title='Duplo', slug='duplo'), 4)
+        self.order = Order.objects.create(customer=Customer.objects.create(user=user), address='Brick Lane 1')
+
+    def _add_line(self, product):
+        OrderElement.objects.create(order=self.order, product=product, quantity=1, price=product.price)
+
+    def _pairs(self):
+        return dict(((row[0], row[1]), row[2]) for row in ProductAffinity.objects.values_list(
+            'product_id', 'related_id', 'score'
+        ))
+
+    def test_lines_saved_one_by_one_are_paired_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for product in self.products[:3]:
+                    self._add_line(product)
+        pairs = self._pairs()
+        self.assertEqual(len(pairs), 6)
+        self.assertEqual(set(pairs.values()), {1})
+
+    def test_rolled_back_lines_are_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self._add_line(self.products[0])
+                try:
+                    with transaction.atomic():
+                        self._add_line(self.products[3])
+                        raise ValueError
+                except ValueError:
+                    pass
+                self._add_line(self.products[1])
+        self.assertEqual(set(self._pairs()), {
+            (self.products[0].pk, self.products[1].pk), (self.products[1].pk, self.products[0].pk),
+        })
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add_product(1, 'Technic Crane', 'A heavy lifting crane', 'Technic', 1.0)
+        self.index.add_product(2, 'City Fire Truck', 'Comes with a technic style crane arm', 'City', 2.0)
+        self.index.add_product(3, 'Friends Cafe', 'A cosy cafe', 'Friends', 3.0)
+
+    def test_tokens_match_word_prefixes_and_all_must_match(self):
+        self.assertEqual(set(self.index.search('tech')), {1, 2})
+        self.assertEqual(self.index.search('tech truck'), [2])
+        self.assertEqual(self.index.search('chnic'), [])
+        self.assertEqual(self.index.search('cafe crane'), [])
+
+    def test_name_matches_outrank_description_matches(self):
+        self.assertEqual(self.index.search('crane'), [1, 2])
+
+    def test_reindexing_and_removal(self):
+        self.index.add_product(3, 'Friends Crane Cafe', '', 'Friends', 3.0)
+        self.assertIn(3, self.index.search('crane'))
+        self.index.remove_product(1)
+        self.assertNotIn(1, self.index.search('crane'))
+        self.assertEqual(len(self.index), 2)
+
+    def test_pruned_top_k_matches_the_full_ranking(self):
+        words = ['brick', 'space', 'castle', 'train', 'pirate', 'ship', 'tower', 'police', 'ninja', 'robot']
+        rng = random.Random(7)
+        index = SearchIndex()
+        for product_id in range(400):
+            index.add_product(
+                product_id,
+                ' '.join(rng.choices(words, k=rng.randint(1, 4))),
+                ' '.join(rng.choices(words, k=rng.randint(0, 12))),
+                rng.choice(words),
+                float(product_id),
+            )
+        for query in ('brick', 'space ship', 'pi to', 'ninja robot castle', 'train tower police'):
+            with self.subTest(query=query):
+                ranked = index.search(query)
+                for limit in (1, 5, 20):
+                    self.assertEqual(index.search(query, limit=limit), ranked[:limit])
+
+    def test_categories_match_every_token(self):
+        self.index.add_category(10, 'Star Wars', 'star-wars')
+        self.index.add_category(11, 'Starter Sets', 'starter-sets')
+        self.assertEqual([match[0] for match in self.index.search_categories('star')], [10, 11])
+        self.assertEqual(self.index.search_categories('star wa'), [(10, 'Star Wars', 'star-wars')])
+
+
+class SearchViewTests(TestCase):
+    def setUp(self):
+        reset_search_index()
+        reset_catalog_snapshot()
+        category = Category.objects.create(title='Technic', slug='technic')
+        self.crane = Product.objects.create(
+            name='Mobile Crane', slug='mobile-crane', price=Decimal('99.00'), stock=3, category=category,
+        )
+
+    def test_search_page_and_api(self):
+        response = self.client.get('/search/', {'q': 'crane'})
+        self.assertEqual([product.id for product in response.context['results']], [self.crane.id])
+        api = self.client.get('/api/search/', {'q': 'tech'}).json()
+        self.assertEqual([product['slug'] for product in api['products']], ['mobile-crane'])
+        self.assertEqual([category['slug'] for category in api['categories']], ['technic'])
+
+    def test_product_changes_reach_the_index(self):
+        self.client.get('/search/', {'q': 'crane'})
+        self.crane.name = 'Tower Crane'
+        self.crane.save()
+        response = self.client.get('/search/', {'q': 'tower'})
+        self.assertEqual([product.id for product in response.context['results']], [self.crane.id])
+
+
+class AutocompleteTrieTests(SimpleTestCase):
+    entries = [
+        (1, 'Millennium Falcon', 9.0),
+        (2, 'Falcon Fighter', 4.0),
+        (3, 'Fire Station', 6.0),
+        (4, 'Millennium Falcon', 1.0),
+        (5, 'Super Star Destroyer Collector Edition', 2.0),
+    ]
+
+    def test_every_word_starts_a_completion(self):
+        trie = AutocompleteTrie.from_entries(self.entries)
+        self.assertEqual(trie.complete('fa'), ['Millennium Falcon', 'Falcon Fighter'])
+        self.assertEqual(trie.complete('f'), ['Millennium Falcon', 'Fire Station', 'Falcon Fighter'])
+        self.assertEqual(trie.complete('f', limit=1), ['Millennium Falcon'])
+        self.assertEqual(trie.complete('xyz'), [])
+
+    def test_prefixes_longer_than_the_trie(self):
+        trie = AutocompleteTrie.from_entries(self.entries)
+        prefix = 'destroyer collector ed'
+        self.assertGreater(len(prefix), MAX_DEPTH)
+        self.assertEqual(trie.complete(prefix), ['Super Star Destroyer Collector Edition'])
+        self.assertEqual(trie.complete('destroyer collectors'), [])
+
+    def test_incremental_updates_match_a_fresh_build(self):
+        rng = random.Random(3)
+        words = ['star', 'starship', 'station', 'stone', 'castle', 'cast', 'falcon', 'fire']
+        entries = [(number, ' '.join(rng.choices(words, k=3)), rng.random()) for number in range(60)]
+        trie = AutocompleteTrie()
+        for entry in entries:
+            trie.add(*entry)
+        for number in range(0, 60, 3):
+            trie.remove(number)
+        fresh = AutocompleteTrie.from_entries(entry for entry in entries if entry[0] % 3)
+        self.assertEqual(len(trie), len(fresh))
+        for prefix in ('s', 'st', 'sta', 'star', 'starship st', 'c', 'cas', 'f', 'fire cast'):
+            with self.subTest(prefix=prefix):
+                self.assertEqual(trie.complete(prefix), fresh.complete(prefix))
+
+    def test_prefixes_are_normalized(self):
+        trie = AutocompleteTrie.from_entries([(1, 'İstanbul Tram', 1.0)])
+        self.assertEqual(trie.complete('ISTAN'), ['İstanbul Tram'])
+        self.assertEqual(trie.complete('ıst'), ['İstanbul Tram'])
+
+
+class TrigramIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.add(1, 'Millennium Falcon')
+        self.index.add(2, 'Fire Station')
+        self.index.add(3, 'Falcon Fighter')
+
+    def test_trigrams_are_padded(self):
+        self.assertEqual(trigrams('ab'), {'  a', ' ab', 'ab '})
+
+    def test_typos_still_match(self):
+        self.assertEqual([doc_id for doc_id, _ in self.index.search('milenium')], [1])
+        self.assertEqual({doc_id for doc_id, _ in self.index.search('falcn')}, {1, 3})
+        self.assertEqual(self.index.search('qwerty'), [])
+
+    def test_documents_need_every_word_on_average(self):
+        ranked = self.index.search('falcon fightr')
+        self.assertEqual(ranked[0][0], 3)
+        self.assertEqual(self.index.search('falcon fightr', limit=1), ranked[:1])
+
+    def test_removal_drops_unused_words(self):
+        vocabulary = self.index.vocabulary_size
+        self.index.remove(2)
+        self.assertEqual(self.index.vocabulary_size, vocabulary - 2)
+        self.assertEqual(self.index.search('staton'), [])
+
+
+class FuzzySearchViewTests(TestCase):
+    def setUp(self):
+        reset_search_index()
+        reset_fuzzy_matcher()
+        reset_catalog_snapshot()
+        self.category = Category.objects.create(title='Star Wars', slug='star-wars')
+        self.falcon = Product.objects.create(
+            name='Millennium Falcon', slug='millennium-falcon', price=Decimal('160.00'), stock=2,
+            category=self.category,
+        )
+
+    def test_misspelt_queries_fall_back_to_trigrams(self):
+        response = self.client.get('/search/', {'q': 'milenium'})
+        self.assertEqual([product.id for product in response.context['results']], [self.falcon.id])
+        self.assertTrue(response.context['fuzzy_results'])
+        self.assertEqual(list(response.context['categories']), [])
+
+        response = self.client.get('/search/', {'q': 'millennium'})
+        self.assertFalse(response.context['fuzzy_results'])
+
+    def test_api_falls_back_for_categories(self):
+        api = self.client.get('/api/search/', {'q': 'star wras'}).json()
+        self.assertEqual([category['slug'] for category in api['categories']], ['star-wars'])
+
+
+class NameNormalizationTests(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        self.category = Category.objects.create(title='Cities', slug='cities')
+
+    def test_turkish_case_and_diacritics_fold(self):
+        for text in ('İstanbul', 'ISTANBUL', 'ıstanbul', 'istanbul'):
+            self.assertEqual(normalize_text(text), 'istanbul')
+        self.assertEqual(normalize_text('Şehir Çarşı Göğü'), 'sehir carsi gogu')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_saves_keep_the_folded_name_in_sync(self):
+        product = Product.objects.create(
+            name='Öğretmen Evi', slug='ogretmen-evi', price=Decimal('10.00'), stock=1, category=self.category,
+        )
+        self.assertEqual(Product.objects.get(pk=product.pk).name_normalized, 'ogretmen evi')
+        product.name = 'Çiçekçi'
+        product.save(update_fields=['name'])
+        self.assertEqual(Product.objects.get(pk=product.pk).name_normalized, 'cicekci')
+
+    def test_listings_sort_by_the_folded_name(self):
+        for slug, name in (('zeytin', 'zeytin'), ('cay', 'Çay'), ('istanbul', 'İstanbul'), ('bina', 'bina')):
+            Product.objects.create(name=name, slug=slug, price=Decimal('10.00'), stock=1, category=self.category)
+        expected = ['bina', 'Çay', 'İstanbul', 'zeytin']
+
+        response = self.client.get('/shop/', {'sort': 'name'})
+        self.assertEqual([product.name for product in response.context['object_list']], expected)
+        response = self.client.get('/category/cities/', {'sort': '-name'})
+        self.assertEqual([product.name for product in response.context['object_list']], expected[::-1])
+
+
+class FacetIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = FacetIndex()
+        self.index.add(1, 'city', Decimal('10'), True)
+        self.index.add(2, 'city', Decimal('30'), False)
+        self.index.add(3, 'technic', Decimal('45'), True)
+        self.index.add(4, 'technic', Decimal('250'), True)
+
+    def _bucket_counts(self, counts):
+        return [bucket['count'] for bucket in counts['price_buckets']]
+
+    def test_unfiltered_counts(self):
+        counts = self.index.counts()
+        self.assertEqual(counts['total'], 4)
+        self.assertEqual(counts['categories'], {'city': 2, 'technic': 2})
+        self.assertEqual(self._bucket_counts(counts), [1, 2, 0, 0, 1])
+        self.assertEqual(counts['in_stock'], 3)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        counts = self.index.counts(['city'], in_stock=True)
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['categories'], {'city': 1, 'technic': 2})
+        self.assertEqual(self._bucket_counts(counts), [1, 0, 0, 0, 0])
+        self.assertEqual(counts['in_stock'], 1)
+
+    def test_price_bounds_check_edge_buckets_per_product(self):
+        counts = self.index.counts(min_price='20', max_price='40')
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['categories'], {'city': 1, 'technic': 0})
+        # Garbage bounds are ignored rather than failing the page
+        self.assertEqual(self.index.counts(min_price='cheap')['total'], 4)
+
+    def test_reindexing_and_removal_reuse_ordinals(self):
+        self.index.add(2, 'technic', Decimal('30'), True)
+        self.assertEqual(self.index.counts()['categories'], {'city': 1, 'technic': 3})
+        self.index.remove(1)
+        self.index.remove(1)
+        self.assertEqual(self.index.counts()['categories'], {'technic': 3})
+        self.index.add(5, 'city', Decimal('5'), True)
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.counts(['city'])['total'], 1)
+
+
+class FacetViewTests(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        reset_facet_index()
+        forget_catalog_state()
+        self.city = Category.objects.create(title='City', slug='city')
+        self.technic = Category.objects.create(title='Technic', slug='technic')
+        self.cities = make_products(self.city, 3)
+        make_products(self.technic, 2)
+
+    def test_shop_counts_other_categories_under_a_selection(self):
+        response = self.client.get('/shop/', {'category': 'city'})
+        counts = {category['slug']: category['facet_count'] for category in response.context['categories']}
+        self.assertEqual(counts, {'city': 3, 'technic': 2})
+        self.assertEqual(response.context['facets']['total'], 3)
+
+    def test_stock_and_price_changes_patch_the_index(self):
+        self.assertEqual(get_facet_index().counts([self.city.id], in_stock=True)['total'], 3)
+        index = get_facet_index()
+        product = self.cities[0]
+        product.stock = 0
+        product.price = Decimal('120.00')
+        product.save()
+        forget_catalog_state()
+
+        self.assertIs(get_facet_index(), index)
+        counts = index.counts([self.city.id], in_stock=True)
+        self.assertEqual(counts['total'], 2)
+        self.assertEqual([bucket['count'] for bucket in counts['price_buckets']], [2, 0, 0, 0, 0])
+
+        Product.objects.filter(pk=self.cities[1].pk).delete()
+        forget_catalog_state()
+        self.assertEqual(get_facet_index().counts([self.city.id])['total'], 2)
+
+
+class SnapshotPatchTests(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        forget_catalog_state()
+        self.category = Category.objects.create(title='Ideas', slug='ideas')
+        self.products = make_products(self.category, 4)
+        for number, product in enumerate(self.products):
+            Product.objects.filter(pk=product.pk).update(price=Decimal(10 + number))
+        bump_catalog_version()
+        self.snapshot = get_catalog_snapshot()
+
+    def _prices(self, snapshot, ordering='price'):
+        return [product.price for product in snapshot.ordered(ordering)]
+
+    def test_saved_products_are_patched_in_place(self):
+        product = self.products[0]
+        product.price = Decimal('12.50')
+        product.save()
+        forget_catalog_state()
+
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = get_catalog_snapshot()
+        self.assertEqual((snapshot.version, len(queries)), (self.snapshot.version, 2))
+        self.assertGreater(snapshot.revision, self.snapshot.revision)
+        self.assertEqual(self._prices(snapshot), [Decimal(11), Decimal(12), Decimal('12.50'), Decimal(13)])
+        self.assertEqual(self._prices(snapshot, '-price')[0], Decimal(13))
+        # Untouched cards are shared with the previous snapshot, which stays as it was
+        self.assertIs(snapshot.by_id[self.products[3].pk], self.snapshot.by_id[self.products[3].pk])
+        self.assertEqual(self._prices(self.snapshot)[0], Decimal(10))
+        self.assertEqual(snapshot.price_min, Decimal(11))
+
+    def test_deactivated_products_drop_out(self):
+        product = self.products[1]
+        product.is_active = False
+        product.save()
+        forget_catalog_state()
+
+        snapshot = get_catalog_snapshot()
+        self.assertEqual(snapshot.version, self.snapshot.version)
+        self.assertNotIn(product.pk, snapshot.by_id)
+        self.assertEqual(self._prices(snapshot), [Decimal(10), Decimal(12), Decimal(13)])
+        self.assertEqual(len(snapshot.filter('name_normalized', category_ids=[self.category.id])), 3)
+
+    def test_category_changes_reload_the_snapshot(self):
+        self.category.title = 'Ideas & Creations'
+        self.category.save()
+        forget_catalog_state()
+
+        snapshot = get_catalog_snapshot()
+        self.assertEqual(snapshot.version, self.snapshot.version + 1)
+        self.assertEqual(snapshot.products[0].category.title, 'Ideas & Creations')
+
+
+class CategoryStatsTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = Category.objects.create(title='City', slug='city')
+            self.space = Category.objects.create(title='Space', slug='space')
+
+    def _stats(self, category):
+        stats = CategoryStats.objects.get(category=category)
+        return stats.product_count, stats.in_stock_count, stats.min_price, stats.max_price
+
+    def test_new_categories_start_empty(self):
+        self.assertEqual(self._stats(self.city), (0, 0, None, None))
+
+    def test_product_changes_refresh_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cheap, dear = make_products(self.city, 2)
+            Product.objects.filter(pk=dear.pk).update(price=Decimal('80.00'), stock=0)
+        self.assertEqual(self._stats(self.city), (2, 1, Decimal('10.00'), Decimal('80.00')))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            cheap.price = Decimal('5.00')
+            cheap.save()
+        self.assertEqual(self._stats(self.city)[2], Decimal('10.00'))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._stats(self.city)[2], Decimal('5.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=dear.pk).delete()
+        self.assertEqual(self._stats(self.city), (1, 1, Decimal('5.00'), Decimal('5.00')))
+
+    def test_moved_products_refresh_both_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product, = make_products(self.city, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.category = self.space
+            product.save()
+        self.assertEqual(self._stats(self.city)[0], 0)
+        self.assertEqual(self._stats(self.space)[0], 1)
+
+    def test_refresh_is_one_aggregate_query(self):
+        make_products(self.city, 3)
+        make_products(self.space, 2, is_active=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(refresh_category_stats(), 2)
+        aggregates = [query['sql'] for query in queries.captured_queries if 'GROUP BY' in query['sql']]
+        self.assertEqual(len(aggregates), 1)
+        self.assertEqual(self._stats(self.city)[0], 3)
+        self.assertEqual(self._stats(self.space)[0], 0)
+        self.assertEqual(refresh_category_stats([None]), 0)
+
+
+class ReviewFeedTests(TestCase):
+    def setUp(self):
+        self.product, = make_products(Category.objects.create(title='Friends', slug='friends'), 1)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f'reviewer{number}', email=f'reviewer{number}@example.com')
+            for number in range(24)
+        )
+        self.reviews = [
+            Review.objects.create(
+                product=self.product, author=user, title=f'Review {number}', content='Nice set',
+                rating=number % 5 + 1, helpful_count=number % 3, is_approved=number != 23,
+            )
+            for number, user in enumerate(users)
+        ]
+        self.url = f'/product/{self.product.slug}/reviews/'
+
+    def _walk(self, sort):
+        seen, data = [], {'sort': sort, 'format': 'json'}
+        while True:
+            response = self.client.get(self.url, data).json()
+            seen.extend(response['reviews'])
+            if not response['next_cursor']:
+                return seen
+            self.assertIn(f'cursor={response["next_cursor"]}', response['next_url'])
+            data['cursor'] = response['next_cursor']
+
+    def test_every_approved_review_is_seen_once_in_order(self):
+        for sort, field in (('newest', 'created_at'), ('rating', 'rating'), ('helpful', 'helpful_count')):
+            reviews = self._walk(sort)
+            self.assertEqual(len({review['id'] for review in reviews}), 23)
+            values = [review[field] for review in reviews]
+            self.assertEqual(values, sorted(values, reverse=True))
+
+    def test_new_reviews_do_not_shift_later_pages(self):
+        first = self.client.get(self.url, {'format': 'json'}).json()
+        user = get_user_model().objects.create_user('latecomer', 'latecomer@example.com', 'secret-pass-1')
+        Review.objects.create(product=self.product, author=user, title='Late', content='Late', rating=3)
+        second = self.client.get(self.url, {'format': 'json', 'cursor': first['next_cursor']}).json()
+        self.assertFalse({review['id'] for review in first['reviews']} & {review['id'] for review in second['reviews']})
+        self.assertEqual(len(second['reviews']), 10)
+
+    def test_unknown_sorts_and_bad_cursors_fall_back(self):
+        response = self.client.get(self.url, {'format': 'json', 'sort': 'author', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sort=newest', response.json()['next_url'])
+        self.assertEqual(len(response.json()['reviews']), 10)
+
+
+class NewReleasesTests(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        forget_catalog_state()
+        category = Category.objects.create(title='Marvel', slug='marvel')
+        for prefix, status, count in (('new', 'N', 14), ('old', 'O', 3), ('soon', 'C', 13)):
+            for number in range(count):
+                Product.objects.create(
+                    name=f'{prefix} {number:02}', slug=f'{prefix}-{number}', price=Decimal('10.00'), stock=1,
+                    category=category, status=status,
+                )
+
+    def _sections(self, data=None):
+        response = self.client.get('/new-releases/', data or {})
+        return response.context, {section['key']: section for section in response.context['sections']}
+
+    def test_each_status_pages_independently(self):
+        context, sections = self._sections({'new_page': 2, 'sort': 'name'})
+        self.assertEqual(context['status_counts'], {'new': 14, 'old': 3, 'coming_soon': 13})
+        self.assertEqual(context['total_count'], 30)
+        self.assertEqual([product.name for product in sections['new']['page_obj']], ['new 12', 'new 13'])
+        self.assertEqual(sections['coming_soon']['page_obj'].number, 1)
+        self.assertEqual(len(sections['coming_soon']['page_obj']), 12)
+        self.assertIn('coming_soon_page=2', sections['coming_soon']['next_url'])
+        self.assertIn('new_page=2', sections['coming_soon']['next_url'])
+        self.assertIsNone(sections['old']['next_url'])
+
+    def test_status_filter_and_sort_whitelist(self):
+        context, sections = self._sections({'status': 'old', 'sort': 'stock'})
+        self.assertEqual(list(sections), ['old'])
+        self.assertEqual(context['sort'], '-created_at')
+        self.assertEqual(context['total_count'], 30)
+
+        context, sections = self._sections({'status': 'bogus', 'new_page': 'last'})
+        self.assertEqual(list(sections), ['new', 'old', 'coming_soon'])
+        self.assertEqual(sections['new']['page_obj'].number, 1)
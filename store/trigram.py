@@ -0,0 +1,203 @@
+import heapq
+import threading
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from store.catalog import CatalogState, changed_products, get_catalog_state
+from store.search import tokenize
+
+# Minimum similarity (0..1) for a word or a document to count as a fuzzy match
+SIMILARITY_THRESHOLD = 0.3
+
+
+def trigrams(word: str) -> FrozenSet[str]:
+    """Return the padded character trigrams of a word ("  w", " wo", "wor", ...)"""
+    padded = f'  {word} '
+    return frozenset(padded[position:position + 3] for position in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """
+    Character-trigram index for typo-tolerant matching of short texts.
+
+    Query words are matched against the vocabulary of indexed words by trigram
+    Jaccard similarity, and documents are ranked by the average best-word
+    similarity across the query words.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._trigram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._word_trigrams: Dict[str, FrozenSet[str]] = {}
+        self._word_docs: Dict[str, Set[object]] = defaultdict(set)
+        self._docs: Dict[object, Tuple[str, ...]] = {}
+
+    def add(self, doc_id, text: str) -> None:
+        """Index (or re-index) a document"""
+        words = tuple(dict.fromkeys(tokenize(text)))
+        with self._lock:
+            self._remove(doc_id)
+            self._docs[doc_id] = words
+            for word in words:
+                docs = self._word_docs[word]
+                if not docs:
+                    grams = trigrams(word)
+                    self._word_trigrams[word] = grams
+                    for gram in grams:
+                        self._trigram_words[gram].add(word)
+                docs.add(doc_id)
+
+    def remove(self, doc_id) -> None:
+        """Drop a document"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id) -> None:
+        words = self._docs.pop(doc_id, None)
+        if words is None:
+            return
+        for word in words:
+            docs = self._word_docs[word]
+            docs.discard(doc_id)
+            if docs:
+                continue
+            del self._word_docs[word]
+            for gram in self._word_trigrams.pop(word):
+                grams_words = self._trigram_words[gram]
+                grams_words.discard(word)
+                if not grams_words:
+                    del self._trigram_words[gram]
+
+    def similar_words(self, word: str) -> Dict[str, float]:
+        """Return indexed words similar to the given one with their similarity"""
+        grams = trigrams(word)
+        shared: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            for gram in grams:
+                for candidate in self._trigram_words.get(gram, ()):
+                    shared[candidate] += 1
+            similar = {}
+            for candidate, count in shared.items():
+                similarity = count / (len(grams) + len(self._word_trigrams[candidate]) - count)
+                if similarity >= self.threshold:
+                    similar[candidate] = similarity
+        return similar
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[object, float]]:
+        """
+        Return (doc_id, similarity) pairs above the threshold, most similar first.
+
+        Each query word's best similarity per document is gathered with
+        dict-level bulk updates, and the per-word maps are summed into the
+        largest one, so common words cost a C-level copy rather than a
+        Python loop over their documents.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        matches: List[Dict[object, float]] = []
+        with self._lock:
+            for word in words:
+                best: Dict[object, float] = {}
+                # Ascending similarity, so every document keeps its best match
+                for candidate, similarity in sorted(self.similar_words(word).items(), key=itemgetter(1)):
+                    best.update(dict.fromkeys(self._word_docs[candidate], similarity))
+                if best:
+                    matches.append(best)
+        if not matches:
+            return []
+
+        matches.sort(key=len, reverse=True)
+        scores = matches[0]
+        for best in matches[1:]:
+            for doc_id, similarity in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + similarity
+
+        minimum = self.threshold * len(words)
+        ranked = ((doc_id, score / len(words)) for doc_id, score in scores.items() if score >= minimum)
+        if limit is not None:
+            return heapq.nlargest(limit, ranked, key=itemgetter(1))
+        return sorted(ranked, key=itemgetter(1), reverse=True)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._word_docs)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+class FuzzyMatcher:
+    """
+    Trigram indexes over product names and category titles
+    """
+
+    def __init__(self, version: int = 0, revision: int = 0):
+        self.products = TrigramIndex()
+        self.categories = TrigramIndex()
+        self.version = version
+        self.revision = revision
+
+    def search_products(self, query: str, limit: Optional[int] = None) -> List[object]:
+        return [doc_id for doc_id, _ in self.products.search(query, limit)]
+
+    def search_categories(self, query: str, limit: Optional[int] = None) -> List[object]:
+        return [doc_id for doc_id, _ in self.categories.search(query, limit)]
+
+
+# ============ PROCESS-WIDE MATCHER ============
+
+_matcher: Optional[FuzzyMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def build_fuzzy_matcher(state: Optional[CatalogState] = None) -> FuzzyMatcher:
+    """Build the trigram indexes from the database, stamped with the catalog version and revision read first"""
+    from store.models import Category, Product
+
+    matcher = FuzzyMatcher(*(state or get_catalog_state()))
+    for product_id, name in Product.objects.filter(is_active=True).values_list('id', 'name').iterator():
+        matcher.products.add(product_id, name)
+    for category_id, title in Category.objects.values_list('id', 'title'):
+        matcher.categories.add(category_id, title)
+    return matcher
+
+
+def patch_fuzzy_matcher(matcher: FuzzyMatcher, revision: int) -> None:
+    """Re-index only the products stamped since the matcher's revision"""
+    for product_id, is_active, name in changed_products(matcher.revision, 'name'):
+        if is_active:
+            matcher.products.add(product_id, name)
+        else:
+            matcher.products.remove(product_id)
+    matcher.revision = revision
+
+
+def get_fuzzy_matcher(state: Optional[CatalogState] = None) -> FuzzyMatcher:
+    """
+    Return the process-wide fuzzy matcher, rebuilding it when the catalog
+    version in the database has moved on and re-indexing the products
+    changed since when only the revision has
+    """
+    global _matcher
+    if state is None:
+        state = get_catalog_state()
+    matcher = _matcher
+    if matcher is None or matcher.version != state.version or matcher.revision < state.revision:
+        with _matcher_lock:
+            matcher = _matcher
+            if matcher is None or matcher.version != state.version:
+                matcher = _matcher = build_fuzzy_matcher(state)
+            elif matcher.revision < state.revision:
+                patch_fuzzy_matcher(matcher, state.revision)
+    return matcher
+
+
+def reset_fuzzy_matcher() -> None:
+    """Discard the indexes so they are rebuilt on next use"""
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
@@ -16,6 +16,7 @@ urlpatterns = [
     path('api/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
     
     # Review Views
+    path('product/<slug:slug>/reviews/', views.ProductReviewsView.as_view(), name='product_reviews'),
     path('review/create/', views.CreateReviewView.as_view(), name='create_review'),
-    path('review/<int:review_id>/helpful/', views.ReviewHelpfulView.as_view(), name='review_helpful'),
+    path('review/<uuid:review_id>/helpful/', views.ReviewHelpfulView.as_view(), name='review_helpful'),
 ]
\ No newline at end of file
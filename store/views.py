@@ -1,18 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, TemplateView, View
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.db.models import F
 
 from store.models import Product, Category
+from store.autocomplete import get_autocomplete
+from store.catalog import get_catalog_state, get_catalog_version
+from store.facets import get_facet_index
+from store.pagination import CachedCountMixin, CursorPaginationMixin, CursorPaginator
+from store.recommendations import frequently_bought_with
+from store.search import get_search_index
+from store.snapshot import get_catalog_snapshot
+from store.trigram import get_fuzzy_matcher
 from core.models import Review
 from core.forms import ReviewForm
 
 
+# Sort options offered by the listing templates
+SORT_ORDERINGS = {
+    'newest': '-created_at',
+    'price-low': 'price',
+    'price-high': '-price',
+    'name': 'name_normalized',
+    'popular': '-popularity_score',
+    'rating': '-rating_average',
+}
+
+# New Releases sections: (query value, Product.status, heading)
+NEW_RELEASE_SECTIONS = (
+    ('new', 'N', 'New Products'),
+    ('old', 'O', 'Old Products'),
+    ('coming_soon', 'C', 'Coming Soon'),
+)
+NEW_RELEASE_SORTS = {
+    '-created_at': '-created_at',
+    'price': 'price',
+    '-price': '-price',
+    'name': 'name_normalized',
+}
+
+# Review feed sort options and page size
+REVIEW_SORT_ORDERINGS = {
+    'newest': '-created_at',
+    'rating': '-rating',
+    'helpful': '-helpful_count',
+}
+REVIEWS_PER_PAGE = 10
+# Review vote actions and the counter each one bumps
+HELPFUL_VOTE_FIELDS = {
+    'helpful': 'helpful_count',
+    'unhelpful': 'unhelpful_count',
+}
+
+# Lifetime of cached product page fragments; product, rating and approval
+# changes invalidate them sooner, helpful votes show up when they expire
+PRODUCT_FRAGMENT_TIMEOUT = 60 * 60
+
+
 # ============ CATEGORY VIEW ============
 
-class CategoryView(ListView):
+class CategoryView(CachedCountMixin, CursorPaginationMixin, ListView):
     """
     Category detail page showing all products for a specific category with filtering
     """
@@ -22,36 +75,26 @@ class CategoryView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        category_slug = self.kwargs.get('slug')
-        queryset = Product.objects.filter(
-            category__slug=category_slug, 
-            is_active=True
-        ).select_related('category')
-        
-        # Price filter
-        min_price = self.request.GET.get('min_price')
-        max_price = self.request.GET.get('max_price')
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        # Stock availability filter
-        in_stock = self.request.GET.get('in_stock')
-        if in_stock == 'true':
-            queryset = queryset.filter(stock__gt=0)
+        # One catalog state read serves the snapshot and the facet index
+        self.catalog_state = get_catalog_state()
+        self.snapshot = get_catalog_snapshot(self.catalog_state)
+        self.category = get_object_or_404(Category.objects.select_related('stats'), slug=self.kwargs.get('slug'))
         
         # Sorting
         sort = self.request.GET.get('sort', '-created_at')
-        queryset = queryset.order_by(sort)
         
-        return queryset
+        # Price and stock availability filters, applied to the in-memory snapshot
+        return self.snapshot.filter(
+            SORT_ORDERINGS.get(sort) or Product.sort_field(sort),
+            category_ids=[self.category.id],
+            min_price=self.request.GET.get('min_price'),
+            max_price=self.request.GET.get('max_price'),
+            in_stock=self.request.GET.get('in_stock') == 'true',
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category_slug = self.kwargs.get('slug')
-        category = Category.objects.get(slug=category_slug)
+        category = self.category
         
         # Get filter values
         min_price = self.request.GET.get('min_price', '')
@@ -59,27 +102,25 @@ class CategoryView(ListView):
         in_stock = self.request.GET.get('in_stock', '')
         sort = self.request.GET.get('sort', '-created_at')
         
-        # Get products for stats
-        all_products = Product.objects.filter(category__slug=category_slug, is_active=True)
-        
         context['category'] = category
         context['min_price'] = min_price
         context['max_price'] = max_price
         context['in_stock'] = in_stock
         context['sort'] = sort
-        context['products_count'] = all_products.count()
-        context['other_categories'] = Category.objects.exclude(slug=category_slug)[:6]
-        
-        # Get min price for stats
-        if all_products.exists():
-            context['min_price_stat'] = all_products.order_by('price').first().price
-        else:
-            context['min_price_stat'] = 0
+        # Stats are maintained on write, see store.stats
+        context['products_count'] = category.product_count
+        context['min_price_stat'] = category.min_price or 0
+        context['other_categories'] = [
+            other for other in self.snapshot.categories if other.id != category.id
+        ][:6]
+        context['facets'] = get_facet_index(self.catalog_state).counts(
+            [category.id], min_price, max_price, in_stock=in_stock == 'true'
+        )
         
         return context
 
 
-class ShopView(ListView):
+class ShopView(CachedCountMixin, CursorPaginationMixin, ListView):
     """
     Dedicated shop page with advanced filtering and sorting
     """
@@ -89,48 +130,51 @@ class ShopView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).select_related('category')
+        # One catalog state read serves the snapshot and the facet index
+        self.catalog_state = get_catalog_state()
+        self.snapshot = get_catalog_snapshot(self.catalog_state)
         
         # Category filter
         categories = self.request.GET.getlist('category')
-        if categories:
-            queryset = queryset.filter(category__slug__in=categories)
-        
-        # Price filter
-        min_price = self.request.GET.get('min_price')
-        max_price = self.request.GET.get('max_price')
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        # Availability filter
-        availability = self.request.GET.get('availability')
-        if availability == 'in_stock':
-            queryset = queryset.filter(stock__gt=0)
+        category_ids = self.snapshot.category_ids_for_slugs(categories) if categories else None
         
         # Sorting
         sort = self.request.GET.get('sort', '-created_at')
-        if sort == 'newest':
-            queryset = queryset.order_by('-created_at')
-        elif sort == 'price-low':
-            queryset = queryset.order_by('price')
-        elif sort == 'price-high':
-            queryset = queryset.order_by('-price')
-        elif sort == 'name':
-            queryset = queryset.order_by('name')
-        elif sort == 'popular':
-            queryset = queryset.order_by('-stock')
         
-        return queryset
+        # Price and availability filters, applied to the in-memory snapshot
+        return self.snapshot.filter(
+            SORT_ORDERINGS.get(sort),
+            category_ids=category_ids,
+            min_price=self.request.GET.get('min_price'),
+            max_price=self.request.GET.get('max_price'),
+            in_stock=self.request.GET.get('availability') == 'in_stock',
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
-        context['selected_categories'] = self.request.GET.getlist('category')
-        context['min_price'] = self.request.GET.get('min_price', '')
-        context['max_price'] = self.request.GET.get('max_price', '')
+        selected_categories = self.request.GET.getlist('category')
+        min_price = self.request.GET.get('min_price', '')
+        max_price = self.request.GET.get('max_price', '')
+        availability = self.request.GET.get('availability', '')
+        
+        # Facet counts come from in-memory bitsets instead of a COUNT per option
+        facets = get_facet_index(self.catalog_state).counts(
+            self.snapshot.category_ids_for_slugs(selected_categories),
+            min_price,
+            max_price,
+            in_stock=availability == 'in_stock',
+        )
+        categories = [
+            dict(category._asdict(), facet_count=facets['categories'].get(category.id, 0))
+            for category in self.snapshot.categories
+        ]
+        
+        context['categories'] = categories
+        context['selected_categories'] = selected_categories
+        context['min_price'] = min_price
+        context['max_price'] = max_price
+        context['availability'] = availability
+        context['facets'] = facets
         
         return context
 
@@ -142,23 +186,30 @@ class ProductDetailView(DetailView):
     template_name = 'store/product/product_detail.html'
     
     def get_queryset(self):
-        return Product.objects.filter(is_active=True)
+        return Product.objects.filter(is_active=True).select_related('category')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
         
-        # Get approved reviews
-        reviews = product.reviews.filter(is_approved=True).order_by('-created_at')
-        context['reviews'] = reviews
-        context['review_count'] = reviews.count()
+        # Anonymous-invariant parts of the page are cached per catalog version
+        # (category changes) and product revision (product and review changes),
+        # both read from the database so every worker agrees on them
+        context['product_version'] = f'{get_catalog_version()}.{product.revision}'
+        context['fragment_timeout'] = PRODUCT_FRAGMENT_TIMEOUT
         
-        # Calculate average rating
-        if reviews.exists():
-            total_rating = sum(review.rating for review in reviews)
-            context['average_rating'] = total_rating / reviews.count()
-        else:
-            context['average_rating'] = 0
+        # Only the first page of reviews is rendered, the rest load on demand.
+        # Evaluated lazily, so a cached review fragment skips the query.
+        context['reviews'] = SimpleLazyObject(lambda: get_review_page(product))
+        context['review_sort'] = 'newest'
+        
+        # Rating summary comes from the aggregates maintained on the product
+        context['review_count'] = product.review_count
+        context['average_rating'] = product.rating_average
+        context['rating_histogram'] = product.rating_histogram
+        
+        # Precomputed co-purchase neighbours, see store.recommendations
+        context['recommended_products'] = frequently_bought_with([product.pk])
         
         # Check if user has already reviewed this product
         if self.request.user.is_authenticated:
@@ -173,64 +224,61 @@ class ProductDetailView(DetailView):
 
 class NewReleasesView(TemplateView):
     """
-    View for displaying the New Releases page with old and coming soon products
+    View for displaying the New Releases page, one independently paginated
+    section per product status
     """
     template_name = 'store/shop/new_releases.html'
+    paginate_by = 12
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get status filter from query params
+        # Get status filter from query params; an unknown value shows every section
         status = self.request.GET.get('status', '')
-        
-        # Get sorting from query params
+        if status not in {key for key, _, _ in NEW_RELEASE_SECTIONS}:
+            status = ''
+
+        # Only whitelisted orderings, all of them precomputed in the snapshot
         sort = self.request.GET.get('sort', '-created_at')
+        if sort not in NEW_RELEASE_SORTS:
+            sort = '-created_at'
+        
+        snapshot = get_catalog_snapshot()
+        counts = snapshot.status_counts
+        
+        sections = []
+        for key, code, title in NEW_RELEASE_SECTIONS:
+            if status and status != key:
+                continue
+            page_param = f'{key}_page'
+            paginator = Paginator(snapshot.filter(NEW_RELEASE_SORTS[sort], statuses=[code]), self.paginate_by)
+            page = paginator.get_page(self.request.GET.get(page_param))
+            sections.append({
+                'key': key,
+                'title': title,
+                'count': counts.get(code, 0),
+                'page_obj': page,
+                'previous_url': self._page_url(page_param, page.previous_page_number()) if page.has_previous() else None,
+                'next_url': self._page_url(page_param, page.next_page_number()) if page.has_next() else None,
+            })
         
-        # Base queryset for active products with NEW, OLD or COMING_SOON status
-        queryset = Product.objects.filter(
-            is_active=True,
-            status__in=['N', 'O', 'C']  # New, Old and Coming Soon products
-        ).select_related('category')
-        
-        # Apply status filter if provided
-        if status == 'new':
-            queryset = queryset.filter(status='N')
-        elif status == 'old':
-            queryset = queryset.filter(status='O')
-        elif status == 'coming_soon':
-            queryset = queryset.filter(status='C')
-        
-        # Apply sorting
-        queryset = queryset.order_by(sort)
-        
-        # Separate products by status
-        new_products = Product.objects.filter(
-            is_active=True,
-            status='N'
-        ).select_related('category').order_by(sort)
-        
-        old_products = Product.objects.filter(
-            is_active=True,
-            status='O'
-        ).select_related('category').order_by(sort)
-        
-        coming_soon_products = Product.objects.filter(
-            is_active=True,
-            status='C'
-        ).select_related('category').order_by(sort)
-        
-        context['products'] = queryset
-        context['new_products'] = new_products
-        context['old_products'] = old_products
-        context['coming_soon_products'] = coming_soon_products
+        context['sections'] = sections
+        context['status_counts'] = {
+            key: counts.get(code, 0) for key, code, _ in NEW_RELEASE_SECTIONS
+        }
+        context['total_count'] = sum(context['status_counts'].values())
         context['status_filter'] = status
         context['sort'] = sort
-        context['categories'] = Category.objects.all()
         
         return context
 
+    def _page_url(self, page_param: str, number: int) -> str:
+        params = self.request.GET.copy()
+        params[page_param] = number
+        return f'?{params.urlencode()}'
 
-class SearchView(ListView):
+
+class SearchView(CursorPaginationMixin, ListView):
     """
     Comprehensive search view for products and categories
     """
@@ -238,6 +286,7 @@ class SearchView(ListView):
     template_name = 'store/shop/search.html'
     context_object_name = 'results'
     paginate_by = 12
+    fuzzy = False
 
     def get_queryset(self):
         query = self.request.GET.get('q', '').strip()
@@ -245,15 +294,16 @@ class SearchView(ListView):
         if not query or len(query) < 2:
             return Product.objects.none()
         
-        # Search in products
-        queryset = Product.objects.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(category__title__icontains=query),
-            is_active=True
-        ).select_related('category').distinct()
+        # Search products through the in-memory index, ranked by relevance
+        self.catalog_state = get_catalog_state()
+        product_ids = get_search_index(self.catalog_state).search(query)
+        self.fuzzy = not product_ids
+        
+        # Fall back to typo-tolerant matching when nothing matched exactly
+        if self.fuzzy:
+            product_ids = get_fuzzy_matcher(self.catalog_state).search_products(query)
         
-        return queryset.order_by('-created_at')
+        return get_catalog_snapshot(self.catalog_state).select(product_ids)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -264,11 +314,14 @@ class SearchView(ListView):
         
         # Get search statistics
         if query and len(query) >= 2:
-            products = self.get_queryset()
-            categories = Category.objects.filter(title__icontains=query)
+            category_ids = [match[0] for match in get_search_index(self.catalog_state).search_categories(query)]
+            if not category_ids:
+                category_ids = get_fuzzy_matcher(self.catalog_state).search_categories(query)
+            categories = Category.objects.filter(id__in=category_ids).select_related('stats').order_by('title')
             
-            context['total_results'] = products.count()
+            context['total_results'] = len(self.object_list)
             context['categories'] = categories
+            context['fuzzy_results'] = self.fuzzy and bool(self.object_list)
             context['search_performed'] = True
         else:
             context['search_performed'] = False
@@ -287,20 +340,34 @@ def search_api(request):
     if not query or len(query) < 2:
         return JsonResponse({'results': []})
     
-    # Search products
-    products = Product.objects.filter(
-        Q(name__icontains=query) | Q(description__icontains=query),
-        is_active=True
-    ).values('id', 'name', 'slug', 'price')[:5]
+    state = get_catalog_state()
+    index = get_search_index(state)
+    snapshot = get_catalog_snapshot(state)
+    
+    # Search products, falling back to typo-tolerant matching
+    product_ids = index.search(query, limit=5)
+    if not product_ids:
+        product_ids = get_fuzzy_matcher(state).search_products(query, limit=5)
+    products = [
+        {'id': product.id, 'name': product.name, 'slug': product.slug, 'price': product.price}
+        for product in snapshot.select(product_ids)
+    ]
     
     # Search categories
-    categories = Category.objects.filter(
-        title__icontains=query
-    ).values('id', 'title', 'slug')[:3]
+    categories = [
+        {'id': category_id, 'title': title, 'slug': slug}
+        for category_id, title, slug in index.search_categories(query, limit=3)
+    ]
+    if not categories:
+        category_ids = get_fuzzy_matcher(state).search_categories(query, limit=3)
+        categories = [
+            {'id': category.id, 'title': category.title, 'slug': category.slug}
+            for category in map(snapshot.categories_by_id.get, category_ids) if category
+        ]
     
     results = {
-        'products': list(products),
-        'categories': list(categories),
+        'products': products,
+        'categories': categories,
     }
     
     return JsonResponse(results)
@@ -315,27 +382,66 @@ def search_autocomplete(request):
     if not query or len(query) < 1:
         return JsonResponse({'suggestions': []})
     
-    # Get product names
-    products = Product.objects.filter(
-        name__icontains=query,
-        is_active=True
-    ).values_list('name', flat=True).distinct()[:10]
-    
-    # Get category names
-    categories = Category.objects.filter(
-        title__icontains=query
-    ).values_list('title', flat=True).distinct()[:5]
-    
-    suggestions = {
-        'products': list(products),
-        'categories': list(categories),
-    }
+    # Completions come from the in-memory trie; the catalog state behind it
+    # is re-read at most every CATALOG_STATE_MAX_AGE seconds
+    suggestions = get_autocomplete().suggest(query)
     
     return JsonResponse(suggestions)
 
 
 # ============ REVIEW VIEWS ============
 
+def get_review_page(product, sort='newest', cursor=None):
+    """Return one keyset-paginated page of a product's approved reviews"""
+    if sort not in REVIEW_SORT_ORDERINGS:
+        sort = 'newest'
+    reviews = Review.objects.filter(product=product, is_approved=True).select_related('author')
+    page = CursorPaginator(
+        reviews,
+        REVIEWS_PER_PAGE,
+        ordering=REVIEW_SORT_ORDERINGS[sort],
+        orderings=tuple(REVIEW_SORT_ORDERINGS.values()),
+        default_ordering=REVIEW_SORT_ORDERINGS['newest'],
+    ).page(cursor)
+    if page.next_cursor:
+        url = reverse('store:product_reviews', kwargs={'slug': product.slug})
+        page.next_url = f'{url}?sort={sort}&cursor={page.next_cursor}'
+    return page
+
+
+class ProductReviewsView(View):
+    """
+    Review feed for a product, served in keyset-paginated chunks as an HTML
+    fragment or, with ?format=json, as JSON
+    """
+    http_method_names = ['get']
+
+    def get(self, request, slug):
+        product = get_object_or_404(Product.objects.only('id', 'slug'), slug=slug, is_active=True)
+        page = get_review_page(product, request.GET.get('sort', 'newest'), request.GET.get('cursor'))
+        
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'reviews': [
+                    {
+                        'id': str(review.id),
+                        'author': review.author.username,
+                        'rating': review.rating,
+                        'title': review.title,
+                        'content': review.content,
+                        'helpful_count': review.helpful_count,
+                        'unhelpful_count': review.unhelpful_count,
+                        'created_at': review.created_at.isoformat(),
+                    }
+                    for review in page
+                ],
+                'next_cursor': page.next_cursor,
+                'next_url': page.next_url,
+            })
+        
+        html = render_to_string('store/product/review_list.html', {'reviews': page}, request=request)
+        return HttpResponse(html)
+
 class CreateReviewView(LoginRequiredMixin, View):
     """
     View for creating a product review
@@ -396,28 +502,30 @@ class ReviewHelpfulView(LoginRequiredMixin, View):
     """
     def post(self, request, review_id):
         """Handle helpful/unhelpful marking"""
-        try:
-            review = get_object_or_404(Review, id=review_id)
-            action = request.POST.get('action')  # 'helpful' or 'unhelpful'
-
-            if action == 'helpful':
-                review.helpful_count += 1
-            elif action == 'unhelpful':
-                review.unhelpful_count += 1
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'Invalid action.'
-                }, status=400)
+        action = request.POST.get('action')  # 'helpful' or 'unhelpful'
+        field = HELPFUL_VOTE_FIELDS.get(action)
+        if field is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid action.'
+            }, status=400)
 
-            review.save()
+        try:
+            # A vote only bumps a counter: one UPDATE, no save signals, and
+            # the product's cached fragments stay valid
+            reviews = Review.objects.filter(id=review_id)
+            if not reviews.update(**{field: F(field) + 1}):
+                raise Http404('No review matches the given query.')
+            counts = reviews.values('helpful_count', 'unhelpful_count').get()
 
             return JsonResponse({
                 'success': True,
-                'helpful_count': review.helpful_count,
-                'unhelpful_count': review.unhelpful_count
+                'helpful_count': counts['helpful_count'],
+                'unhelpful_count': counts['unhelpful_count']
             })
 
+        except Http404:
+            raise
         except Exception as e:
             return JsonResponse({
                 'success': False,
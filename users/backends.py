@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ModelBackendWithCart(ModelBackend):
+    """
+    ModelBackend that loads the user's cart in the same query, so the cart
+    summary in every page header costs nothing extra
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        user = UserModel._default_manager.select_related('cart').filter(pk=user_id).first()
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -1,3 +1,85 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
+
+from store.carts import GUEST_CART_SESSION_KEY, add_to_cart, get_user_cart
+from store.models import Cart, CartItem, Category, Product
+
+
+class AcceptingBackend(BaseBackend):
+    """Signs in the named user whatever the password"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        return get_user_model().objects.filter(username=username).first()
+
+
+class GuestCartTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('builder', 'builder@example.com', 'secret-pass-1')
+        category = Category.objects.create(title='Classic', slug='classic')
+        self.products = [
+            Product.objects.create(
+                name=f'Classic {number}', slug=f'classic-{number}', price=Decimal('4.00'), stock=5,
+                category=category,
+            )
+            for number in range(3)
+        ]
+
+    def _add(self, product, quantity=1):
+        return self.client.post('/orders/cart/add/', {'product_id': product.pk, 'quantity': quantity})
+
+    def test_guest_cart_lives_in_a_database_session(self):
+        self.assertEqual(self._add(self.products[0], 2).json()['cart_count'], 2)
+        session = Session.objects.get().get_decoded()
+        self.assertEqual(session[GUEST_CART_SESSION_KEY], {self.products[0].pk.hex: 2})
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_guest_cart_holds_a_limited_number_of_products(self):
+        with mock.patch('store.carts.MAX_GUEST_CART_LINES', 2):
+            self._add(self.products[0])
+            self._add(self.products[1])
+            response = self._add(self.products[2])
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('more than 2', response.json()['message'])
+            # More of a product already in the cart is fine
+            self.assertEqual(self._add(self.products[0]).status_code, 200)
+
+    def test_login_merges_the_guest_cart_capped_at_stock(self):
+        add_to_cart(get_user_cart(self.user), self.products[0].pk, 4)
+        self._add(self.products[0], 3)
+        self._add(self.products[1], 2)
+        self.client.login(username='builder', password='secret-pass-1')
+        quantities = dict(CartItem.objects.values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].pk: 5, self.products[1].pk: 2})
+        self.assertNotIn(GUEST_CART_SESSION_KEY, self.client.session)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual((cart.item_count, cart.subtotal), (7, Decimal('28.00')))
+
+    def test_logout_ends_the_session(self):
+        self.client.login(username='builder', password='secret-pass-1')
+        self.assertEqual(Session.objects.count(), 1)
+        self.client.get('/users/logout/')
+        self.assertFalse(Session.objects.exists())
+
+
+class ModelBackendWithCartTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('builder', 'builder@example.com', 'secret-pass-1')
+
+    def test_wrong_password_falls_through_to_later_backends(self):
+        self.assertIsNone(authenticate(username='builder', password='wrong'))
+        with override_settings(AUTHENTICATION_BACKENDS=[
+            'users.backends.ModelBackendWithCart', 'users.tests.AcceptingBackend',
+        ]):
+            self.assertEqual(authenticate(username='builder', password='wrong'), self.user)
+
+    def test_signed_in_user_comes_with_the_cart(self):
+        get_user_cart(self.user)
+        self.client.login(username='builder', password='secret-pass-1')
+        request = self.client.get('/').wsgi_request
+        with self.assertNumQueries(0):
+            request.user.cart
@@ -73,7 +73,7 @@ class RegisterView(TemplateView):
             user.save()
             
             # Login the user first
-            login(request, user)
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             
             # Send verification email AFTER login
             # This ensures the token is generated with the correct last_login value